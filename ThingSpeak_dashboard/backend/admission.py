@@ -0,0 +1,237 @@
+"""
+Admission control and load shedding for expensive routes
+
+Each limited route admits a fixed number of concurrent requests; further
+requests wait in a bounded queue for at most ADMISSION_QUEUE_TIMEOUT_SECONDS.
+Waiting requests are served round-robin across clients (JWT user, or client
+address for anonymous calls), and one authenticated user may hold at most
+ADMISSION_MAX_PER_CLIENT slots (running + queued) per route. Anonymous
+requests (login, signup) are not capped per address: everyone behind one
+proxy or NAT shares it, so they only get the route's concurrency and queue.
+
+Rejections are immediate and carry Retry-After:
+    429  the client already has its share of the route's capacity
+    503  the queue is full, or the request waited past its deadline
+
+Limits are per worker process (one event loop), like the other middleware.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+
+import orjson
+
+from .metrics import Counter, register_metric, timed
+
+# Client keys of unauthenticated requests (see client_key_from_scope)
+ANONYMOUS_PREFIX = "addr:"
+
+ADMISSION_REJECTED_TOTAL = register_metric(Counter(
+    "diasense_admission_rejected_total", "Requests shed by admission control", ("route", "reason")
+))
+
+
+class Rejection:
+    """Why a request was not admitted and what to tell the client"""
+
+    __slots__ = ("status_code", "reason", "detail", "retry_after")
+
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int):
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class RouteLimiter:
+    """Concurrency limit with a bounded, per-client fair wait queue for one route"""
+
+    def __init__(self, route: str, concurrency: int, queue_size: int, queue_timeout: float,
+                 max_per_client: int):
+        self.route = route
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.max_per_client = max_per_client
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._per_client: Dict[str, int] = {}
+        # Moving average of time a slot is held, for Retry-After estimates
+        self._service_seconds = 0.05
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = (self.active + self.queued) / max(self.concurrency, 1)
+        return max(1, math.ceil(backlog * self._service_seconds))
+
+    def _reject(self, status_code: int, reason: str, detail: str) -> Rejection:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTED_TOTAL.inc((self.route, reason))
+        return Rejection(status_code, reason, detail, self.retry_after())
+
+    def _take(self, client: str):
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+
+    def _give_back(self, client: str):
+        remaining = self._per_client.get(client, 1) - 1
+        if remaining:
+            self._per_client[client] = remaining
+        else:
+            self._per_client.pop(client, None)
+
+    async def acquire(self, client: str) -> Optional[Rejection]:
+        """Wait for a slot; returns a Rejection instead of raising when the request is shed"""
+        capped = not client.startswith(ANONYMOUS_PREFIX)
+        if capped and self._per_client.get(client, 0) >= self.max_per_client:
+            return self._reject(429, "client_limit",
+                                "Too many concurrent requests from this client, please retry shortly")
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            self._take(client)
+            return None
+        if self.queued >= self.queue_size:
+            return self._reject(503, "queue_full", "Server is busy, please retry shortly")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(client, deque()).append(waiter)
+        self.queued += 1
+        self._take(client)
+        try:
+            with timed("admission_wait"):
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                self._abandon(client, waiter)
+                return self._reject(503, "queue_timeout", "Server is busy, please retry shortly")
+            # Granted right at the deadline: serve it
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if waiter.done() and not waiter.cancelled():
+                self.release(client, 0.0)
+            else:
+                self._abandon(client, waiter)
+            raise
+        self.admitted += 1
+        return None
+
+    def _abandon(self, client: str, waiter: asyncio.Future):
+        """Take a waiter that was never granted out of the queue"""
+        waiter.cancel()
+        waiters = self._waiting.get(client)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self._waiting[client]
+        self._give_back(client)
+
+    def release(self, client: str, held_seconds: float):
+        """Free a slot and grant it to the next client in round-robin order"""
+        self.active -= 1
+        self._give_back(client)
+        if held_seconds > 0:
+            self._service_seconds += 0.1 * (held_seconds - self._service_seconds)
+
+        while self.active < self.concurrency and self._waiting:
+            next_client, waiters = next(iter(self._waiting.items()))
+            waiter = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._waiting.move_to_end(next_client)
+            else:
+                del self._waiting[next_client]
+            if waiter.done():  # Timed out or disconnected while queued
+                continue
+            self.active += 1
+            waiter.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "route": self.route,
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "queue_timeout_seconds": self.queue_timeout,
+            "max_per_client": self.max_per_client,
+            "active": self.active,
+            "queued": self.queued,
+            "waiting_clients": len(self._waiting),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_service_ms": round(self._service_seconds * 1000, 2),
+        }
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying a RouteLimiter to requests matching "METHOD /path" """
+
+    def __init__(self, app, limiters: Dict[str, RouteLimiter], client_key: Callable[[dict], str]):
+        self.app = app
+        self.limiters = limiters
+        self.client_key = client_key
+
+    async def __call__(self, scope, receive, send):
+        limiter = None
+        if scope["type"] == "http":
+            limiter = self.limiters.get(f"{scope['method']} {scope['path']}")
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = self.client_key(scope)
+        rejection = await limiter.acquire(client)
+        if rejection is not None:
+            await _send_rejection(send, rejection)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(client, time.perf_counter() - start)
+
+
+async def _send_rejection(send, rejection: Rejection):
+    body = orjson.dumps({"detail": rejection.detail})
+    await send({
+        "type": "http.response.start",
+        "status": rejection.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejection.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def build_limiters(limits: Dict[str, dict], queue_timeout: float,
+                   max_per_client: int) -> Dict[str, RouteLimiter]:
+    """RouteLimiters from the ADMISSION_LIMITS setting ("METHOD /path" -> concurrency, queue, timeout)"""
+    return {
+        route: RouteLimiter(route, int(limit["concurrency"]), int(limit.get("queue", 0)),
+                            float(limit.get("timeout", queue_timeout)), max_per_client)
+        for route, limit in limits.items()
+    }
+
+
+def client_key_from_scope(scope: dict, decode_token: Callable[[str], dict]) -> str:
+    """The JWT subject when the request carries a valid token, else the peer address"""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            authorization = value.decode("latin-1")
+            if authorization[:7].lower() == "bearer ":
+                try:
+                    subject = decode_token(authorization[7:]).get("sub")
+                except Exception:
+                    subject = None
+                if subject:
+                    return f"user:{subject}"
+            break
+    client = scope.get("client")
+    return f"{ANONYMOUS_PREFIX}{client[0] if client else 'unknown'}"
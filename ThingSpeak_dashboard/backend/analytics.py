@@ -0,0 +1,239 @@
+"""
+Population analytics served from materialized aggregates
+
+The `analytics` node in Firebase holds counters rather than raw data:
+
+    analytics/total                                        predictions counted
+    analytics/cohorts/<age band>/<BMI class>/<risk level>  predictions per cohort and risk level
+    analytics/glucose/histogram/g<mg/dL>                   glucose histogram, 1 mg/dL bins
+    analytics/glucose/sum                                  for the mean
+
+create_prediction adds its increments to the same multi-path update that
+stores the prediction, using server-side increments, so the counters stay
+exact with any number of workers. Admin endpoints read this small node
+(cached for ANALYTICS_CACHE_SECONDS) and never touch `predictions`.
+
+The rebuild job recomputes the node from all stored predictions, a page at a
+time with NumPy/pandas, for backfills or after changing the bands. Predictions
+written while it runs may be missed, so run it when traffic is quiet.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.analytics rebuild [--page-size 5000] [--dry-run]
+"""
+import argparse
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .predictor import DiabetesPredictor
+
+# Lower bounds; the last band / class is open-ended
+AGE_BANDS = ["<30", "30-39", "40-49", "50-59", "60+"]
+AGE_EDGES = [30, 40, 50, 60]
+BMI_CLASSES = ["underweight", "normal", "overweight", "obese"]
+BMI_EDGES = [18.5, 25.0, 30.0]
+RISK_LEVELS = ["Low Risk", "Low-Moderate Risk", "Moderate Risk", "Moderate-High Risk", "High Risk"]
+# Glucose above this (mg/dL) is counted in the last bin
+GLUCOSE_MAX = 400
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def age_band(age: float) -> str:
+    return AGE_BANDS[int(np.searchsorted(AGE_EDGES, age, side="right"))]
+
+
+def bmi_class(bmi: float) -> str:
+    return BMI_CLASSES[int(np.searchsorted(BMI_EDGES, bmi, side="right"))]
+
+
+def glucose_bin(glucose: float) -> int:
+    return min(max(int(round(glucose)), 0), GLUCOSE_MAX)
+
+
+def _increment(amount) -> dict:
+    # Firebase server value: added to the stored number atomically
+    return {".sv": {"increment": amount}}
+
+
+def aggregate_updates(record: dict) -> Dict[str, dict]:
+    """Multi-path update (relative to the database root) counting one stored prediction"""
+    risk_level = record.get("risk_level") or DiabetesPredictor.get_risk_level(
+        record["prediction_result"], record["confidence"]
+    )
+    cohort = f"{age_band(record['age'])}/{bmi_class(record['bmi'])}/{risk_level}"
+    return {
+        "analytics/total": _increment(1),
+        f"analytics/cohorts/{cohort}": _increment(1),
+        f"analytics/glucose/histogram/g{glucose_bin(record['glucose'])}": _increment(1),
+        "analytics/glucose/sum": _increment(float(record["glucose"])),
+    }
+
+
+# ==================== Batch rebuild ====================
+
+def build_aggregates(pages: Iterable[List[dict]]) -> dict:
+    """
+    Compute the analytics node from pages of stored prediction records
+
+    Each page becomes a DataFrame; cohorts are counted with one bincount over
+    flattened (age band, BMI class, risk level) codes and glucose with another.
+    """
+    import pandas as pd
+
+    cohort_counts = np.zeros(len(AGE_BANDS) * len(BMI_CLASSES) * len(RISK_LEVELS), dtype=np.int64)
+    histogram = np.zeros(GLUCOSE_MAX + 1, dtype=np.int64)
+    glucose_sum = 0.0
+    total = 0
+
+    for records in pages:
+        frame = pd.DataFrame.from_records(
+            records, columns=["age", "bmi", "glucose", "risk_level", "prediction_result", "confidence"]
+        )
+        missing = frame["risk_level"].isna()
+        if missing.any():  # Records stored before risk_level was precomputed
+            legacy = frame.loc[missing, ["prediction_result", "confidence"]]
+            frame.loc[missing, "risk_level"] = [
+                DiabetesPredictor.get_risk_level(prediction, confidence)
+                for prediction, confidence in legacy.itertuples(index=False)
+            ]
+
+        age_codes = np.searchsorted(AGE_EDGES, frame["age"].to_numpy(dtype=float), side="right")
+        bmi_codes = np.searchsorted(BMI_EDGES, frame["bmi"].to_numpy(dtype=float), side="right")
+        risk_codes = pd.Categorical(frame["risk_level"], categories=RISK_LEVELS).codes
+        known = risk_codes >= 0
+        flat = (age_codes * len(BMI_CLASSES) + bmi_codes) * len(RISK_LEVELS) + risk_codes
+        cohort_counts += np.bincount(flat[known], minlength=cohort_counts.size)
+
+        glucose = frame["glucose"].to_numpy(dtype=float)
+        bins = np.clip(np.rint(glucose), 0, GLUCOSE_MAX).astype(np.int64)
+        histogram += np.bincount(bins, minlength=histogram.size)
+        glucose_sum += float(glucose.sum())
+        total += len(frame)
+
+    cube = cohort_counts.reshape(len(AGE_BANDS), len(BMI_CLASSES), len(RISK_LEVELS))
+    cohorts: Dict[str, dict] = {}
+    for a, b, r in zip(*np.nonzero(cube)):
+        cohorts.setdefault(AGE_BANDS[a], {}).setdefault(BMI_CLASSES[b], {})[RISK_LEVELS[r]] = int(cube[a, b, r])
+
+    return {
+        "total": total,
+        "cohorts": cohorts,
+        "glucose": {
+            "histogram": {f"g{value}": int(histogram[value]) for value in np.nonzero(histogram)[0]},
+            "sum": glucose_sum,
+        },
+        "rebuilt_at": datetime.utcnow().isoformat(),
+    }
+
+
+# ==================== Serving ====================
+
+def risk_distribution(node: Optional[dict]) -> dict:
+    """Risk level counts per age band, per BMI class and per cohort"""
+    node = node or {}
+    by_age = {band: dict.fromkeys(RISK_LEVELS, 0) for band in AGE_BANDS}
+    by_bmi = {klass: dict.fromkeys(RISK_LEVELS, 0) for klass in BMI_CLASSES}
+    overall = dict.fromkeys(RISK_LEVELS, 0)
+    cohorts = []
+    for band in AGE_BANDS:
+        for klass in BMI_CLASSES:
+            stored = node.get("cohorts", {}).get(band, {}).get(klass, {})
+            if not stored:
+                continue
+            counts = {level: stored[level] for level in RISK_LEVELS if level in stored}
+            size = sum(counts.values())
+            if not size:
+                continue  # Only unknown (renamed or retired) risk levels stored
+            for risk_level, count in counts.items():
+                by_age[band][risk_level] += count
+                by_bmi[klass][risk_level] += count
+                overall[risk_level] += count
+            high = counts.get("High Risk", 0) + counts.get("Moderate-High Risk", 0)
+            cohorts.append({
+                "age_band": band,
+                "bmi_class": klass,
+                "count": size,
+                "risk_levels": counts,
+                "high_risk_share": round(high / size, 4),
+            })
+    return {
+        "total": node.get("total", 0),
+        "overall": overall,
+        "by_age_band": by_age,
+        "by_bmi_class": by_bmi,
+        "cohorts": cohorts,
+        "rebuilt_at": node.get("rebuilt_at"),
+    }
+
+
+def glucose_summary(node: Optional[dict], percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> dict:
+    """Glucose percentiles (1 mg/dL resolution) and mean from the stored histogram"""
+    glucose = (node or {}).get("glucose", {})
+    histogram = np.zeros(GLUCOSE_MAX + 1, dtype=np.int64)
+    for key, count in glucose.get("histogram", {}).items():
+        histogram[int(key[1:])] = count
+    count = int(histogram.sum())
+    if not count:
+        return {"count": 0, "mean": None, "percentiles": {f"p{p:g}": None for p in percentiles}}
+
+    cumulative = np.cumsum(histogram)
+    # Smallest value with at least p% of the readings at or below it
+    ranks = np.maximum(np.ceil(np.asarray(percentiles, dtype=float) / 100 * count), 1)
+    values = np.searchsorted(cumulative, ranks)
+    return {
+        "count": count,
+        "mean": round(glucose.get("sum", 0.0) / count, 2),
+        "percentiles": {f"p{p:g}": int(value) for p, value in zip(percentiles, values)},
+        "capped_at": GLUCOSE_MAX,
+    }
+
+
+class AggregatesCache:
+    """Keeps the last read of the analytics node for a few seconds"""
+
+    def __init__(self, load: Callable[[], Optional[dict]], ttl_seconds: float):
+        self._load = load
+        self.ttl_seconds = ttl_seconds
+        self._node: Optional[dict] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> dict:
+        with self._lock:
+            if self._node is None or time.monotonic() - self._loaded_at >= self.ttl_seconds:
+                self._node = self._load() or {}
+                self._loaded_at = time.monotonic()
+            return self._node
+
+    def invalidate(self):
+        with self._lock:
+            self._node = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--page-size", type=int, default=5000, help="Predictions read per Firebase request")
+    parser.add_argument("--dry-run", action="store_true", help="Compute and print, do not write")
+    args = parser.parse_args()
+
+    from .database import iter_prediction_pages, set_analytics_aggregates
+
+    start = time.perf_counter()
+    node = build_aggregates(iter_prediction_pages(args.page_size))
+    elapsed = time.perf_counter() - start
+    print(f"✓ Aggregated {node['total']} predictions in {elapsed:.2f}s")
+    if args.dry_run:
+        print(risk_distribution(node)["overall"])
+        print(glucose_summary(node))
+    else:
+        set_analytics_aggregates(node)
+        print("✓ Wrote analytics aggregates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Compact model artifact format
+
+A directory holding a manifest.json and one .npy file per parameter array, so
+models load with np.load(mmap_mode="r") and are evaluated with NumPy alone -
+no sklearn import and no unpickling at serving time.
+
+    <artifact>/manifest.json   format, kind, n_features, classes, metadata
+    tree_ensemble:  roots.npy left.npy right.npy feature.npy threshold.npy value.npy
+    linear:         coef.npy intercept.npy
+
+Supported estimators: DecisionTreeClassifier, RandomForestClassifier,
+ExtraTreesClassifier, LogisticRegression, SGDClassifier(loss="log_loss") and
+Pipeline(StandardScaler, one of the two linear models). Anything else (other
+scalers, boosted or weighted ensembles, regressors) is rejected, and every
+export is checked against the estimator's predict_proba before it is written.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.artifact export ../output/models/decision_tree_model.pkl \\
+        ../output/models/decision_tree_model --metadata ../output/models/model_metadata.pkl
+    python -m backend.artifact verify ../output/models/decision_tree_model.pkl \\
+        ../output/models/decision_tree_model
+"""
+import argparse
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FORMAT_NAME = "diasense-compact"
+FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+# Largest |Δp| against predict_proba accepted when exporting
+MAX_EXPORT_ERROR = 1e-9
+
+_TREE_ARRAYS = ("roots", "left", "right", "feature", "threshold", "value")
+_LINEAR_ARRAYS = ("coef", "intercept")
+
+
+class CompactModel:
+    """NumPy evaluator for a compact artifact, mirroring the sklearn classifier API"""
+
+    def __init__(self, kind: str, arrays: Dict[str, np.ndarray], classes: List,
+                 n_features: int, max_depth: int = 0, metadata: Optional[Dict] = None):
+        self.kind = kind
+        self.arrays = arrays
+        self.classes_ = np.array(classes)
+        self.n_features_in_ = n_features
+        self.max_depth = max_depth
+        self.metadata = metadata or {}
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features_in_)
+        if self.kind == "tree_ensemble":
+            return self._tree_proba(X)
+        return self._linear_proba(X)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def _tree_proba(self, X: np.ndarray) -> np.ndarray:
+        a = self.arrays
+        # sklearn compares float32 features against the stored thresholds
+        X = X.astype(np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(a["roots"], (len(X), len(a["roots"]))).copy()
+        for _ in range(self.max_depth):
+            left = a["left"][node]
+            is_leaf = left < 0
+            if is_leaf.all():
+                break
+            go_left = X[rows, a["feature"][node]] <= a["threshold"][node]
+            node = np.where(is_leaf, node, np.where(go_left, left, a["right"][node]))
+        return a["value"][node].mean(axis=1)
+
+    def _linear_proba(self, X: np.ndarray) -> np.ndarray:
+        scores = X @ self.arrays["coef"].T + self.arrays["intercept"]
+        if scores.shape[1] == 1:
+            p1 = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - p1, p1])
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+def is_artifact(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_FILENAME))
+
+
+def load_artifact(path: str, mmap: bool = True) -> CompactModel:
+    """
+    Load a compact artifact; arrays are memory-mapped read-only by default
+
+    Raises:
+        ValueError if the directory is not a compatible artifact
+    """
+    with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME or manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format in {path}")
+
+    names = _TREE_ARRAYS if manifest["kind"] == "tree_ensemble" else _LINEAR_ARRAYS
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        for name in names
+    }
+    return CompactModel(
+        manifest["kind"], arrays, manifest["classes"], manifest["n_features"],
+        manifest.get("max_depth", 0), manifest.get("metadata")
+    )
+
+
+def load_model_path(path: str):
+    """Load a compact artifact directory, or fall back to a joblib pickle"""
+    if is_artifact(path):
+        return load_artifact(path)
+    import joblib
+    return joblib.load(path, mmap_mode="r")
+
+
+# ---------- Export (needs the fitted sklearn estimator) ----------
+
+def _tree_arrays(estimators) -> Dict[str, np.ndarray]:
+    roots, left, right, feature, threshold, value = [], [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        roots.append(offset)
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        # Older sklearn stores class counts per node, newer stores fractions; normalize both
+        counts = tree.value[:, 0, :]
+        value.append(counts / counts.sum(axis=1, keepdims=True))
+        offset += tree.node_count
+    return {
+        "roots": np.array(roots, dtype=np.int32),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "value": np.concatenate(value).astype(np.float64),
+    }
+
+
+def _linear_arrays(model, scaler=None) -> Dict[str, np.ndarray]:
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    intercept = np.asarray(model.intercept_, dtype=np.float64)
+    if scaler is not None:
+        # Fold (x - mean) / scale into the weights so serving needs no scaler;
+        # mean_ is fitted even with with_mean=False, so the flags decide
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(coef.shape[1])
+        scale = scaler.scale_ if scaler.with_std else np.ones(coef.shape[1])
+        coef = coef / scale
+        intercept = intercept - coef @ mean
+    return {"coef": coef, "intercept": intercept}
+
+
+def _probe_rows(kind: str, arrays: Dict[str, np.ndarray], n_features: int, scaler=None,
+                rows: int = 512) -> np.ndarray:
+    """Rows spread over the range the model distinguishes, for checking an export"""
+    rng = np.random.default_rng(0)
+    if kind == "tree_ensemble":
+        internal = arrays["left"] >= 0
+        low, high = np.full(n_features, -1.0), np.full(n_features, 1.0)
+        for i in range(n_features):
+            thresholds = arrays["threshold"][internal & (arrays["feature"] == i)]
+            if len(thresholds):
+                low[i], high[i] = thresholds.min() - 1, thresholds.max() + 1
+        return rng.uniform(low, high, size=(rows, n_features))
+    center, spread = np.zeros(n_features), np.ones(n_features)
+    if scaler is not None:
+        center = scaler.mean_ if scaler.mean_ is not None else center
+        spread = scaler.scale_ if scaler.scale_ is not None else spread
+    return center + rng.normal(size=(rows, n_features)) * 3 * spread
+
+
+def export_artifact(model, path: str, metadata: Optional[Dict] = None) -> str:
+    """
+    Write a fitted classifier as a compact artifact directory
+
+    Args:
+        model: Fitted sklearn classifier (see module docstring for supported types)
+        path: Output directory; replaced atomically if it exists
+        metadata: Optional metadata dict stored in the manifest
+
+    Returns:
+        The artifact path
+
+    Raises:
+        ValueError for unsupported estimators, or when the exported artifact's
+        probabilities differ from the estimator's
+    """
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.tree import DecisionTreeClassifier
+
+    estimator, scaler = model, None
+    if isinstance(model, Pipeline):
+        if len(model.steps) != 2 or type(model.steps[0][1]) is not StandardScaler:
+            raise ValueError("Only Pipeline(StandardScaler, linear classifier) can be exported")
+        scaler, estimator = model.steps[0][1], model.steps[1][1]
+
+    # Exact types: subclasses and look-alikes may predict differently from the arrays below
+    is_linear = type(estimator) is LogisticRegression or (
+        type(estimator) is SGDClassifier and estimator.loss == "log_loss")
+    if type(estimator) is DecisionTreeClassifier and scaler is None:
+        kind, arrays, max_depth = "tree_ensemble", _tree_arrays([estimator]), estimator.tree_.max_depth
+    elif type(estimator) in (RandomForestClassifier, ExtraTreesClassifier) and scaler is None:
+        kind, arrays = "tree_ensemble", _tree_arrays(estimator.estimators_)
+        max_depth = max(e.tree_.max_depth for e in estimator.estimators_)
+    elif is_linear:
+        kind, arrays, max_depth = "linear", _linear_arrays(estimator, scaler), 0
+    else:
+        name = type(estimator).__name__ + (" after a scaler" if scaler is not None else "")
+        raise ValueError(f"Cannot export {name} to the compact format")
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "format_version": FORMAT_VERSION,
+        "kind": kind,
+        "estimator": type(estimator).__name__,
+        "n_features": int(estimator.n_features_in_),
+        "classes": [c.item() if hasattr(c, "item") else c for c in estimator.classes_],
+        "max_depth": int(max_depth),
+        "metadata": json.loads(json.dumps(metadata or {}, default=str)),
+    }
+
+    staging = f"{path.rstrip(os.sep)}.staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(staging, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    probe = _probe_rows(kind, arrays, manifest["n_features"], scaler)
+    max_error = float(np.abs(load_artifact(staging, mmap=False).predict_proba(probe)
+                             - model.predict_proba(probe)).max())
+    if max_error > MAX_EXPORT_ERROR:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ValueError(f"Exported {type(estimator).__name__} differs from predict_proba "
+                         f"by up to {max_error:.3g}")
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(staging, path)
+    return path
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for exporting and verifying compact artifacts"""
+    import joblib
+
+    parser = argparse.ArgumentParser(prog="python -m backend.artifact",
+                                     description="Export sklearn models to the compact artifact format")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Convert a joblib pickle to a compact artifact")
+    export_parser.add_argument("model_path")
+    export_parser.add_argument("artifact_path")
+    export_parser.add_argument("--metadata", help="Path to a joblib metadata dict")
+
+    verify_parser = subparsers.add_parser("verify", help="Compare artifact and pickle on diabetes.csv")
+    verify_parser.add_argument("model_path")
+    verify_parser.add_argument("artifact_path")
+
+    args = parser.parse_args(argv)
+    model = joblib.load(args.model_path)
+
+    if args.command == "export":
+        metadata = joblib.load(args.metadata) if args.metadata else None
+        export_artifact(model, args.artifact_path, metadata)
+        print(f"✓ Exported {type(model).__name__} to {args.artifact_path}")
+    else:
+        import pandas as pd
+        csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "diabetes.csv")
+        X = pd.read_csv(csv_path).drop("Outcome", axis=1).to_numpy(dtype=np.float64)
+        expected = model.predict_proba(X)
+        actual = load_artifact(args.artifact_path).predict_proba(X)
+        max_error = float(np.abs(expected - actual).max())
+        print(f"{'✓' if max_error < 1e-9 else '✗'} {len(X)} rows, max |Δp| = {max_error:.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .config import settings
 from .database import get_db, get_user_by_username, User
+from .metrics import timed
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
@@ -19,7 +20,8 @@ def hash_password(password: str) -> str:
     # Bcrypt has a 72 byte limit, truncate password if needed
     password_bytes = password.encode('utf-8')[:72]
     salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    with timed("password_hash"):
+        hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
 
@@ -28,7 +30,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Truncate to 72 bytes to match hashing behavior
     password_bytes = plain_password.encode('utf-8')[:72]
     hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    with timed("password_verify"):
+        return bcrypt.checkpw(password_bytes, hashed_bytes)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -41,14 +44,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(days=settings.JWT_EXPIRATION_DAYS)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    with timed("jwt_encode"):
+        encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
 
 def decode_access_token(token: str) -> dict:
     """Decode JWT access token"""
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        with timed("jwt_decode"):
+            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         return payload
     except JWTError:
         raise HTTPException(
@@ -63,7 +68,11 @@ def get_current_user(
     db = Depends(get_db)
 ) -> User:
     """Get current authenticated user from JWT token"""
-    token = credentials.credentials
+    return get_user_from_token(credentials.credentials)
+
+
+def get_user_from_token(token: str) -> User:
+    """Resolve a JWT to its user, raising 401 if the token or user is invalid"""
     payload = decode_access_token(token)
     
     username: str = payload.get("sub")
@@ -74,7 +83,8 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = get_user_by_username(username)
+    with timed("user_lookup"):
+        user = get_user_by_username(username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -85,9 +95,20 @@ def get_current_user(
     return user
 
 
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Require the authenticated user to be listed in ADMIN_USERNAMES"""
+    if current_user.username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
+
+
 def authenticate_user(username: str, password: str) -> Optional[User]:
     """Authenticate user with username and password"""
-    user = get_user_by_username(username)
+    with timed("user_lookup"):
+        user = get_user_by_username(username)
     if not user:
         return None
     if not verify_password(password, user.hashed_password):
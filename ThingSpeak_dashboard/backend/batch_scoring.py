@@ -0,0 +1,195 @@
+"""
+Offline batch scoring of CSV files in the diabetes.csv layout
+
+The input is read in chunks of --chunk-rows rows; each chunk is scored by
+DiabetesPredictor.predict_batch in a pool of worker processes that load the
+model once (memory-mapped when it has a compact artifact). Results are
+appended to the output CSV in input order as chunks finish, with four columns
+added to the input ones:
+
+    prediction     0 or 1
+    probability    probability of diabetes
+    confidence     probability of the predicted class
+    risk_level     DiabetesPredictor.get_risk_level
+
+Only --jobs * 2 chunks are in flight, so memory does not grow with the input.
+After every written chunk a checkpoint (<output>.progress) records the rows
+and bytes written; --resume truncates the output to the last checkpoint and
+continues from there with the same model version. The checkpoint is removed
+when the run completes.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.batch_scoring research.csv scored.csv --jobs 4 --chunk-rows 50000
+    python -m backend.batch_scoring research.csv scored.csv --resume
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .dataset import SERVED_FEATURES
+from .predictor import DiabetesPredictor
+from .registry import ModelRegistry, model_registry
+
+OUTPUT_COLUMNS = ["prediction", "probability", "confidence", "risk_level"]
+
+# Per-process predictor, set by _init_worker
+_worker_predictor: Optional[DiabetesPredictor] = None
+
+
+def _init_worker(models_dir: str, version: str):
+    global _worker_predictor
+    _worker_predictor = DiabetesPredictor(ModelRegistry(models_dir))
+    _worker_predictor.load_model(version)
+
+
+def _score(features: np.ndarray) -> Dict[str, np.ndarray]:
+    predictions, confidences, probabilities = _worker_predictor.predict_batch(features)
+    return {
+        "prediction": predictions,
+        "probability": np.round(probabilities, 4),
+        "confidence": np.round(confidences, 4),
+        "risk_level": np.array([DiabetesPredictor.get_risk_level(int(p), float(c))
+                                for p, c in zip(predictions, confidences)]),
+    }
+
+
+def _source_signature(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"input": os.path.abspath(path), "input_bytes": stat.st_size, "input_mtime": stat.st_mtime}
+
+
+def _write_checkpoint(path: str, checkpoint: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def score_file(input_path: str, output_path: str, version: Optional[str] = None, jobs: int = 1,
+               chunk_rows: int = 50000, resume: bool = False,
+               registry: Optional[ModelRegistry] = None) -> Dict:
+    """
+    Score a CSV into another CSV, resumably
+
+    Args:
+        version: Registered model version (default: the active one)
+        jobs: Worker processes; 1 scores in this process
+        resume: Continue an interrupted run of the same input and output
+
+    Returns:
+        Summary with the model version, rows scored in this run and rows per second
+
+    Raises:
+        ValueError if input columns are missing, or the checkpoint does not
+        match this run (or exists and resume is False)
+    """
+    import pandas as pd
+
+    registry = registry or model_registry
+    checkpoint_path = f"{output_path}.progress"
+    signature = _source_signature(input_path)
+    checkpoint = None
+    if os.path.exists(checkpoint_path):
+        if not resume:
+            raise ValueError(f"{checkpoint_path} exists: pass --resume to continue that run, "
+                             f"or delete it to start over")
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if {key: checkpoint.get(key) for key in signature} != signature:
+            raise ValueError(f"{input_path} changed since the interrupted run; delete {checkpoint_path}")
+        if version and version != checkpoint["version"]:
+            raise ValueError(f"The interrupted run used model {checkpoint['version']}, not {version}")
+    elif resume:
+        print(f"⚠ No checkpoint at {checkpoint_path}, starting from the beginning")
+
+    version = checkpoint["version"] if checkpoint else (version or registry.active_version())
+    rows_done = checkpoint["rows"] if checkpoint else 0
+    if checkpoint:
+        # Drop anything written after the last checkpoint (a chunk cut off mid-write)
+        with open(output_path, "r+b") as f:
+            f.truncate(checkpoint["output_bytes"])
+        print(f"✓ Resuming after {rows_done} rows with model {version}")
+    else:
+        checkpoint = {**signature, "version": version, "rows": 0, "output_bytes": 0}
+
+    columns = list(pd.read_csv(input_path, nrows=0).columns)
+    missing = [name for name in SERVED_FEATURES if name not in columns]
+    if missing:
+        raise ValueError(f"{input_path} is missing columns: {', '.join(missing)}")
+    reader = pd.read_csv(input_path, chunksize=chunk_rows, skiprows=range(1, rows_done + 1))
+
+    executor = None
+    if jobs > 1:
+        executor = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(registry.models_dir, version))
+    else:
+        _init_worker(registry.models_dir, version)
+
+    start = time.perf_counter()
+    scored = 0
+    try:
+        with open(output_path, "a" if rows_done else "w", newline="") as out:
+            pending = []  # (frame, future) in input order
+
+            def write_oldest():
+                nonlocal scored
+                frame, future = pending.pop(0)
+                result = future.result() if executor else future
+                frame = frame.assign(**result)
+                frame.to_csv(out, header=out.tell() == 0, index=False)
+                out.flush()
+                scored += len(frame)
+                checkpoint["rows"] += len(frame)
+                checkpoint["output_bytes"] = out.tell()
+                _write_checkpoint(checkpoint_path, checkpoint)
+                elapsed = time.perf_counter() - start
+                print(f"  {checkpoint['rows']:>10} rows  {scored / elapsed:>10,.0f} rows/s")
+
+            for frame in reader:
+                features = frame[SERVED_FEATURES].to_numpy(dtype=np.float64)
+                pending.append((frame, executor.submit(_score, features) if executor else _score(features)))
+                if len(pending) >= max(jobs, 1) * 2:
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - start
+    return {
+        "version": version,
+        "rows": checkpoint["rows"],
+        "rows_this_run": scored,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(scored / elapsed, 1) if elapsed else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.batch_scoring", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV with the diabetes.csv feature columns")
+    parser.add_argument("output", help="CSV to write")
+    parser.add_argument("--version", help="Registered model version (default: the active one)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = score_file(args.input, args.output, args.version, args.jobs, args.chunk_rows, args.resume)
+    except ValueError as e:
+        raise SystemExit(f"✗ {e}")
+    print(f"✓ Scored {summary['rows_this_run']} rows with model {summary['version']} "
+          f"in {summary['seconds']}s ({summary['rows_per_second']:,.0f} rows/s); "
+          f"{summary['rows']} rows in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Model comparison by accuracy and serving cost
+
+Every candidate is scored on the same stratified hold-out of the pima data
+(training.split_dataset) and measured the way the backend would serve it:
+
+    accuracy, roc_auc        on the hold-out
+    latency_us               p50/p99 of one-row predict_proba
+    throughput_rows_per_s    predict_proba on batches of 1, 64 and 4096 rows
+    size_bytes               pickle and compact artifact on disk
+    load_ms, rss_mb          loading each form in a fresh interpreter, and the
+                             resident memory it adds there (from /proc on Linux,
+                             else psutil when installed, else null)
+
+Candidates are the configurations in training.MODELS, fitted on the training
+split, and registered versions (--versions), loaded from the registry. A
+registered version may have been trained on rows of the hold-out, so its
+scores can be optimistic; its serving costs are not affected.
+
+The JSON report is written to output/models/registry/comparisons/, where
+ModelRegistry.serving_costs() picks up the newest one for GET /api/admin/models.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.comparison --models decision_tree random_forest --versions baseline v2
+    python -m backend.comparison --output comparison.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .artifact import export_artifact, is_artifact, load_artifact
+from .dataset import load_dataset
+from .registry import ARTIFACT_DIRNAME, MODEL_FILENAME, ModelRegistry, model_registry
+from .training import MODELS, build_model, evaluate, split_dataset
+
+REPORT_VERSION = 1
+BATCH_SIZES = (1, 64, 4096)
+
+# Run in a fresh interpreter: RSS before and after loading one form of a model
+_LOAD_PROBE = """
+import json, os, sys, time
+import numpy as np, joblib
+from backend.artifact import load_artifact
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, AttributeError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 2**20
+
+rss_mb()  # Import psutil (if used) before the baseline
+path, kind = sys.argv[1], sys.argv[2]
+before = rss_mb()
+start = time.perf_counter()
+model = load_artifact(path) if kind == "artifact" else joblib.load(path)
+model.predict_proba(np.zeros((1, model.n_features_in_)))
+load_ms = (time.perf_counter() - start) * 1000
+after = rss_mb()
+print(json.dumps({"load_ms": load_ms, "rss_mb": after,
+                  "rss_added_mb": after - before if after is not None else None}))
+"""
+
+
+def _disk_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def measure_load(path: str, kind: str, runs: int = 3) -> Dict:
+    """
+    Median load time (including the first prediction) and RSS of one form of a model
+
+    Args:
+        path: Pickle file or compact artifact directory
+        kind: "pickle" or "artifact"
+        runs: Fresh interpreters to start
+    """
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _LOAD_PROBE, path, kind], cwd=project_dir,
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: round(float(np.median([r[key] for r in results])), 2) if results[0][key] is not None else None
+            for key in ("load_ms", "rss_mb", "rss_added_mb")}
+
+
+def measure_latency(model, X: np.ndarray, calls: int = 2000) -> Dict:
+    """p50/p99 microseconds of one-row predict_proba"""
+    rows = [X[i % len(X)].reshape(1, -1) for i in range(calls)]
+    for row in rows[:50]:
+        model.predict_proba(row)
+    timings = np.empty(calls)
+    for i, row in enumerate(rows):
+        start = time.perf_counter_ns()
+        model.predict_proba(row)
+        timings[i] = time.perf_counter_ns() - start
+    p50, p99 = np.percentile(timings / 1000, [50, 99])
+    return {"p50": round(float(p50), 2), "p99": round(float(p99), 2)}
+
+
+def measure_throughput(model, X: np.ndarray, batch_sizes=BATCH_SIZES, min_seconds: float = 0.2) -> Dict:
+    """Rows per second of predict_proba for each batch size, repeated for at least min_seconds"""
+    pool = np.tile(X, (max(batch_sizes) // len(X) + 1, 1))
+    result = {}
+    for size in batch_sizes:
+        batch = np.ascontiguousarray(pool[:size])
+        model.predict_proba(batch)
+        calls, start = 0, time.perf_counter()
+        while True:
+            model.predict_proba(batch)
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        result[str(size)] = round(calls * size / elapsed, 1)
+    return result
+
+
+def measure_candidate(model, pickle_path: str, X_test: np.ndarray, y_test: np.ndarray,
+                      artifact_path: Optional[str] = None, load_runs: int = 3) -> Dict:
+    """
+    Scores and serving costs of a fitted model
+
+    Args:
+        pickle_path: Where the model is pickled
+        artifact_path: Its compact artifact; exported next to the pickle when not given
+    """
+    if artifact_path is None:
+        artifact_path = os.path.join(os.path.dirname(pickle_path), ARTIFACT_DIRNAME)
+        try:
+            export_artifact(model, artifact_path)
+        except ValueError as e:
+            print(f"  ⚠ No compact artifact: {e}")
+    compact = is_artifact(artifact_path)
+    # Measure what the backend would serve, as tuning.single_row_latency does
+    served = load_artifact(artifact_path, mmap=False) if compact else model
+
+    result = {
+        **evaluate(model, X_test, y_test),
+        "served_form": "artifact" if compact else "pickle",
+        "latency_us": measure_latency(served, X_test),
+        "throughput_rows_per_s": measure_throughput(served, X_test),
+        "size_bytes": {"pickle": _disk_size(pickle_path)},
+        "load_ms": {},
+        "rss_mb": {},
+    }
+    forms = [("pickle", pickle_path)] + ([("artifact", artifact_path)] if compact else [])
+    for kind, path in forms:
+        if kind == "artifact":
+            result["size_bytes"]["artifact"] = _disk_size(path)
+        loaded = measure_load(path, kind, load_runs)
+        result["load_ms"][kind] = loaded["load_ms"]
+        result["rss_mb"][kind] = {"total": loaded["rss_mb"], "added": loaded["rss_added_mb"]}
+    return result
+
+
+def compare(model_names: List[str], versions: List[str], load_runs: int = 3,
+            registry: Optional[ModelRegistry] = None) -> Dict:
+    """
+    Measure freshly trained configurations and registered versions on one hold-out
+
+    Returns:
+        The report dict (see REPORT_VERSION)
+    """
+    import joblib
+    import sklearn
+
+    registry = registry or model_registry
+    dataset = load_dataset("pima")
+    X_train, X_test, y_train, y_test = split_dataset(dataset)
+
+    candidates = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in model_names:
+            print(f"▸ {name}")
+            model = build_model(name)
+            start = time.perf_counter()
+            model.fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - start
+            estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+            candidate_dir = os.path.join(workdir, name)
+            os.makedirs(candidate_dir)
+            pickle_path = os.path.join(candidate_dir, MODEL_FILENAME)
+            joblib.dump(model, pickle_path)
+            candidates.append({
+                "name": name,
+                "source": "training",
+                "model_type": type(estimator).__name__,
+                "params": MODELS[name][1],
+                "fit_seconds": round(fit_seconds, 3),
+                **measure_candidate(model, pickle_path, X_test, y_test, load_runs=load_runs),
+            })
+
+    for version in versions:
+        print(f"▸ registry {version}")
+        model_version = registry.get_version(version)
+        metadata = model_version.load_metadata()
+        candidates.append({
+            "name": version,
+            "source": "registry",
+            "version": version,
+            "model_type": metadata.get("model_type"),
+            "sha256": model_version.sha256(),
+            **measure_candidate(joblib.load(model_version.model_path), model_version.model_path,
+                                X_test, y_test, model_version.artifact_path, load_runs),
+        })
+
+    return {
+        "report_version": REPORT_VERSION,
+        "created": datetime.utcnow().isoformat(),
+        "dataset": dataset.name,
+        "dataset_sha256": dataset.source_sha256,
+        "n_test": int(len(y_test)),
+        "batch_sizes": list(BATCH_SIZES),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "candidates": candidates,
+    }
+
+
+def print_report(report: Dict):
+    print(f"{'candidate':<22} {'acc':>6} {'auc':>6} {'p50 µs':>8} {'p99 µs':>8} "
+          + " ".join(f"{'rows/s@' + str(size):>12}" for size in report["batch_sizes"])
+          + f" {'size KB':>9} {'load ms':>8} {'+RSS MB':>8}")
+    for c in report["candidates"]:
+        form = c["served_form"]
+        print(f"{c['name']:<22} {c['accuracy']:>6.3f} {c['roc_auc']:>6.3f} "
+              f"{c['latency_us']['p50']:>8.1f} {c['latency_us']['p99']:>8.1f} "
+              + " ".join(f"{c['throughput_rows_per_s'][str(size)]:>12,.0f}" for size in report["batch_sizes"])
+              + f" {c['size_bytes'][form] / 1024:>9.1f} {c['load_ms'][form]:>8.1f}"
+              f" {_format_mb(c['rss_mb'][form]['added']):>8}")
+    if any(c["rss_mb"][c["served_form"]]["added"] is None for c in report["candidates"]):
+        print("⚠ Resident memory not measured: no /proc on this platform; install psutil to measure it")
+
+
+def _format_mb(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:.1f}"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.comparison", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="*", choices=list(MODELS), default=list(MODELS),
+                        help="Configurations to train and measure (default: all)")
+    parser.add_argument("--versions", nargs="*", default=None,
+                        help="Registered versions to measure (default: all)")
+    parser.add_argument("--load-runs", type=int, default=3, help="Fresh interpreters per load measurement")
+    parser.add_argument("--output", help="Also write the report here")
+    parser.add_argument("--no-save", action="store_true", help="Do not add the report to the registry")
+    args = parser.parse_args(argv)
+
+    versions = args.versions
+    if versions is None:
+        versions = [v.version for v in model_registry.list_versions()]
+    report = compare(args.models, versions, args.load_runs)
+    print_report(report)
+    if not args.no_save:
+        print(f"✓ Saved {model_registry.save_comparison(report)}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,8 @@ class Settings(BaseSettings):
     THINGSPEAK_READ_API: str = "2NPFT89DTCN0EZIS"
     THINGSPEAK_WRITE_API: str = "XKYL4F3JW3UT17CI"
     THINGSPEAK_BASE_URL: str = "https://api.thingspeak.com"
+    # Seconds a fetched reading is reused before asking ThingSpeak again (0 disables)
+    THINGSPEAK_CACHE_SECONDS: float = 5.0
     
     # Firebase Configuration
     FIREBASE_DATABASE_URL: str = "https://aiot-2aadb-default-rtdb.firebaseio.com/"
@@ -28,6 +30,87 @@ class Settings(BaseSettings):
     # Model Configuration
     MODEL_PATH: str = "../output/models/decision_tree_model.pkl"
     MODEL_METADATA_PATH: str = "../output/models/model_metadata.pkl"
+    # "auto" serves the compact NumPy artifact when a version has one, "pickle" always unpickles
+    MODEL_ARTIFACT_FORMAT: str = "auto"
+    # Seconds between checks of the registry's active version (0 disables hot-reload watching)
+    MODEL_WATCH_INTERVAL_SECONDS: float = 0.0
+    # Max memoized predictions per worker (0 disables the cache)
+    PREDICTION_CACHE_SIZE: int = 4096
+    # Inference worker processes (0 runs inference in the API process)
+    INFERENCE_WORKERS: int = 0
+    # Max inference calls queued for the worker pool before requests get a 503
+    INFERENCE_MAX_PENDING: int = 64
+    # Registry versions evaluated in shadow alongside the served model
+    SHADOW_MODEL_VERSIONS: list = []
+    # Shadow inference latency budget (p95, ms); per-version overrides in SHADOW_LATENCY_BUDGETS_MS
+    SHADOW_LATENCY_BUDGET_MS: float = 5.0
+    SHADOW_LATENCY_BUDGETS_MS: dict = {}
+    # Shadow evaluations queued before new ones are dropped
+    SHADOW_MAX_PENDING: int = 32
+    
+    # Admin Configuration (usernames allowed to call /api/admin endpoints)
+    ADMIN_USERNAMES: list = []
+    
+    # Test sample replay for /api/predict: "random", "seeded" or "sequential"
+    SAMPLE_REPLAY_MODE: str = "random"
+    SAMPLE_REPLAY_SEED: int = 42
+    # Seconds between checks of data/test_samples.json for changes
+    SAMPLE_RELOAD_CHECK_SECONDS: float = 5.0
+    
+    # /api/stream: seconds between shared ThingSpeak polls, events buffered per client,
+    # and seconds of silence before a keepalive comment is sent
+    STREAM_POLL_SECONDS: float = 15.0
+    STREAM_QUEUE_SIZE: int = 32
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Seconds the analytics aggregates are reused by /api/admin/analytics before re-reading
+    ANALYTICS_CACHE_SECONDS: float = 10.0
+    
+    # Feature drift (per worker): live counts cover DRIFT_WINDOW_BUCKETS buckets of
+    # DRIFT_BUCKET_SECONDS; scores are recomputed at most every DRIFT_EVALUATE_SECONDS
+    DRIFT_BUCKET_SECONDS: float = 3600.0
+    DRIFT_WINDOW_BUCKETS: int = 24
+    DRIFT_EVALUATE_SECONDS: float = 30.0
+    # PSI at which a feature is reported as "warning" / "drift", and readings needed to judge
+    DRIFT_PSI_WARNING: float = 0.1
+    DRIFT_PSI_ALERT: float = 0.25
+    DRIFT_MIN_OBSERVATIONS: int = 100
+    # Training reference histograms (default: output/models/drift_reference.json)
+    DRIFT_REFERENCE_PATH: Optional[str] = None
+    
+    # Prediction records read from Firebase per page by /api/predictions/export
+    EXPORT_PAGE_SIZE: int = 500
+    
+    # Responses larger than this many bytes are gzip-compressed
+    GZIP_MINIMUM_SIZE: int = 1024
+    
+    # Admission control per worker: "METHOD /path" -> concurrent requests and queued requests.
+    # Queued requests give up with a 503 after ADMISSION_QUEUE_TIMEOUT_SECONDS (or the route's
+    # "timeout"); one client (JWT user) may hold ADMISSION_MAX_PER_CLIENT running + queued slots
+    # per route; anonymous requests are only limited by the route, since many clients can share
+    # an address. Login and signup run bcrypt (0.25-0.5 s of CPU each), so more concurrency
+    # does not add throughput: their queues are deep enough for a burst of sessions and their
+    # timeouts long enough to drain a full queue (32 x 0.5 s = 16 s for signup on one core).
+    ADMISSION_LIMITS: dict = {
+        "POST /api/predict": {"concurrency": 8, "queue": 32},
+        "POST /api/auth/login": {"concurrency": 4, "queue": 32, "timeout": 10},
+        "POST /api/auth/signup": {"concurrency": 2, "queue": 32, "timeout": 20},
+        "GET /api/thingspeak/latest": {"concurrency": 16, "queue": 64},
+    }
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    ADMISSION_MAX_PER_CLIENT: int = 4
+    
+    # Requests slower than this are logged with their stage breakdown (0 disables)
+    SLOW_REQUEST_MS: float = 500.0
+    # Send the per-request stage breakdown to clients in a Server-Timing header
+    SERVER_TIMING_HEADER: bool = True
+    # Longest recording allowed for POST /api/admin/profile
+    PROFILER_MAX_SECONDS: float = 60.0
+    
+    # backend.serve launcher (SERVER_WORKERS=0 starts one worker per available CPU)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
     
     # CORS Configuration
     CORS_ORIGINS: list = ["http://localhost:8501", "http://localhost:3000"]
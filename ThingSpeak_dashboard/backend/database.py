@@ -1,21 +1,28 @@
 """
 Database models and session management using Firebase Realtime Database
 """
-import firebase_admin
-from firebase_admin import credentials, db
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 from .config import settings
+from .metrics import timed
 import uuid
 
 # Firebase initialization
 _firebase_app = None
 
+# firebase_admin (and google-auth underneath it) is imported by init_firebase(),
+# which every helper below calls first, so importing this module stays cheap
+firebase_admin = credentials = db = None
+
 def init_firebase():
     """Initialize Firebase"""
-    global _firebase_app
+    global _firebase_app, firebase_admin, credentials, db
     if _firebase_app is None:
         try:
+            if db is None:
+                import firebase_admin
+                from firebase_admin import credentials, db
+            
             # Check if app is already initialized
             if firebase_admin._apps:
                 _firebase_app = firebase_admin.get_app()
@@ -58,7 +65,8 @@ class User:
     
     def __init__(self, username: str, hashed_password: str, pregnancies: int, 
                  weight_kg: float, height_m: float, age: int, 
-                 id: Optional[str] = None, created_at: Optional[str] = None):
+                 id: Optional[str] = None, created_at: Optional[str] = None,
+                 latest_prediction_id: Optional[str] = None):
         self.id = id or str(uuid.uuid4())
         self.username = username
         self.hashed_password = hashed_password
@@ -67,6 +75,7 @@ class User:
         self.height_m = height_m
         self.age = age
         self.created_at = created_at or datetime.utcnow().isoformat()
+        self.latest_prediction_id = latest_prediction_id
     
     @property
     def bmi(self) -> float:
@@ -83,7 +92,8 @@ class User:
             "weight_kg": self.weight_kg,
             "height_m": self.height_m,
             "age": self.age,
-            "created_at": self.created_at
+            "created_at": self.created_at,
+            "latest_prediction_id": self.latest_prediction_id
         }
     
     @classmethod
@@ -97,7 +107,8 @@ class User:
             height_m=data["height_m"],
             age=data["age"],
             id=data.get("id"),
-            created_at=data.get("created_at")
+            created_at=data.get("created_at"),
+            latest_prediction_id=data.get("latest_prediction_id")
         )
 
 
@@ -108,7 +119,8 @@ class Prediction:
                  blood_pressure: float, skin_thickness: float, insulin: float,
                  bmi: float, diabetes_pedigree_function: float, age: int,
                  prediction_result: int, confidence: float,
-                 id: Optional[str] = None, timestamp: Optional[str] = None):
+                 id: Optional[str] = None, timestamp: Optional[str] = None,
+                 model_version: Optional[str] = None, risk_level: Optional[str] = None):
         self.id = id or str(uuid.uuid4())
         self.user_id = user_id
         self.pregnancies = pregnancies
@@ -122,6 +134,8 @@ class Prediction:
         self.prediction_result = prediction_result
         self.confidence = confidence
         self.timestamp = timestamp or datetime.utcnow().isoformat()
+        self.model_version = model_version
+        self.risk_level = risk_level
     
     def to_dict(self) -> dict:
         """Convert to dictionary for Firebase"""
@@ -138,7 +152,9 @@ class Prediction:
             "age": self.age,
             "prediction_result": self.prediction_result,
             "confidence": self.confidence,
-            "timestamp": self.timestamp
+            "timestamp": self.timestamp,
+            "model_version": self.model_version,
+            "risk_level": self.risk_level
         }
     
     @classmethod
@@ -157,7 +173,9 @@ class Prediction:
             prediction_result=data["prediction_result"],
             confidence=data["confidence"],
             id=data.get("id"),
-            timestamp=data.get("timestamp")
+            timestamp=data.get("timestamp"),
+            model_version=data.get("model_version"),
+            risk_level=data.get("risk_level")
         )
 
 
@@ -172,7 +190,8 @@ def create_user(user: User) -> User:
     """Create a new user"""
     init_firebase()
     users_ref = db.reference('users')
-    users_ref.child(user.id).set(user.to_dict())
+    with timed("firebase_write"):
+        users_ref.child(user.id).set(user.to_dict())
     return user
 
 
@@ -182,7 +201,8 @@ def get_user_by_username(username: str) -> Optional[User]:
     users_ref = db.reference('users')
     
     # Get all users and search manually (works without indexing)
-    all_users = users_ref.get()
+    with timed("firebase_read"):
+        all_users = users_ref.get()
     
     if not all_users:
         return None
@@ -208,30 +228,137 @@ def get_user_by_id(user_id: str) -> Optional[User]:
 
 def create_prediction(prediction: Prediction) -> Prediction:
     """Create a new prediction"""
+    from .analytics import aggregate_updates  # analytics -> predictor -> database
+    
     init_firebase()
-    predictions_ref = db.reference('predictions')
-    predictions_ref.child(prediction.id).set(prediction.to_dict())
+    data = prediction.to_dict()
+    updates = {
+        f'predictions/{prediction.id}': data,
+        # Lets history ETags be derived from the user record alone
+        f'users/{prediction.user_id}/latest_prediction_id': prediction.id,
+    }
+    # Population analytics counters, incremented server-side in the same write
+    updates.update(aggregate_updates(data))
+    with timed("firebase_write"):
+        db.reference().update(updates)
     return prediction
 
 
-def get_user_predictions(user_id: str, limit: int = 20) -> List[Prediction]:
-    """Get user's predictions sorted by timestamp"""
+def get_user_prediction_records(user_id: str, limit: int = 20) -> List[dict]:
+    """Get user's stored prediction records (raw dicts), newest first"""
     init_firebase()
     predictions_ref = db.reference('predictions')
     
     # Get all predictions and filter manually
-    all_predictions = predictions_ref.get()
+    with timed("firebase_read"):
+        all_predictions = predictions_ref.get()
     
     if not all_predictions:
         return []
     
-    # Filter by user_id and convert to Prediction objects
-    prediction_list = []
-    for pred_id, pred_data in all_predictions.items():
-        if pred_data.get('user_id') == user_id:
-            prediction_list.append(Prediction.from_dict(pred_data))
+    records = [
+        pred_data for pred_data in all_predictions.values()
+        if pred_data.get('user_id') == user_id
+    ]
     
     # Sort by timestamp (newest first)
-    prediction_list.sort(key=lambda x: x.timestamp, reverse=True)
+    records.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+    
+    return records[:limit]
+
+
+def get_user_predictions(user_id: str, limit: int = 20) -> List[Prediction]:
+    """Get user's predictions sorted by timestamp"""
+    return [Prediction.from_dict(record) for record in get_user_prediction_records(user_id, limit)]
+
+
+def iter_prediction_pages(page_size: int = 500) -> Iterator[List[dict]]:
+    """
+    Yield all stored prediction records one page at a time
     
-    return prediction_list[:limit]
+    Predictions are read in key order with limit_to_first, so only one page is
+    held in memory however many there are. Records come out in key order, not
+    by timestamp.
+    """
+    init_firebase()
+    predictions_ref = db.reference('predictions')
+    last_key = None
+    
+    while True:
+        query = predictions_ref.order_by_key()
+        if last_key is not None:
+            # start_at is inclusive: fetch one extra and drop the key already seen
+            query = query.start_at(last_key)
+        with timed("firebase_read"):
+            page = query.limit_to_first(page_size + (last_key is not None)).get()
+        
+        keys = [key for key in (page or {}) if key != last_key]
+        if not keys:
+            return
+        last_key = keys[-1]
+        yield [page[key] for key in keys]
+        if len(keys) < page_size:
+            return
+
+
+def iter_user_prediction_records(user_id: str, page_size: int = 500) -> Iterator[List[dict]]:
+    """
+    Yield a user's stored prediction records page_size at a time, in key order
+    
+    Reads only that user's records with an equal_to query on user_id, which
+    needs the ".indexOn": ["user_id"] rule on predictions (database.rules.json).
+    The REST API has no key tiebreak for start_at, so records sharing a user_id
+    cannot be paged server-side: they come back in one read and are yielded in
+    pages. Without the index, falls back to scanning every prediction page by page.
+    """
+    from firebase_admin import exceptions
+    
+    init_firebase()
+    query = db.reference('predictions').order_by_child('user_id').equal_to(user_id)
+    try:
+        with timed("firebase_read"):
+            found = query.get()
+    except exceptions.InvalidArgumentError as e:
+        print(f"⚠ predictions is not indexed on user_id, scanning all predictions: {e}")
+        for page in iter_prediction_pages(page_size):
+            records = [record for record in page if record.get('user_id') == user_id]
+            if records:
+                yield records
+        return
+    
+    records = [found[key] for key in sorted(found or {})]
+    for start in range(0, len(records), page_size):
+        yield records[start:start + page_size]
+
+
+def get_predictions_since(timestamp: str) -> List[dict]:
+    """
+    Prediction records with a timestamp at or after the given ISO timestamp
+    
+    Needs the ".indexOn": ["timestamp"] rule on predictions (database.rules.json);
+    raises ValueError without it.
+    """
+    from firebase_admin import exceptions
+    
+    init_firebase()
+    query = db.reference('predictions').order_by_child('timestamp').start_at(timestamp)
+    try:
+        with timed("firebase_read"):
+            found = query.get()
+    except exceptions.InvalidArgumentError as e:
+        raise ValueError(f"predictions is not indexed on timestamp: {e}")
+    return list((found or {}).values())
+
+
+def get_analytics_aggregates() -> Optional[dict]:
+    """Read the materialized analytics node (see analytics.py)"""
+    init_firebase()
+    with timed("firebase_read"):
+        return db.reference('analytics').get()
+
+
+def set_analytics_aggregates(node: dict):
+    """Replace the materialized analytics node with a rebuilt one"""
+    init_firebase()
+    with timed("firebase_write"):
+        db.reference('analytics').set(node)
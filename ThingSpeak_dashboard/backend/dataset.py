@@ -0,0 +1,483 @@
+"""
+Training datasets: a typed, memory-mapped column store built once from the CSVs
+
+Each CSV is parsed once, de-duplicated, checked against SCHEMAS and stored
+under output/datasets/ as one .npy file per column plus manifest.json, in a
+directory named after the SHA-256 of the source file:
+
+    category columns   int8 codes; the category names live in the manifest
+    integer columns    smallest integer type that holds the range (uint8 for flags)
+    float columns      float32 when that is lossless at the CSV's precision
+                       (checked on conversion), float64 otherwise
+
+Columns are loaded with np.load(mmap_mode="r"), so opening a dataset costs a
+few page faults instead of a CSV parse, and processes share the pages.
+Encoding for training (label codes, one-hot columns) is done from the codes.
+
+    pima                 data/diabetes.csv, the 8 features the backend serves
+    diabetes_prediction  data/diabetes_prediction_dataset.csv (100k rows); gender
+                         label-encoded and smoking_history one-hot encoded as in
+                         noteBooks/ade.py. Not servable: its features differ.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.dataset convert            # build the store for every dataset
+    python -m backend.dataset report [--output dataset_report.json]
+
+From a notebook: `load_frame("diabetes_prediction")` returns a DataFrame with
+categorical columns, built on the memory-mapped arrays.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .registry import file_sha256
+
+# Bump when cleaning, encoding or the storage layout changes, so existing entries are ignored
+PREPROCESSING_VERSION = 2
+
+SERVED_FEATURES = ["Pregnancies", "Glucose", "BloodPressure", "SkinThickness",
+                   "Insulin", "BMI", "DiabetesPedigreeFunction", "Age"]
+
+DATASETS = {
+    "pima": {"filename": "diabetes.csv", "target": "Outcome"},
+    "diabetes_prediction": {"filename": "diabetes_prediction_dataset.csv", "target": "diabetes",
+                            "one_hot": ["smoking_history"]},
+}
+
+# Expected columns, in file order, and their kind: "int", "float" or "category"
+SCHEMAS = {
+    "pima": {
+        "Pregnancies": "int", "Glucose": "int", "BloodPressure": "int", "SkinThickness": "int",
+        "Insulin": "int", "BMI": "float", "DiabetesPedigreeFunction": "float", "Age": "int",
+        "Outcome": "int",
+    },
+    "diabetes_prediction": {
+        "gender": "category", "age": "float", "hypertension": "int", "heart_disease": "int",
+        "smoking_history": "category", "bmi": "float", "HbA1c_level": "float",
+        "blood_glucose_level": "int", "diabetes": "int",
+    },
+}
+
+# Known values of category columns, in code order (sorted, like LabelEncoder and get_dummies).
+# Fixed up front so chunks streamed by incremental.py encode the same way as the store.
+CATEGORIES = {
+    "diabetes_prediction": {
+        "gender": ["Female", "Male", "Other"],
+        "smoking_history": ["No Info", "current", "ever", "former", "never", "not current"],
+    },
+}
+
+_MAX_DECIMALS = 6
+
+
+class SchemaError(ValueError):
+    """A CSV or a stored column does not match the dataset's schema"""
+
+
+def project_dir() -> str:
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.dirname(os.path.dirname(backend_dir))
+
+
+def default_data_dir() -> str:
+    """Absolute path to <project>/data"""
+    return os.path.join(project_dir(), "data")
+
+
+def default_cache_dir() -> str:
+    """Absolute path to <project>/output/datasets"""
+    return os.path.join(project_dir(), "output", "datasets")
+
+
+class Dataset:
+    """Encoded feature matrix and target of one training dataset"""
+
+    def __init__(self, name: str, columns: Dict[str, np.ndarray], feature_names: List[str],
+                 target: str, source_sha256: str, cached: bool = False):
+        self.name = name
+        self.columns = columns
+        self.feature_names = feature_names
+        self.target = target
+        self.source_sha256 = source_sha256
+        self.cached = cached
+
+    @property
+    def servable(self) -> bool:
+        """Whether models trained on it accept the features the backend sends"""
+        return self.feature_names == SERVED_FEATURES
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.columns[self.target])
+
+    @property
+    def X(self) -> np.ndarray:
+        X = np.empty((self.n_rows, len(self.feature_names)), dtype=np.float64)
+        for index, name in enumerate(self.feature_names):
+            X[:, index] = self.columns[name]
+        return X
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.columns[self.target].astype(np.int64)
+
+
+# ==================== Conversion ====================
+
+def _decimals(values: np.ndarray) -> Optional[int]:
+    """Fewest decimals that represent every value exactly, or None"""
+    for decimals in range(_MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            return decimals
+    return None
+
+
+def _category_codes(name: str, values, categories: List[str]) -> np.ndarray:
+    import pandas as pd
+
+    codes = pd.Categorical(values, categories=categories).codes
+    if (codes < 0).any():
+        unknown = sorted(set(values[codes < 0].astype(str)))
+        raise SchemaError(f"Column '{name}' has unknown categories {unknown[:5]}, expected {categories}")
+    return codes.astype(np.int8)
+
+
+def _store_column(dataset_name: str, name: str, kind: str, values) -> tuple:
+    """(array to store, manifest entry) for one validated column"""
+    import pandas as pd
+
+    if kind == "category":
+        categories = CATEGORIES[dataset_name][name]
+        return _category_codes(name, values, categories), {"kind": kind, "categories": categories}
+
+    if kind == "int":
+        if not pd.api.types.is_integer_dtype(values):
+            raise SchemaError(f"Column '{name}' should hold integers, found {values.dtype}")
+        downcast = "unsigned" if values.min() >= 0 else "integer"
+        return pd.to_numeric(values, downcast=downcast).to_numpy(), {"kind": kind}
+
+    if not pd.api.types.is_numeric_dtype(values):
+        raise SchemaError(f"Column '{name}' should be numeric, found {values.dtype}")
+    array = values.to_numpy(dtype=np.float64)
+    decimals = _decimals(array)
+    # float32 only if rounding back to the CSV's precision restores every value
+    if decimals is not None and np.array_equal(np.round(array.astype(np.float32).astype(np.float64), decimals),
+                                               array):
+        return array.astype(np.float32), {"kind": kind, "decimals": decimals}
+    return array, {"kind": kind}
+
+
+def convert_csv(name: str, source_path: str) -> tuple:
+    """
+    Parse, de-duplicate and validate a CSV into typed columns
+
+    Returns:
+        (columns dict, manifest column entries)
+
+    Raises:
+        SchemaError when columns are missing, unexpected, mistyped or hold missing values
+    """
+    import pandas as pd
+
+    schema = SCHEMAS[name]
+    target = DATASETS[name]["target"]
+    frame = pd.read_csv(source_path)
+    if list(frame.columns) != list(schema):
+        raise SchemaError(f"{os.path.basename(source_path)} columns {list(frame.columns)} "
+                          f"do not match the {name} schema {list(schema)}")
+    missing = frame.columns[frame.isna().any()].tolist()
+    if missing:
+        raise SchemaError(f"Missing values in {missing}")
+    frame = frame.drop_duplicates()
+    if not frame[target].isin([0, 1]).all():
+        raise SchemaError(f"Target '{target}' must be 0 or 1")
+
+    columns, entries = {}, {}
+    for column, kind in schema.items():
+        columns[column], entries[column] = _store_column(name, column, kind, frame[column])
+    return columns, entries
+
+
+def _cache_path(cache_dir: str, name: str, source_sha256: str) -> str:
+    return os.path.join(cache_dir, f"{name}-{source_sha256[:16]}-p{PREPROCESSING_VERSION}")
+
+
+def _write_store(name: str, source_sha256: str, columns: Dict[str, np.ndarray], entries: Dict, path: str):
+    staging = f"{path}.staging.{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for index, (column, values) in enumerate(columns.items()):
+        np.save(os.path.join(staging, f"{index:03d}.npy"), np.ascontiguousarray(values))
+        entries[column].update(file=f"{index:03d}.npy", dtype=values.dtype.str)
+    manifest = {
+        "dataset": name,
+        "source_sha256": source_sha256,
+        "preprocessing_version": PREPROCESSING_VERSION,
+        "rows": len(next(iter(columns.values()))),
+        "columns": entries,
+    }
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    try:
+        os.rename(staging, path)
+    except OSError:  # Another run wrote the same entry first
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _read_store(name: str, path: str, mmap: bool = True) -> Optional[tuple]:
+    """
+    Open a stored dataset
+
+    Returns:
+        (columns, manifest), or None when there is no entry
+
+    Raises:
+        SchemaError when the entry does not match SCHEMAS or its own manifest
+    """
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    entries = manifest["columns"]
+    expected = SCHEMAS[name]
+    if list(entries) != list(expected) or any(entries[c]["kind"] != k for c, k in expected.items()):
+        raise SchemaError(f"Stored {name} columns do not match the schema; delete {path}")
+    columns = {}
+    for column, entry in entries.items():
+        array = np.load(os.path.join(path, entry["file"]), mmap_mode="r" if mmap else None)
+        if array.dtype.str != entry["dtype"] or array.shape != (manifest["rows"],):
+            raise SchemaError(f"Stored column '{column}' is {array.dtype}{array.shape}, "
+                              f"manifest says {entry['dtype']}({manifest['rows']},)")
+        columns[column] = array
+    return columns, manifest
+
+
+def open_store(name: str = "pima", data_dir: Optional[str] = None, cache_dir: Optional[str] = None,
+               mmap: bool = True) -> tuple:
+    """
+    Typed columns of a dataset, converting the CSV first when the store is missing or stale
+
+    Returns:
+        (columns, manifest, converted) where converted tells whether the CSV was parsed
+
+    Raises:
+        KeyError for unknown dataset names
+        FileNotFoundError if the source CSV is missing
+        SchemaError if the CSV or the stored entry does not match the schema
+    """
+    if name not in DATASETS:
+        raise KeyError(f"Unknown dataset '{name}', expected one of: {', '.join(DATASETS)}")
+    source_path = os.path.join(data_dir or default_data_dir(), DATASETS[name]["filename"])
+    source_sha256 = file_sha256(source_path)
+    path = _cache_path(cache_dir or default_cache_dir(), name, source_sha256)
+
+    stored = _read_store(name, path, mmap)
+    if stored is not None:
+        return stored[0], stored[1], False
+
+    start = time.perf_counter()
+    columns, entries = convert_csv(name, source_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_store(name, source_sha256, columns, entries, path)
+    print(f"✓ Converted {DATASETS[name]['filename']}: {len(next(iter(columns.values())))} rows "
+          f"in {time.perf_counter() - start:.2f}s -> {path}")
+    columns, manifest = _read_store(name, path, mmap)
+    return columns, manifest, True
+
+
+# ==================== Loading ====================
+
+def _decoded(array: np.ndarray, entry: Dict) -> np.ndarray:
+    """Column values as the CSV had them (float32 columns rounded back to their precision)"""
+    if array.dtype == np.float32:
+        return np.round(array.astype(np.float64), entry["decimals"])
+    return array
+
+
+def load_dataset(name: str = "pima", data_dir: Optional[str] = None, cache_dir: Optional[str] = None,
+                 use_cache: bool = True) -> Dataset:
+    """
+    Load a cleaned, encoded dataset for training
+
+    With use_cache=False the CSV is converted in memory and nothing is stored.
+
+    Raises:
+        KeyError for unknown dataset names
+        FileNotFoundError if the source CSV is missing
+        SchemaError if the CSV or the stored entry does not match the schema
+    """
+    if use_cache:
+        columns, manifest, converted = open_store(name, data_dir, cache_dir)
+        entries, source_sha256 = manifest["columns"], manifest["source_sha256"]
+    else:
+        if name not in DATASETS:
+            raise KeyError(f"Unknown dataset '{name}', expected one of: {', '.join(DATASETS)}")
+        source_path = os.path.join(data_dir or default_data_dir(), DATASETS[name]["filename"])
+        source_sha256 = file_sha256(source_path)
+        columns, entries = convert_csv(name, source_path)
+        converted = True
+
+    spec = DATASETS[name]
+    one_hot = spec.get("one_hot", [])
+    encoded: Dict[str, np.ndarray] = {}
+    dummies: Dict[str, np.ndarray] = {}
+    for column, array in columns.items():
+        if column in one_hot:
+            # pd.get_dummies(drop_first=True) over the sorted categories
+            for code, category in enumerate(entries[column]["categories"][1:], start=1):
+                dummies[f"{column}_{category}"] = (array == code).astype(np.uint8)
+        else:
+            # Category codes equal the LabelEncoder values, since categories are sorted
+            encoded[column] = _decoded(array, entries[column])
+    encoded.update(dummies)  # get_dummies appends its columns after the others
+
+    features = [column for column in encoded if column != spec["target"]]
+    return Dataset(name, encoded, features, spec["target"], source_sha256, cached=not converted)
+
+
+def feature_names(name: str) -> List[str]:
+    """Encoded feature columns of a dataset, in training order"""
+    spec = DATASETS[name]
+    one_hot = spec.get("one_hot", [])
+    plain = [column for column in SCHEMAS[name] if column not in one_hot and column != spec["target"]]
+    return plain + [f"{column}_{category}" for column in one_hot for category in CATEGORIES[name][column][1:]]
+
+
+def encode_frame(name: str, frame) -> tuple:
+    """
+    Encode a chunk of raw rows exactly like load_dataset, without de-duplicating
+
+    Returns:
+        (X float64 matrix in feature_names() order, y int64)
+
+    Raises:
+        SchemaError on unexpected columns, missing values or unknown categories
+    """
+    schema = SCHEMAS[name]
+    spec = DATASETS[name]
+    if list(frame.columns) != list(schema):
+        raise SchemaError(f"Columns {list(frame.columns)} do not match the {name} schema {list(schema)}")
+    if frame.isna().to_numpy().any():
+        raise SchemaError(f"Missing values in {frame.columns[frame.isna().any()].tolist()}")
+
+    one_hot = spec.get("one_hot", [])
+    names = feature_names(name)
+    X = np.empty((len(frame), len(names)), dtype=np.float64)
+    index = 0
+    for column, kind in schema.items():
+        if column == spec["target"] or column in one_hot:
+            continue
+        if kind == "category":
+            X[:, index] = _category_codes(column, frame[column], CATEGORIES[name][column])
+        else:
+            X[:, index] = frame[column].to_numpy(dtype=np.float64)
+        index += 1
+    for column in one_hot:
+        codes = _category_codes(column, frame[column], CATEGORIES[name][column])
+        for code in range(1, len(CATEGORIES[name][column])):
+            X[:, index] = codes == code
+            index += 1
+
+    y = frame[spec["target"]].to_numpy()
+    if not np.isin(y, (0, 1)).all():
+        raise SchemaError(f"Target '{spec['target']}' must be 0 or 1")
+    return X, y.astype(np.int64)
+
+
+def load_frame(name: str = "pima", data_dir: Optional[str] = None, cache_dir: Optional[str] = None):
+    """The de-duplicated dataset as a DataFrame with categorical and downcast columns"""
+    import pandas as pd
+
+    columns, manifest, _ = open_store(name, data_dir, cache_dir)
+    data = {}
+    for column, array in columns.items():
+        entry = manifest["columns"][column]
+        if entry["kind"] == "category":
+            data[column] = pd.Categorical.from_codes(array, categories=entry["categories"])
+        else:
+            data[column] = array
+    return pd.DataFrame(data, copy=False)
+
+
+# ==================== Report ====================
+
+def _time_csv(name: str) -> Dict:
+    import pandas as pd
+
+    start = time.perf_counter()
+    frame = pd.read_csv(os.path.join(default_data_dir(), DATASETS[name]["filename"])).drop_duplicates()
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "bytes": int(frame.memory_usage(deep=True).sum())}
+
+
+def _time_store(name: str) -> Dict:
+    start = time.perf_counter()
+    columns, manifest, _ = open_store(name)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "bytes": int(sum(array.nbytes for array in columns.values())),
+            "dtypes": {column: array.dtype.name for column, array in columns.items()}}
+
+
+def report(names: List[str], repeats: int = 5) -> Dict:
+    """Load time and in-memory size of each dataset through pandas.read_csv and through the store"""
+    import pandas  # noqa: F401  Imported up front so neither path pays for it
+
+    results = {}
+    for name in names:
+        open_store(name)  # Make sure the entry exists before timing it
+        csv_runs = [_time_csv(name) for _ in range(repeats)]
+        gc.collect()
+        store_runs = [_time_store(name) for _ in range(repeats)]
+        csv_seconds = float(np.median([run["seconds"] for run in csv_runs]))
+        store_seconds = float(np.median([run["seconds"] for run in store_runs]))
+        csv_bytes, store_bytes = csv_runs[0]["bytes"], store_runs[0]["bytes"]
+        results[name] = {
+            "csv_load_ms": round(csv_seconds * 1000, 2),
+            "store_load_ms": round(store_seconds * 1000, 2),
+            "load_speedup": round(csv_seconds / store_seconds, 1) if store_seconds else None,
+            "csv_memory_bytes": csv_bytes,
+            "store_memory_bytes": store_bytes,
+            "memory_saving": round(1 - store_bytes / csv_bytes, 4),
+            "dtypes": store_runs[0]["dtypes"],
+        }
+        print(f"  {name:<20} load {results[name]['csv_load_ms']:>8.2f} ms -> "
+              f"{results[name]['store_load_ms']:.2f} ms   memory {csv_bytes / 1e6:.2f} MB -> "
+              f"{store_bytes / 1e6:.2f} MB ({results[name]['memory_saving']:.0%} smaller)", file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.dataset", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["convert", "report"])
+    parser.add_argument("--dataset", choices=list(DATASETS), nargs="+", default=list(DATASETS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        for name in args.dataset:
+            columns, manifest, converted = open_store(name)
+            if not converted:
+                print(f"✓ {name} is up to date ({manifest['rows']} rows)")
+        return
+
+    results = report(args.dataset, args.repeats)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
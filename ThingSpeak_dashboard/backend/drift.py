@@ -0,0 +1,322 @@
+"""
+Feature drift between live inputs and the training distribution
+
+Every feature has fixed bins (DRIFT_BINS equal-width bins over FEATURE_RANGES,
+values outside the range counted in the end bins), so recording a value is
+one index computation and one increment, and memory never grows. Missing and
+non-finite values (NaN, inf from the channel) are skipped, never raised. So is
+0 for the features where the Pima data uses it to mean "not measured"
+(ZERO_MEANS_MISSING), both in the reference and in live counts; otherwise the
+placeholders (half of the training Insulin values) would dominate the
+comparison:
+
+    sensors       readings from ThingSpeakClient, each feed entry once
+                  (Glucose, BloodPressure, SkinThickness, Insulin; not the
+                  DiabetesPedigreeFunction, which is sampled from the
+                  training CSV and cannot drift)
+    predictions   the feature rows /api/predict stores, all eight features
+
+Each source keeps its counts in a ring of DRIFT_WINDOW_BUCKETS time buckets
+of DRIFT_BUCKET_SECONDS, so scores describe recent traffic; a bucket is
+cleared when the ring comes back to it. The reference is the same
+histogram computed once from the training data and stored as JSON
+(python -m backend.drift reference). Scores are recomputed from the counts
+at most every DRIFT_EVALUATE_SECONDS, never from stored predictions:
+
+    psi    population stability index, 0.5 added to every bin count
+    ks     largest gap between the two cumulative distributions, at bin edges
+
+Counts are kept per worker process, like the prediction cache.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.drift reference [--dataset pima]
+    python -m backend.drift show
+"""
+import argparse
+import json
+import math
+import numbers
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import settings
+from .metrics import register_gauge
+from .registry import default_models_dir
+
+REFERENCE_VERSION = 2
+REFERENCE_FILENAME = "drift_reference.json"
+DRIFT_BINS = 50
+
+# Feature -> (low, high) of its bins; wide enough for the Pima data and plausible sensor readings
+FEATURE_RANGES = {
+    "Pregnancies": (0.0, 20.0),
+    "Glucose": (0.0, 300.0),
+    "BloodPressure": (0.0, 200.0),
+    "SkinThickness": (0.0, 100.0),
+    "Insulin": (0.0, 900.0),
+    "BMI": (0.0, 70.0),
+    "DiabetesPedigreeFunction": (0.0, 2.5),
+    "Age": (0.0, 100.0),
+}
+FEATURES = list(FEATURE_RANGES)
+_FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+# Features recorded as 0 when they were not measured (in the training data and in sensor gaps)
+ZERO_MEANS_MISSING = frozenset({"Glucose", "BloodPressure", "SkinThickness", "Insulin", "BMI"})
+SOURCES = {
+    "sensors": ["Glucose", "BloodPressure", "SkinThickness", "Insulin"],
+    "predictions": FEATURES,
+}
+
+_LOW = np.array([FEATURE_RANGES[name][0] for name in FEATURES])
+_SCALE = DRIFT_BINS / np.array([FEATURE_RANGES[name][1] - FEATURE_RANGES[name][0] for name in FEATURES])
+
+
+def default_reference_path() -> str:
+    return os.path.join(default_models_dir(), REFERENCE_FILENAME)
+
+
+def bin_index(feature: int, value: float) -> int:
+    """Bin of a value of FEATURES[feature]"""
+    return min(max(int((value - _LOW[feature]) * _SCALE[feature]), 0), DRIFT_BINS - 1)
+
+
+def is_measured(feature: str, value) -> bool:
+    """Whether a value is a real reading (finite, and not a 0 placeholder)"""
+    return (isinstance(value, numbers.Real) and math.isfinite(value)
+            and not (value == 0 and feature in ZERO_MEANS_MISSING))
+
+
+def histogram(feature: str, values: np.ndarray) -> np.ndarray:
+    """Bin counts of many values at once (for the reference); skips what is_measured rejects"""
+    i = _FEATURE_INDEX[feature]
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if feature in ZERO_MEANS_MISSING:
+        values = values[values != 0]
+    index = np.clip(((values - _LOW[i]) * _SCALE[i]).astype(np.int64), 0, DRIFT_BINS - 1)
+    return np.bincount(index, minlength=DRIFT_BINS)
+
+
+# ==================== Scores ====================
+
+def psi(reference: np.ndarray, current: np.ndarray) -> float:
+    """Population stability index of two histograms"""
+    expected = (reference + 0.5) / (reference.sum() + 0.5 * len(reference))
+    actual = (current + 0.5) / (current.sum() + 0.5 * len(current))
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(reference: np.ndarray, current: np.ndarray) -> float:
+    """Kolmogorov-Smirnov statistic at the resolution of the bins"""
+    return float(np.max(np.abs(np.cumsum(reference) / reference.sum() - np.cumsum(current) / current.sum())))
+
+
+def drift_status(score: float, observations: int) -> str:
+    if observations < settings.DRIFT_MIN_OBSERVATIONS:
+        return "insufficient_data"
+    if score >= settings.DRIFT_PSI_ALERT:
+        return "drift"
+    if score >= settings.DRIFT_PSI_WARNING:
+        return "warning"
+    return "stable"
+
+
+# ==================== Reference ====================
+
+def build_reference(dataset_name: str = "pima") -> Dict:
+    """Training histograms of every feature, from the dataset's column store"""
+    from .dataset import load_dataset
+
+    dataset = load_dataset(dataset_name)
+    missing = [name for name in FEATURES if name not in dataset.feature_names]
+    if missing:
+        raise ValueError(f"{dataset_name} has no {', '.join(missing)} column")
+    return {
+        "reference_version": REFERENCE_VERSION,
+        "created": datetime.utcnow().isoformat(),
+        "dataset": dataset.name,
+        "dataset_sha256": dataset.source_sha256,
+        "rows": int(len(dataset.y)),
+        "bins": DRIFT_BINS,
+        "ranges": {name: list(FEATURE_RANGES[name]) for name in FEATURES},
+        "counts": {name: histogram(name, dataset.X[:, dataset.feature_names.index(name)]).tolist()
+                   for name in FEATURES},
+    }
+
+
+def load_reference(path: Optional[str] = None) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Reference counts per feature, or None when the file is missing or was
+    built with different bins (rebuild it with `python -m backend.drift reference`)
+    """
+    path = path or settings.DRIFT_REFERENCE_PATH or default_reference_path()
+    try:
+        with open(path) as f:
+            reference = json.load(f)
+    except FileNotFoundError:
+        return None
+    ranges = {name: list(FEATURE_RANGES[name]) for name in FEATURES}
+    if (reference.get("reference_version") != REFERENCE_VERSION or reference.get("bins") != DRIFT_BINS
+            or reference.get("ranges") != ranges):
+        print(f"⚠ Drift reference {path} uses other bins; rebuild it")
+        return None
+    return {name: np.array(counts, dtype=np.int64) for name, counts in reference["counts"].items()}
+
+
+# ==================== Monitor ====================
+
+class WindowedHistograms:
+    """Per-feature bin counts over the last `buckets` time buckets of `bucket_seconds`"""
+
+    def __init__(self, buckets: int, bucket_seconds: float):
+        self.bucket_seconds = bucket_seconds
+        self.counts = np.zeros((buckets, len(FEATURES), DRIFT_BINS), dtype=np.int64)
+        self.bucket_ids = np.full(buckets, -1, dtype=np.int64)
+        self.observed = 0
+
+    def _slot(self, now: float) -> int:
+        bucket_id = int(now // self.bucket_seconds)
+        slot = bucket_id % len(self.bucket_ids)
+        if self.bucket_ids[slot] != bucket_id:
+            # The ring came back around: this slot held a bucket that left the window
+            self.counts[slot] = 0
+            self.bucket_ids[slot] = bucket_id
+        return slot
+
+    def add(self, values: Dict[str, float], now: float):
+        counts = self.counts[self._slot(now)]
+        for name, value in values.items():
+            i = _FEATURE_INDEX[name]
+            counts[i, bin_index(i, value)] += 1
+        self.observed += 1
+
+    def window(self, now: float) -> np.ndarray:
+        """Counts per feature and bin over the buckets still in the window"""
+        oldest = int(now // self.bucket_seconds) - len(self.bucket_ids) + 1
+        return self.counts[self.bucket_ids >= oldest].sum(axis=0)
+
+
+class DriftMonitor:
+    """Streaming feature histograms per source, scored against the training reference"""
+
+    def __init__(self, reference_loader=load_reference, buckets: Optional[int] = None,
+                 bucket_seconds: Optional[float] = None, evaluate_seconds: Optional[float] = None):
+        buckets = buckets or settings.DRIFT_WINDOW_BUCKETS
+        bucket_seconds = bucket_seconds or settings.DRIFT_BUCKET_SECONDS
+        self.evaluate_seconds = settings.DRIFT_EVALUATE_SECONDS if evaluate_seconds is None else evaluate_seconds
+        self.window_seconds = buckets * bucket_seconds
+        self._sources = {source: WindowedHistograms(buckets, bucket_seconds) for source in SOURCES}
+        self._reference_loader = reference_loader
+        self._reference: Optional[Dict[str, np.ndarray]] = None
+        self._reference_loaded = False
+        self._scores: Optional[Dict] = None
+        self._scored_at = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, source: str, values: Dict[str, float]):
+        """Count one reading; untracked features and unmeasured values (see is_measured) are ignored"""
+        tracked = {}
+        for name in SOURCES[source]:
+            value = values.get(name)
+            if is_measured(name, value):
+                tracked[name] = float(value)
+        with self._lock:
+            self._sources[source].add(tracked, time.time())
+
+    def reference(self) -> Optional[Dict[str, np.ndarray]]:
+        if not self._reference_loaded:
+            self._reference = self._reference_loader()
+            self._reference_loaded = True
+        return self._reference
+
+    def scores(self) -> Dict:
+        """PSI and KS per source and feature, recomputed at most every evaluate_seconds"""
+        with self._lock:
+            if self._scores is not None and time.monotonic() - self._scored_at < self.evaluate_seconds:
+                return self._scores
+            now = time.time()
+            windows = {source: (h.window(now), h.observed) for source, h in self._sources.items()}
+        reference = self.reference()
+
+        result = {
+            "evaluated_at": datetime.utcnow().isoformat(),
+            "window_seconds": self.window_seconds,
+            "reference_available": reference is not None,
+            "thresholds": {"psi_warning": settings.DRIFT_PSI_WARNING, "psi_alert": settings.DRIFT_PSI_ALERT,
+                           "min_observations": settings.DRIFT_MIN_OBSERVATIONS},
+            "sources": {},
+        }
+        for source, (counts, observed) in windows.items():
+            features = {}
+            for name in SOURCES[source]:
+                current = counts[_FEATURE_INDEX[name]]
+                n = int(current.sum())
+                entry = {"observations": n}
+                if reference is not None and n:
+                    entry["psi"] = round(psi(reference[name], current), 4)
+                    entry["ks"] = round(ks(reference[name], current), 4)
+                    entry["status"] = drift_status(entry["psi"], n)
+                features[name] = entry
+            statuses = [entry.get("status") for entry in features.values()]
+            result["sources"][source] = {
+                "observed_total": observed,
+                "status": next((s for s in ("drift", "warning", "stable") if s in statuses), "insufficient_data"),
+                "features": features,
+            }
+        with self._lock:
+            self._scores, self._scored_at = result, time.monotonic()
+        return result
+
+    def max_psi(self) -> float:
+        """Largest PSI of any feature with enough observations (for the metrics gauge)"""
+        values = [entry["psi"] for source in self.scores()["sources"].values()
+                  for entry in source["features"].values()
+                  if "psi" in entry and entry["observations"] >= settings.DRIFT_MIN_OBSERVATIONS]
+        return max(values, default=0.0)
+
+
+# Create global drift monitor instance
+drift_monitor = DriftMonitor()
+
+register_gauge("diasense_feature_drift_max_psi", "Largest PSI of any live feature against the training data",
+               drift_monitor.max_psi)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.drift", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    reference_parser = subparsers.add_parser("reference", help="Build the training reference histograms")
+    reference_parser.add_argument("--dataset", default="pima")
+    reference_parser.add_argument("--output", help="Default: DRIFT_REFERENCE_PATH or output/models/"
+                                                   + REFERENCE_FILENAME)
+    subparsers.add_parser("show", help="Summarize the stored reference")
+    args = parser.parse_args(argv)
+
+    if args.command == "reference":
+        reference = build_reference(args.dataset)
+        path = args.output or settings.DRIFT_REFERENCE_PATH or default_reference_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(reference, f)
+        print(f"✓ Wrote {path} ({reference['rows']} rows of {reference['dataset']}, {DRIFT_BINS} bins per feature)")
+    else:
+        reference = load_reference()
+        if reference is None:
+            raise SystemExit("✗ No usable drift reference; run `python -m backend.drift reference`")
+        for name in FEATURES:
+            low, high = FEATURE_RANGES[name]
+            counts = reference[name]
+            centers = low + (np.arange(DRIFT_BINS) + 0.5) * (high - low) / DRIFT_BINS
+            mean = float((counts * centers).sum() / counts.sum())
+            print(f"{name:<26} rows={int(counts.sum()):<6} mean≈{mean:.2f} "
+                  f"ends={int(counts[0])}/{int(counts[-1])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Streaming exports of a user's prediction history
+
+Records arrive a page at a time (database.iter_user_prediction_records) and
+every page is encoded and handed to the response before the next one is
+read, so memory use depends on EXPORT_PAGE_SIZE rather than on how many
+predictions the user has.
+
+    csv      one header row, then one row per prediction
+    parquet  one row group per page (needs pyarrow, an optional dependency)
+"""
+import csv
+import io
+from typing import Iterable, Iterator, List
+
+from .predictor import DiabetesPredictor
+
+# Column order of both formats
+EXPORT_COLUMNS = [
+    "id", "timestamp", "model_version", "prediction_result", "confidence", "risk_level",
+    "pregnancies", "glucose", "blood_pressure", "skin_thickness", "insulin", "bmi",
+    "diabetes_pedigree_function", "age",
+]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs a library that is not installed"""
+
+
+def _rows(records: Iterable[dict]) -> List[list]:
+    get_risk_level = DiabetesPredictor.get_risk_level
+    rows = []
+    for record in records:
+        row = [record.get(column) for column in EXPORT_COLUMNS]
+        if row[5] is None:  # Records stored before risk_level was precomputed
+            row[5] = get_risk_level(record["prediction_result"], record["confidence"])
+        rows.append(row)
+    return rows
+
+
+def stream_csv(pages: Iterable[List[dict]]) -> Iterator[bytes]:
+    """CSV bytes, one chunk per page of records"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for records in pages:
+        writer.writerows(_rows(records))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # Header only: the user has no predictions
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable file that collects what was written until drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("id", pa.string()),
+        ("timestamp", pa.string()),
+        ("model_version", pa.string()),
+        ("prediction_result", pa.int8()),
+        ("confidence", pa.float64()),
+        ("risk_level", pa.string()),
+        ("pregnancies", pa.int16()),
+        ("glucose", pa.float64()),
+        ("blood_pressure", pa.float64()),
+        ("skin_thickness", pa.float64()),
+        ("insulin", pa.float64()),
+        ("bmi", pa.float64()),
+        ("diabetes_pedigree_function", pa.float64()),
+        ("age", pa.int16()),
+    ])
+
+
+def stream_parquet(pages: Iterable[List[dict]]) -> Iterator[bytes]:
+    """
+    Parquet bytes, one row group per page of records, footer last
+
+    Raises:
+        ExportUnavailable when pyarrow is not installed (raised on creation,
+        before any record is read, so the endpoint can still answer with an error)
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailable("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = _parquet_schema(pa)
+
+    def chunks():
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for records in pages:
+                columns = list(zip(*_rows(records)))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema,
+                ))
+                yield sink.drain()
+        yield sink.drain()
+
+    return chunks()
@@ -0,0 +1,241 @@
+"""
+Out-of-core training of a logistic model on chunked data
+
+Rows are streamed from a CSV (pandas chunks) or a Parquet file (pyarrow record
+batches, optional dependency) and encoded chunk by chunk with the dataset's
+fixed schema (dataset.encode_frame), so memory depends on --chunk-rows and
+never on the size of the file:
+
+    pass 1        StandardScaler.partial_fit on the training rows
+    passes 2..    SGDClassifier(loss="log_loss").partial_fit on scaled training
+                  rows, once per epoch, rows shuffled within each chunk
+    last pass     the held-out rows are scored with the final model
+
+Validation rows are held out per class as they stream by (every k-th row of
+each class), so the split is stratified, identical on every pass and needs no
+index. ROC-AUC on them is computed from a fixed 1000-bin score histogram.
+Duplicates are not removed, since that would need the whole history.
+
+The model is saved like backend.training does: a StandardScaler +
+SGDClassifier pipeline, which the compact artifact format exports as a
+linear model.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.incremental --dataset diabetes_prediction --chunk-rows 10000 --epochs 5
+    python -m backend.incremental --source history.parquet --dataset pima --activate
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .dataset import DATASETS, SERVED_FEATURES, default_data_dir, encode_frame, feature_names
+from .training import RANDOM_STATE, save_model
+
+
+def iter_chunks(source: str, dataset_name: str, chunk_rows: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Encoded (X, y) chunks of at most chunk_rows rows from a CSV or Parquet file"""
+    if source.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("✗ Reading Parquet needs pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield encode_frame(dataset_name, batch.to_pandas())
+    else:
+        import pandas as pd
+        for frame in pd.read_csv(source, chunksize=chunk_rows):
+            yield encode_frame(dataset_name, frame)
+
+
+class StreamingHoldout:
+    """Stratified hold-out decided row by row: every k-th row of each class is held out"""
+
+    def __init__(self, fraction: float):
+        self.fraction = fraction
+        self.seen: Dict[int, int] = {}
+
+    def split(self, y: np.ndarray) -> np.ndarray:
+        """Boolean mask of the rows of this chunk that are held out"""
+        mask = np.zeros(len(y), dtype=bool)
+        for label in np.unique(y):
+            rows = np.flatnonzero(y == label)
+            before = self.seen.get(int(label), 0)
+            position = before + np.arange(1, len(rows) + 1)
+            # Held out whenever the running count of this class crosses a multiple of 1/fraction
+            mask[rows] = np.floor(position * self.fraction) > np.floor((position - 1) * self.fraction)
+            self.seen[int(label)] = before + len(rows)
+        return mask
+
+
+class ScoreHistogram:
+    """Accuracy, log loss and ROC-AUC of streamed predictions in constant memory"""
+
+    def __init__(self, bins: int = 1000):
+        self.bins = bins
+        self.positive = np.zeros(bins, dtype=np.int64)
+        self.negative = np.zeros(bins, dtype=np.int64)
+        self.correct = 0
+        self.log_loss_sum = 0.0
+
+    def add(self, probabilities: np.ndarray, y: np.ndarray):
+        index = np.minimum((probabilities * self.bins).astype(np.int64), self.bins - 1)
+        self.positive += np.bincount(index[y == 1], minlength=self.bins)
+        self.negative += np.bincount(index[y == 0], minlength=self.bins)
+        self.correct += int(((probabilities >= 0.5) == (y == 1)).sum())
+        clipped = np.clip(probabilities, 1e-15, 1 - 1e-15)
+        self.log_loss_sum += float(-(y * np.log(clipped) + (1 - y) * np.log(1 - clipped)).sum())
+
+    @property
+    def count(self) -> int:
+        return int(self.positive.sum() + self.negative.sum())
+
+    def roc_auc(self) -> Optional[float]:
+        """Probability a positive outscores a negative; ties within a bin count half"""
+        positives, negatives = self.positive.sum(), self.negative.sum()
+        if not positives or not negatives:
+            return None
+        negatives_below = np.cumsum(self.negative) - self.negative
+        wins = (self.positive * negatives_below).sum() + 0.5 * (self.positive * self.negative).sum()
+        return float(wins / (positives * negatives))
+
+    def summary(self) -> Dict:
+        count = self.count
+        return {
+            "rows": count,
+            "accuracy": round(self.correct / count, 4) if count else None,
+            "roc_auc": round(self.roc_auc(), 4) if self.roc_auc() is not None else None,
+            "log_loss": round(self.log_loss_sum / count, 4) if count else None,
+        }
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process, or None where it cannot be read"""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KiB on Linux
+
+
+def train_incremental(source: str, dataset_name: str, chunk_rows: int = 10000, epochs: int = 5,
+                      validation_fraction: float = 0.1, alpha: float = 1e-4):
+    """
+    Fit a StandardScaler + SGD logistic model without loading the data at once
+
+    Returns:
+        (fitted pipeline, metadata dict)
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    start = time.perf_counter()
+    rss_before = _peak_rss_mb()
+    scaler = StandardScaler()
+    holdout = StreamingHoldout(validation_fraction)
+    train_rows = chunks = 0
+    for X, y in iter_chunks(source, dataset_name, chunk_rows):
+        held_out = holdout.split(y)
+        if (~held_out).any():
+            scaler.partial_fit(X[~held_out])
+        train_rows += int((~held_out).sum())
+        chunks += 1
+    if not train_rows:
+        raise ValueError(f"No training rows in {source}")
+    print(f"✓ Scaler fitted on {train_rows} rows in {chunks} chunks")
+
+    model = SGDClassifier(loss="log_loss", alpha=alpha, random_state=RANDOM_STATE)
+    rng = np.random.default_rng(RANDOM_STATE)
+    epoch_log = []
+    for epoch in range(epochs):
+        holdout = StreamingHoldout(validation_fraction)
+        progressive = ScoreHistogram()
+        for X, y in iter_chunks(source, dataset_name, chunk_rows):
+            held_out = holdout.split(y)
+            if epoch and held_out.any():
+                # Progressive validation: the model as it stands before this chunk
+                progressive.add(model.predict_proba(scaler.transform(X[held_out]))[:, 1], y[held_out])
+            order = rng.permutation(np.flatnonzero(~held_out))
+            if len(order):
+                model.partial_fit(scaler.transform(X[order]), y[order], classes=np.array([0, 1]))
+        epoch_log.append({"epoch": epoch + 1, **(progressive.summary() if epoch else {})})
+        if epoch:
+            print(f"  epoch {epoch + 1}: hold-out log loss {epoch_log[-1]['log_loss']}, "
+                  f"ROC-AUC {epoch_log[-1]['roc_auc']}")
+
+    holdout = StreamingHoldout(validation_fraction)
+    validation = ScoreHistogram()
+    for X, y in iter_chunks(source, dataset_name, chunk_rows):
+        held_out = holdout.split(y)
+        if held_out.any():
+            validation.add(model.predict_proba(scaler.transform(X[held_out]))[:, 1], y[held_out])
+    scores = validation.summary()
+
+    pipeline = Pipeline([("standardscaler", scaler), ("sgdclassifier", model)])
+    names = feature_names(dataset_name)
+    rss_after = _peak_rss_mb()
+    metadata = {
+        "model_type": "SGDClassifier",
+        "model_name": "sgd_logistic",
+        "params": {"loss": "log_loss", "alpha": alpha, "epochs": epochs},
+        "accuracy": scores["accuracy"],
+        "roc_auc": scores["roc_auc"],
+        "validation": scores,
+        "epochs": epoch_log,
+        "dataset": dataset_name,
+        "source": os.path.abspath(source),
+        "source_bytes": os.path.getsize(source),
+        "feature_names": names,
+        "n_train": train_rows,
+        "n_test": scores["rows"],
+        "chunk_rows": chunk_rows,
+        "peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+        "peak_rss_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+        "timings_seconds": {"total": round(time.perf_counter() - start, 3)},
+        "trained_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return pipeline, metadata
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.incremental", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", choices=list(DATASETS), default="pima",
+                        help="Schema and encoding of the rows")
+    parser.add_argument("--source", help="CSV or Parquet file (default: the dataset's CSV in data/)")
+    parser.add_argument("--chunk-rows", type=int, default=10000)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--validation-fraction", type=float, default=0.1)
+    parser.add_argument("--alpha", type=float, default=1e-4, help="SGD L2 regularization")
+    parser.add_argument("--activate", action="store_true", help="Serve the new version right away")
+    parser.add_argument("--dry-run", action="store_true", help="Train and report without writing a model")
+    args = parser.parse_args(argv)
+
+    source = args.source or os.path.join(default_data_dir(), DATASETS[args.dataset]["filename"])
+    model, metadata = train_incremental(source, args.dataset, args.chunk_rows, args.epochs,
+                                        args.validation_fraction, args.alpha)
+    peak_rss = (f"peak RSS {metadata['peak_rss_mb']} MB" if metadata["peak_rss_mb"] is not None
+                else "peak RSS not measured (install psutil on Windows)")
+    print(f"✓ Hold-out ({metadata['n_test']} rows): accuracy {metadata['accuracy']}, "
+          f"ROC-AUC {metadata['roc_auc']}; {peak_rss} in {metadata['timings_seconds']['total']}s")
+    if args.dry_run:
+        return
+    servable = metadata["feature_names"] == SERVED_FEATURES
+    if args.activate and not servable:
+        print(f"⚠ {args.dataset} models cannot be served; --activate ignored")
+    location = save_model(model, metadata, servable, activate=args.activate)
+    print(f"✓ Saved {location}" + (" (active)" if args.activate and servable else ""))
+
+
+if __name__ == "__main__":
+    main()
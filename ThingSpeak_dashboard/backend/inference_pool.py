@@ -0,0 +1,122 @@
+"""
+Process-pool inference workers
+
+Keeps CPU-bound predict_proba calls (RandomForest, XGBoost) off the API event loop.
+Workers are forked after the model is loaded, so its parameter arrays are shared
+copy-on-write instead of being copied into every worker. Where fork is unavailable
+(Windows), workers memory-map the compact artifact (or the pickle, via joblib's
+mmap_mode), so the page cache holds one copy for all of them.
+
+The API server starts it when INFERENCE_WORKERS > 0; /api/predict reaches it
+through DiabetesPredictor.predict_from_features_async.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .artifact import load_model_path
+
+# Model inherited from the parent at fork time: (version, model)
+_inherited: Optional[Tuple[str, object]] = None
+
+# Models loaded inside a worker process, keyed by version
+_worker_models: Dict[str, object] = {}
+
+
+class InferencePoolSaturated(Exception):
+    """Raised when the bounded dispatch queue is full"""
+
+
+def _init_worker(version: str, model_path: str):
+    """Pool initializer: adopt the inherited model or map the artifact from disk"""
+    if _inherited is not None and _inherited[0] == version:
+        _worker_models[version] = _inherited[1]
+    else:
+        _worker_models[version] = load_model_path(model_path)
+
+
+def _predict_proba(version: str, model_path: str, rows: np.ndarray) -> np.ndarray:
+    """Runs inside a worker process"""
+    model = _worker_models.get(version)
+    if model is None:
+        _worker_models.clear()
+        model = _worker_models[version] = load_model_path(model_path)
+    return model.predict_proba(rows)
+
+
+class InferencePool:
+    """Bounded dispatcher in front of a pool of inference processes"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._version: Optional[str] = None
+        self._model_path: Optional[str] = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def start(self, version: str, model, model_path: str):
+        """
+        (Re)start workers serving the given model version
+
+        Tasks already dispatched to a previous pool complete on that pool.
+        """
+        global _inherited
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+        with self._lock:
+            _inherited = (version, model)
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(version, model_path),
+            )
+            previous, self._executor = self._executor, executor
+            self._version, self._model_path = version, model_path
+
+        if previous is not None:
+            previous.shutdown(wait=False)
+        print(f"✓ Inference pool started: {self.workers} workers ({context.get_start_method()}), model {version}")
+
+    def submit(self, rows: np.ndarray) -> Future:
+        """
+        Dispatch a predict_proba call for the served version
+
+        Raises:
+            InferencePoolSaturated if max_pending calls are already queued
+        """
+        if not self._slots.acquire(blocking=False):
+            raise InferencePoolSaturated(f"{self.max_pending} inference calls already pending")
+        try:
+            with self._lock:
+                future = self._executor.submit(_predict_proba, self._version, self._model_path, rows)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def predict_proba(self, rows: np.ndarray) -> np.ndarray:
+        """Awaitable predict_proba that never blocks the event loop"""
+        return await asyncio.wrap_future(self.submit(rows))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
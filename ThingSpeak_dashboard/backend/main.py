@@ -1,28 +1,46 @@
 """
 FastAPI main application
 """
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 from datetime import datetime, timedelta
-from typing import List
-import json
-import random
-import os
+from typing import List, Optional
+
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from .config import settings
 from .database import (
     get_db, init_db, User, Prediction,
-    create_user, get_user_by_username, create_prediction, get_user_predictions
+    create_user, get_user_by_username, create_prediction, get_user_prediction_records,
+    iter_user_prediction_records, get_analytics_aggregates
 )
 from .models import (
-    UserSignup, UserLogin, UserBase, TokenResponse, UserProfile,
-    PredictionResponse, PredictionHistory, ThingSpeakData
+    UserSignup, UserLogin, TokenResponse, UserProfile, PredictionResponse,
+    ModelRegistryStatus, PredictionCacheStats, PredictionHistoryItem
 )
 from .auth import (
-    hash_password, authenticate_user, create_access_token, get_current_user
+    hash_password, authenticate_user, create_access_token, decode_access_token,
+    get_current_user, get_current_admin, get_user_from_token
+)
+from .thingspeak import ThingSpeakClient, get_thingspeak_client
+from .predictor import DiabetesPredictor, predictor, get_predictor
+from .registry import model_registry
+from .samples import SamplePool, sample_pool, get_sample_pool
+from .readiness import warm_up
+from .responses import (
+    JSONBytesResponse, SelectiveGZipMiddleware, encode_history, encode_profile,
+    make_etag, not_modified, etag_headers
 )
-from .thingspeak import thingspeak_client
-from .predictor import predictor
+from .stream import stream_hub
+from .analytics import AggregatesCache, DEFAULT_PERCENTILES, risk_distribution, glucose_summary
+from .export import EXPORT_FORMATS, ExportUnavailable, stream_csv, stream_parquet
+from .drift import drift_monitor
+from .metrics import MetricsMiddleware, render_metrics
+from .profiling import ServerTimingMiddleware, ProfilerBusy, profiler
+from .admission import AdmissionControlMiddleware, build_limiters, client_key_from_scope
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -31,6 +49,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Bounded concurrency and fair queueing for login, signup, predict and latest reading
+# (innermost, so shed requests still get CORS headers and are counted in /metrics)
+admission_limiters = build_limiters(settings.ADMISSION_LIMITS, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                                    settings.ADMISSION_MAX_PER_CLIENT)
+app.add_middleware(AdmissionControlMiddleware, limiters=admission_limiters,
+                   client_key=lambda scope: client_key_from_scope(scope, decode_access_token))
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -40,16 +65,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large payloads such as long prediction histories
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE,
+                   exclude_paths=["/api/stream"])
+
+# Per-route request/error counters and latency histograms (exposed at /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Per-request stage breakdown (Server-Timing header) and slow request log
+app.add_middleware(ServerTimingMiddleware, slow_request_ms=settings.SLOW_REQUEST_MS,
+                   header=settings.SERVER_TIMING_HEADER)
+
+
+def _load_samples():
+    if not len(sample_pool):  # Already loaded when preforked by backend.serve
+        sample_pool.load()
+
+
+# Run after startup on a background thread; GET /ready reports their progress.
+# Each service also initializes itself on first use if a request gets there first.
+warm_up.add("database", init_db)
+warm_up.add("model", predictor.warm_up)
+warm_up.add("samples", _load_samples)
+warm_up.add("thingspeak_dataset", lambda: get_thingspeak_client().dpf_values)
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
+    """Start background services and warm-up"""
     print("🚀 Starting Diabetes Prediction API...")
-    init_db()
-    print("✓ Database initialized")
     print(f"✓ ThingSpeak Channel: {settings.THINGSPEAK_CHANNEL_ID}")
     print(f"✓ JWT Expiration: {settings.JWT_EXPIRATION_DAYS} days")
-    print("✓ API ready!")
+    predictor.start_pool(settings.INFERENCE_WORKERS, settings.INFERENCE_MAX_PENDING)
+    warm_up.start()
+    predictor.start_watcher(settings.MODEL_WATCH_INTERVAL_SECONDS)
+    predictor.start_shadow(settings.SHADOW_MODEL_VERSIONS)
+    print("✓ API accepting requests (warming up, see /ready)")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background inference workers"""
+    predictor.stop_pool()
+    predictor.shadow.shutdown()
 
 
 @app.get("/")
@@ -70,7 +128,7 @@ async def signup(user_data: UserSignup, db = Depends(get_db)):
     Register a new user with profile data
     """
     # Check if username already exists
-    existing_user = get_user_by_username(user_data.username)
+    existing_user = await run_in_threadpool(get_user_by_username, user_data.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -80,14 +138,14 @@ async def signup(user_data: UserSignup, db = Depends(get_db)):
     # Create new user
     new_user = User(
         username=user_data.username,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await run_in_threadpool(hash_password, user_data.password),
         pregnancies=user_data.pregnancies,
         weight_kg=user_data.weight_kg,
         height_m=user_data.height_m,
         age=user_data.age
     )
     
-    new_user = create_user(new_user)
+    new_user = await run_in_threadpool(create_user, new_user)
     
     # Create access token
     access_token = create_access_token(
@@ -114,7 +172,8 @@ async def login(credentials: UserLogin, db = Depends(get_db)):
     """
     Login with username and password
     """
-    user = authenticate_user(credentials.username, credentials.password)
+    # Firebase lookup and bcrypt run off the event loop so admission limits bind
+    user = await run_in_threadpool(authenticate_user, credentials.username, credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -143,39 +202,43 @@ async def login(credentials: UserLogin, db = Depends(get_db)):
 
 
 @app.get("/api/auth/me", response_model=UserProfile)
-async def get_current_user_profile(current_user: User = Depends(get_current_user)):
+async def get_current_user_profile(request: Request, current_user: User = Depends(get_current_user)):
     """
     Get current user profile (read-only)
     """
-    return {
-        "id": current_user.id,
-        "username": current_user.username,
-        "pregnancies": current_user.pregnancies,
-        "weight_kg": current_user.weight_kg,
-        "height_m": current_user.height_m,
-        "age": current_user.age,
-        "bmi": current_user.bmi,
-        "created_at": current_user.created_at
-    }
+    etag = make_etag("profile", current_user.id, current_user.created_at, current_user.pregnancies,
+                     current_user.weight_kg, current_user.height_m, current_user.age)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    return JSONBytesResponse(encode_profile(current_user), headers=etag_headers(etag))
 
 
 # ==================== ThingSpeak Endpoints ====================
 
 @app.get("/api/thingspeak/latest")
-async def get_thingspeak_data(current_user: User = Depends(get_current_user)):
+async def get_thingspeak_data(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    thingspeak: ThingSpeakClient = Depends(get_thingspeak_client)
+):
     """
     Fetch latest sensor data from ThingSpeak
     """
     try:
-        data = thingspeak_client.fetch_latest_data()
-        return {
+        data = await run_in_threadpool(thingspeak.fetch_latest_data)
+        etag = make_etag("thingspeak", data.get("entry_id"), data.get("timestamp"))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        return JSONBytesResponse(orjson.dumps({
             "Glucose": data.get("field1"),
             "BloodPressure": data.get("field2"),
             "SkinThickness": data.get("field3"),
             "Insulin": data.get("field4"),
             "DiabetesPedigreeFunction": data.get("field5"),
             "timestamp": data.get("timestamp")
-        }
+        }), headers=etag_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -186,11 +249,14 @@ async def get_thingspeak_data(current_user: User = Depends(get_current_user)):
 
 
 @app.get("/api/thingspeak/status")
-async def get_thingspeak_status(current_user: User = Depends(get_current_user)):
+async def get_thingspeak_status(
+    current_user: User = Depends(get_current_user),
+    thingspeak: ThingSpeakClient = Depends(get_thingspeak_client)
+):
     """
     Get status of ThingSpeak sensor fields
     """
-    return thingspeak_client.get_field_status()
+    return thingspeak.get_field_status()
 
 
 # ==================== Prediction Endpoints ====================
@@ -198,46 +264,24 @@ async def get_thingspeak_status(current_user: User = Depends(get_current_user)):
 @app.post("/api/predict", response_model=PredictionResponse)
 async def make_prediction(
     current_user: User = Depends(get_current_user),
-    db = Depends(get_db)
+    db = Depends(get_db),
+    samples: SamplePool = Depends(get_sample_pool)
 ):
     """
-    Return random sample data from test samples (no model prediction)
+    Predict on the next test sample (with the user's age) using the served model
     """
-    # Load test samples
-    backend_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(os.path.dirname(backend_dir))
-    samples_path = os.path.join(project_dir, "data", "test_samples.json")
+    # Pick the next preloaded sample (random, seeded or sequential replay)
+    sample = samples.next()
     
-    if not os.path.exists(samples_path):
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Test samples not found"
-        )
-    
-    with open(samples_path, 'r') as f:
-        samples = json.load(f)
+    # Features are already typed; use user's age instead of sample's age
+    features_typed = dict(sample.features, Age=current_user.age)
+    drift_monitor.observe("predictions", features_typed)
     
-    # Pick random sample
-    random_sample = random.choice(samples)
+    # Inference runs on the worker pool when INFERENCE_WORKERS > 0
+    prediction, confidence, _, model_version = await predictor.predict_from_features_async(features_typed)
+    risk_level = DiabetesPredictor.get_risk_level(prediction, confidence)
     
-    # Use actual outcome as "prediction"
-    prediction = int(random_sample["Outcome"])
-    confidence = 1.0  # Since it's actual data
-    risk_level = "High Risk" if prediction == 1 else "Low Risk"
-    
-    # Convert features to proper types
-    features_typed = {
-        "Pregnancies": int(random_sample["Pregnancies"]),
-        "Glucose": float(random_sample["Glucose"]),
-        "BloodPressure": float(random_sample["BloodPressure"]),
-        "SkinThickness": float(random_sample["SkinThickness"]),
-        "Insulin": float(random_sample["Insulin"]),
-        "BMI": float(random_sample["BMI"]),
-        "DiabetesPedigreeFunction": float(random_sample["DiabetesPedigreeFunction"]),
-        "Age": current_user.age  # Use user's age instead of sample's age
-    }
-    
-    # Save to history (using actual outcome)
+    # Save to history
     new_prediction = Prediction(
         user_id=current_user.id,
         pregnancies=features_typed["Pregnancies"],
@@ -249,21 +293,68 @@ async def make_prediction(
         diabetes_pedigree_function=features_typed["DiabetesPedigreeFunction"],
         age=features_typed["Age"],
         prediction_result=prediction,
-        confidence=confidence
+        confidence=confidence,
+        model_version=model_version,
+        risk_level=risk_level
     )
     
-    new_prediction = create_prediction(new_prediction)
+    new_prediction = await run_in_threadpool(create_prediction, new_prediction)
+    
+    # Push to the user's open dashboards
+    stream_hub.publish_prediction(new_prediction.to_dict())
     
     return PredictionResponse(
         prediction=prediction,
         probability=confidence,
         risk_level=risk_level,
-        features_used=features_typed
+        features_used=features_typed,
+        model_version=model_version
     )
 
 
-@app.get("/api/predictions/history")
+# ==================== Streaming Endpoint ====================
+
+@app.get("/api/stream")
+async def stream_events(request: Request, token: Optional[str] = None):
+    """
+    Server-Sent Events: new ThingSpeak readings for everyone, new predictions for their owner
+    
+    EventSource cannot set headers, so the JWT may be passed as ?token=; it is
+    checked once when the stream opens.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user = await run_in_threadpool(get_user_from_token, token)
+    
+    async def events():
+        subscriber = stream_hub.subscribe(user.id)
+        try:
+            yield b"retry: 5000\n\n"
+            if stream_hub.latest_reading:
+                yield stream_hub.latest_reading
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(),
+                                                 timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            stream_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/api/predictions/history", response_model=List[PredictionHistoryItem])
 async def get_prediction_history(
+    request: Request,
     limit: int = 20,
     current_user: User = Depends(get_current_user),
     db = Depends(get_db)
@@ -271,29 +362,220 @@ async def get_prediction_history(
     """
     Get user's prediction history (sorted by timestamp, latest first)
     """
-    predictions = get_user_predictions(current_user.id, limit)
+    # The user record tracks its newest prediction, so an unchanged history
+    # is answered without reading predictions at all
+    if current_user.latest_prediction_id:
+        etag = make_etag("history", current_user.id, current_user.latest_prediction_id, limit)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
     
-    # Convert to dict format matching frontend expectations
-    return [
-        {
-            "id": pred.id,
-            "timestamp": pred.timestamp,
-            "prediction": pred.prediction_result,
-            "probability": pred.confidence,
-            "risk_level": predictor.get_risk_level(pred.prediction_result, pred.confidence),
-            "features_used": {
-                "Pregnancies": pred.pregnancies,
-                "Glucose": pred.glucose,
-                "BloodPressure": pred.blood_pressure,
-                "SkinThickness": pred.skin_thickness,
-                "Insulin": pred.insulin,
-                "BMI": pred.bmi,
-                "DiabetesPedigreeFunction": pred.diabetes_pedigree_function,
-                "Age": pred.age
-            }
-        }
-        for pred in predictions
-    ]
+    records = await run_in_threadpool(get_user_prediction_records, current_user.id, limit)
+    etag = make_etag("history", current_user.id, records[0]["id"] if records else "", limit)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    # Encoded straight from stored records, in the format the frontend expects
+    return JSONBytesResponse(encode_history(records), headers=etag_headers(etag))
+
+
+@app.get("/api/predictions/export")
+async def export_predictions(
+    format: str = "csv",
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Download the user's whole prediction history as CSV or Parquet
+    
+    The file is streamed while predictions are read page by page, so long
+    histories are never held in memory at once. Rows are in storage order.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format '{format}', use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    media_type, extension = EXPORT_FORMATS[format]
+    
+    pages = iter_user_prediction_records(current_user.id, settings.EXPORT_PAGE_SIZE)
+    try:
+        body = stream_csv(pages) if format == "csv" else stream_parquet(pages)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    
+    # A sync iterator: Starlette reads each page in the threadpool
+    filename = f"predictions-{current_user.username}-{datetime.utcnow():%Y%m%d}.{extension}"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+    })
+
+
+# ==================== Admin Endpoints ====================
+
+# Materialized population aggregates, maintained by create_prediction
+analytics_aggregates = AggregatesCache(get_analytics_aggregates, settings.ANALYTICS_CACHE_SECONDS)
+
+def _registry_status() -> dict:
+    # Measured by python -m backend.comparison; absent until a report covers the version
+    costs = model_registry.serving_costs()
+    return {
+        "active_version": model_registry.active_version(),
+        "serving_version": predictor.model_version,
+        "versions": [{**v.to_dict(), "serving_cost": costs.get(v.version)}
+                     for v in model_registry.list_versions()]
+    }
+
+
+@app.get("/api/admin/models", response_model=ModelRegistryStatus)
+async def get_model_registry(admin: User = Depends(get_current_admin)):
+    """
+    List registered model versions and the one currently served by this worker
+    """
+    return _registry_status()
+
+
+@app.post("/api/admin/models/reload", response_model=ModelRegistryStatus,
+          status_code=status.HTTP_202_ACCEPTED)
+async def reload_model(version: Optional[str] = None, admin: User = Depends(get_current_admin)):
+    """
+    Activate a version (or re-read the active pointer) and hot-swap it in the background
+    """
+    if version:
+        try:
+            model_registry.activate(version)
+        except KeyError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e.args[0]))
+    predictor.reload_in_background()
+    return _registry_status()
+
+
+@app.post("/api/admin/models/rollback", response_model=ModelRegistryStatus,
+          status_code=status.HTTP_202_ACCEPTED)
+async def rollback_model(admin: User = Depends(get_current_admin)):
+    """
+    Re-activate the previously active model version and hot-swap it in the background
+    """
+    try:
+        model_registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    predictor.reload_in_background()
+    return _registry_status()
+
+
+@app.get("/api/admin/predictions/cache", response_model=PredictionCacheStats)
+async def get_prediction_cache_stats(
+    admin: User = Depends(get_current_admin),
+    predictor: DiabetesPredictor = Depends(get_predictor)
+):
+    """
+    Prediction cache size and hit ratio for this worker
+    """
+    return {"model_version": predictor.model_version, **predictor.cache.stats()}
+
+
+@app.get("/api/admin/shadow")
+async def get_shadow_evaluation(
+    admin: User = Depends(get_current_admin),
+    predictor: DiabetesPredictor = Depends(get_predictor)
+):
+    """
+    Agreement with the served model and latency per shadow candidate on this worker
+    """
+    return {"primary_version": predictor.model_version, **predictor.shadow.stats()}
+
+
+@app.get("/api/admin/drift")
+async def get_feature_drift(admin: User = Depends(get_current_admin)):
+    """
+    PSI and KS of recent sensor readings and prediction inputs against the
+    training distribution, per feature, on this worker
+    """
+    return await run_in_threadpool(drift_monitor.scores)
+
+
+@app.post("/api/admin/samples/reset")
+async def reset_sample_replay(
+    admin: User = Depends(get_current_admin),
+    samples: SamplePool = Depends(get_sample_pool)
+):
+    """
+    Restart seeded/sequential sample replay from the beginning on this worker
+    """
+    samples.reset()
+    return {"mode": samples.mode, "seed": samples.seed, "samples": len(samples)}
+
+
+@app.get("/api/admin/analytics/risk")
+async def get_risk_analytics(admin: User = Depends(get_current_admin)):
+    """Risk level distribution by age band, BMI class and cohort, over all predictions"""
+    node = await run_in_threadpool(analytics_aggregates.get)
+    return risk_distribution(node)
+
+
+@app.get("/api/admin/analytics/glucose")
+async def get_glucose_analytics(
+    percentiles: str = ",".join(str(p) for p in DEFAULT_PERCENTILES),
+    admin: User = Depends(get_current_admin)
+):
+    """Glucose percentiles over all predictions (?percentiles=5,50,95)"""
+    try:
+        values = [float(p) for p in percentiles.split(",") if p.strip()]
+    except ValueError:
+        values = []
+    if not values or not all(0 <= p <= 100 for p in values):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="percentiles must be a comma-separated list of numbers between 0 and 100"
+        )
+    node = await run_in_threadpool(analytics_aggregates.get)
+    return glucose_summary(node, values)
+
+
+@app.get("/api/admin/admission")
+async def get_admission_stats(admin: User = Depends(get_current_admin)):
+    """
+    Admission control state per limited route in this worker (admin only)
+    """
+    return [limiter.stats() for limiter in admission_limiters.values()]
+
+
+@app.post("/api/admin/profile")
+async def record_profile(
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    format: str = "collapsed",
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Sample every thread's stack in this worker for `seconds` (admin only)
+    
+    Returns collapsed stacks (flamegraph.pl / speedscope input), or JSON with
+    sample counts when format=json.
+    """
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="format must be 'collapsed' or 'json'")
+    seconds = min(max(seconds, 0.1), settings.PROFILER_MAX_SECONDS)
+    interval = max(interval_ms, 1.0) / 1000
+    try:
+        sampler = profiler.record(seconds, interval)
+    except ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="A profile is already being recorded")
+    await asyncio.sleep(seconds)
+    await run_in_threadpool(sampler.join)
+    
+    result = sampler.result
+    if format == "json":
+        return result
+    return PlainTextResponse(result["collapsed"], headers={
+        "X-Profile-Samples": str(result["samples"]),
+        "X-Profile-Seconds": str(result["seconds"]),
+    })
 
 
 # ==================== Health Check ====================
@@ -307,6 +589,21 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once database, model, samples and dataset are warmed up, 503 before"""
+    report = warm_up.report()
+    report["model_version"] = predictor.model_version
+    return JSONResponse(report, status_code=status.HTTP_200_OK if report["ready"]
+                        else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
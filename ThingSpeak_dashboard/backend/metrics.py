@@ -0,0 +1,206 @@
+"""
+Low-overhead request metrics in Prometheus text format
+
+Stage timings are recorded into fixed-bucket histograms (one bisect and three
+integer updates per observation), so instrumentation can stay on in production.
+Metrics are per worker process; Prometheus aggregates across workers.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, from sub-millisecond feature prep to multi-second upstream calls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+# Stage durations of the request being handled (set by profiling.ServerTimingMiddleware)
+request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label combination"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[LabelValues, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: LabelValues, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label combination"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._series: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: LabelValues, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = list(self._series.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.callback())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {value}"]
+
+
+STAGE_SECONDS = Histogram(
+    "diasense_stage_duration_seconds",
+    "Time spent in each hot-path stage (jwt_decode, user_lookup, thingspeak_fetch, ...)",
+    ("stage",)
+)
+REQUEST_SECONDS = Histogram(
+    "diasense_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+REQUESTS_TOTAL = Counter(
+    "diasense_http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+REQUEST_ERRORS_TOTAL = Counter(
+    "diasense_http_request_errors_total", "HTTP requests answered with a 5xx or raising", ("method", "route")
+)
+
+_metrics: List = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS_TOTAL, REQUEST_ERRORS_TOTAL]
+
+
+def register_metric(metric):
+    """Expose another Histogram or Counter at /metrics; returns it"""
+    _metrics.append(metric)
+    return metric
+
+
+def register_gauge(name: str, documentation: str, callback: Callable[[], float]):
+    """Expose a value computed at scrape time (cache size, queue depth, ...)"""
+    _metrics.append(Gauge(name, documentation, callback))
+
+
+class timed:
+    """
+    Context manager recording the duration of a hot-path stage
+
+        with timed("jwt_decode"):
+            ...
+    """
+
+    __slots__ = ("labels", "start")
+
+    def __init__(self, stage: str):
+        self.labels = (stage,)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(self.labels, elapsed)
+        stages = request_stages.get()
+        if stages is not None:
+            stage = self.labels[0]
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+        return False
+
+
+def render_metrics() -> str:
+    """All metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and errors per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status_code = 500
+            raise
+        finally:
+            # The router stores the matched route in the scope; fall back for 404s
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            REQUEST_SECONDS.observe(labels, time.perf_counter() - start)
+            REQUESTS_TOTAL.inc(labels + (str(status_code),))
+            if status_code >= 500:
+                REQUEST_ERRORS_TOTAL.inc(labels)
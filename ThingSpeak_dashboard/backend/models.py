@@ -1,8 +1,9 @@
 """
 Pydantic models for request/response validation
 """
-from pydantic import BaseModel, Field, validator
-from typing import Optional
+from pydantic import BaseModel, Field, TypeAdapter, validator
+from typing import Any, Dict, List, Optional
+from typing_extensions import TypedDict
 from datetime import datetime
 
 
@@ -85,6 +86,45 @@ class PredictionResponse(BaseModel):
     probability: float
     risk_level: str
     features_used: dict
+    model_version: Optional[str] = None
+    
+    class Config:
+        protected_namespaces = ()
+
+
+class ModelVersionInfo(BaseModel):
+    """Registered model version model"""
+    version: str
+    model_type: Optional[str] = None
+    accuracy: Optional[float] = None
+    roc_auc: Optional[float] = None
+    trained_date: Optional[str] = None
+    registered_date: Optional[str] = None
+    compact_artifact: bool = False
+    serving_cost: Optional[Dict[str, Any]] = None
+    
+    class Config:
+        protected_namespaces = ()
+
+
+class ModelRegistryStatus(BaseModel):
+    """Model registry status response model"""
+    active_version: str
+    serving_version: Optional[str] = None
+    versions: List[ModelVersionInfo]
+
+
+class PredictionCacheStats(BaseModel):
+    """Prediction cache metrics response model"""
+    model_version: Optional[str] = None
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    
+    class Config:
+        protected_namespaces = ()
 
 
 class PredictionHistory(BaseModel):
@@ -102,9 +142,38 @@ class PredictionHistory(BaseModel):
     prediction_result: int
     confidence: float
     timestamp: str  # Changed to string for ISO format
+    model_version: Optional[str] = None
     
     class Config:
         from_attributes = True
+        protected_namespaces = ()
+
+
+class HistoryFeatures(TypedDict):
+    """Features stored with a history item"""
+    Pregnancies: int
+    Glucose: float
+    BloodPressure: float
+    SkinThickness: float
+    Insulin: float
+    BMI: float
+    DiabetesPedigreeFunction: float
+    Age: int
+
+
+class PredictionHistoryItem(TypedDict):
+    """Prediction history response item (plain dict, validated in bulk)"""
+    id: str
+    timestamp: str
+    prediction: int
+    probability: float
+    risk_level: str
+    model_version: Optional[str]
+    features_used: HistoryFeatures
+
+
+# Validates a whole history list in one call and yields plain dicts for orjson
+history_adapter = TypeAdapter(List[PredictionHistoryItem])
 
 
 class ErrorResponse(BaseModel):
@@ -1,53 +1,243 @@
 """
 Diabetes prediction service using trained Decision Tree model
+
+The model is loaded lazily - on the first prediction or an explicit warm_up() -
+so importing this module stays cheap and never touches sklearn.
 """
-import os
-import joblib
+import threading
+import time
+from collections import OrderedDict
 import numpy as np
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
 from .config import settings
 from .database import User
+from .registry import ModelRegistry, model_registry
+from .artifact import load_artifact
+from .inference_pool import InferencePool, InferencePoolSaturated
+from .shadow import ShadowEvaluator
+from .metrics import timed, register_gauge
+
+
+# Decimal places kept per feature when building cache keys:
+# [Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DPF, Age]
+FEATURE_DECIMALS = (0, 0, 0, 0, 0, 2, 3, 0)
+
+
+def quantize_features(row) -> Tuple[float, ...]:
+    """Round a single feature row to the resolution its inputs are reported at"""
+    return tuple(round(float(value), decimals) for value, decimals in zip(row, FEATURE_DECIMALS))
+
+
+class PredictionCache:
+    """Bounded LRU cache of (prediction, confidence) keyed on model version and features"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: str, key: Tuple) -> Optional[Tuple[int, float]]:
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            result = self._entries.get((version, key))
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((version, key))
+            self.hits += 1
+            return result
+
+    def put(self, version: str, key: Tuple, result: Tuple[int, float]):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[(version, key)] = result
+            self._entries.move_to_end((version, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class LoadedModel:
+    """Immutable snapshot of a model version held by the predictor"""
+
+    __slots__ = ("version", "model", "metadata", "model_path")
+
+    def __init__(self, version: str, model, metadata: Optional[Dict], model_path: str):
+        self.version = version
+        self.model = model
+        self.metadata = metadata
+        self.model_path = model_path
 
 
 class DiabetesPredictor:
     """Diabetes prediction service"""
     
-    def __init__(self):
-        self.model = None
-        self.metadata = None
-        self.load_model()
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or model_registry
+        self._current: Optional[LoadedModel] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.cache = PredictionCache(settings.PREDICTION_CACHE_SIZE)
+        self.pool: Optional[InferencePool] = None
+        self.shadow = ShadowEvaluator(
+            self._load_version, settings.SHADOW_MAX_PENDING,
+            settings.SHADOW_LATENCY_BUDGET_MS, settings.SHADOW_LATENCY_BUDGETS_MS
+        )
+
+    @property
+    def ready(self) -> bool:
+        """Whether a model is loaded and serving"""
+        return self._current is not None
+
+    def warm_up(self) -> LoadedModel:
+        """Load the active model now if nothing is served yet (readiness phase)"""
+        current = self._current
+        if current is None:
+            with self._reload_lock:
+                if self._current is None:
+                    self.load_model()
+                current = self._current
+        return current
+
+    @property
+    def model(self):
+        current = self._current
+        return current.model if current else None
+
+    @property
+    def metadata(self) -> Optional[Dict]:
+        current = self._current
+        return current.metadata if current else None
+
+    @property
+    def model_version(self) -> Optional[str]:
+        current = self._current
+        return current.version if current else None
     
-    def load_model(self):
-        """Load the trained Decision Tree model"""
+    def load_model(self, version: Optional[str] = None):
+        """Load a model version from the registry (the active one by default) and serve it"""
         try:
-            # Get absolute path to model
-            backend_dir = os.path.dirname(os.path.abspath(__file__))
-            thingspeak_dashboard_dir = os.path.dirname(backend_dir)
-            project_dir = os.path.dirname(thingspeak_dashboard_dir)
-            model_path = os.path.join(project_dir, "output", "models", "decision_tree_model.pkl")
-            metadata_path = os.path.join(project_dir, "output", "models", "model_metadata.pkl")
-            
-            # Load model
-            if os.path.exists(model_path):
-                self.model = joblib.load(model_path)
-                print(f"✓ Model loaded from {model_path}")
-            else:
-                raise FileNotFoundError(f"Model file not found at {model_path}")
-            
-            # Load metadata if available
-            if os.path.exists(metadata_path):
-                self.metadata = joblib.load(metadata_path)
-                print(f"✓ Model metadata loaded: {self.metadata.get('model_type', 'Unknown')}")
-                print(f"  - Accuracy: {self.metadata.get('accuracy', 'N/A')}")
-                print(f"  - ROC-AUC: {self.metadata.get('roc_auc', 'N/A')}")
-            
+            self.swap(self._load_version(version or self.registry.active_version()))
         except Exception as e:
             print(f"✗ Error loading model: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to load prediction model: {str(e)}"
             )
+
+    def _load_version(self, version: str) -> LoadedModel:
+        """Load a registered version without touching the served model"""
+        model_version = self.registry.get_version(version)
+        if settings.MODEL_ARTIFACT_FORMAT == "auto" and model_version.has_artifact:
+            model_path = model_version.artifact_path
+            model = load_artifact(model_path)
+            metadata = model.metadata or None
+        else:
+            import joblib
+            model_path = model_version.model_path
+            model = joblib.load(model_path)
+            metadata = model_version.load_metadata() or None
+        print(f"✓ Model {version} loaded from {model_path}")
+        if metadata:
+            print(f"✓ Model metadata loaded: {metadata.get('model_type', 'Unknown')}")
+            print(f"  - Accuracy: {metadata.get('accuracy', 'N/A')}")
+            print(f"  - ROC-AUC: {metadata.get('roc_auc', 'N/A')}")
+        return LoadedModel(version, model, metadata, model_path)
+
+    def swap(self, loaded: LoadedModel):
+        """
+        Atomically replace the served model
+
+        Requests already running keep the snapshot they started with,
+        so nothing in flight is dropped or sees a half-loaded model.
+        """
+        if self.pool is not None:
+            self.pool.start(loaded.version, loaded.model, loaded.model_path)
+        self._current = loaded
+        self.cache.clear()
+
+    def reload_in_background(self, version: Optional[str] = None) -> threading.Thread:
+        """
+        Load a version (the active one by default) on a background thread, then swap it in
+
+        The previous model keeps serving until loading succeeds; on failure it stays in place.
+        """
+        def _reload():
+            with self._reload_lock:
+                try:
+                    target = version or self.registry.active_version()
+                    if target == self.model_version:
+                        return
+                    self.swap(self._load_version(target))
+                    print(f"✓ Now serving model {target}")
+                except Exception as e:
+                    print(f"✗ Model reload failed, keeping {self.model_version}: {e}")
+
+        thread = threading.Thread(target=_reload, name="model-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def start_pool(self, workers: int, max_pending: int):
+        """
+        Move inference misses onto a pool of worker processes
+
+        Workers start with the served model, or as soon as one is loaded.
+        """
+        if workers <= 0:
+            return
+        self.pool = InferencePool(workers, max_pending)
+        current = self._current
+        if current is not None:
+            self.pool.start(current.version, current.model, current.model_path)
+
+    def stop_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def start_shadow(self, versions: List[str]) -> Optional[threading.Thread]:
+        """Load candidate versions in the background and shadow them on live traffic"""
+        if not versions:
+            return None
+        thread = threading.Thread(target=self.shadow.configure, args=(list(versions),),
+                                  name="shadow-load", daemon=True)
+        thread.start()
+        return thread
+
+    def start_watcher(self, interval_seconds: float):
+        """Poll the registry's active pointer and hot-reload when it changes"""
+        if self._watcher is not None or interval_seconds <= 0:
+            return
+
+        def _watch():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    if self.registry.active_version() != self.model_version:
+                        self.reload_in_background().join()
+                except Exception as e:
+                    print(f"⚠ Model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=_watch, name="model-watcher", daemon=True)
+        self._watcher.start()
     
     def prepare_features(self, user: User, sensor_data: Dict) -> np.ndarray:
         """
@@ -80,7 +270,7 @@ class DiabetesPredictor:
         
         return np.array(features).reshape(1, -1)
     
-    def predict(self, user: User, sensor_data: Dict) -> Tuple[int, float, Dict]:
+    def predict(self, user: User, sensor_data: Dict) -> Tuple[int, float, Dict, str]:
         """
         Make diabetes prediction
         
@@ -89,27 +279,23 @@ class DiabetesPredictor:
             sensor_data: Dict with ThingSpeak sensor values
             
         Returns:
-            Tuple of (prediction, confidence, input_data_dict)
+            Tuple of (prediction, confidence, input_data_dict, model_version)
         """
-        if self.model is None:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Prediction model not loaded"
-            )
+        current = self._current or self.warm_up()
         
         # Prepare features
-        features = self.prepare_features(user, sensor_data)
+        with timed("prepare_features"):
+            features = self.prepare_features(user, sensor_data)
         
         # Make prediction
-        prediction = int(self.model.predict(features)[0])
-        
-        # Get prediction probability
-        probabilities = self.model.predict_proba(features)[0]
-        confidence = float(probabilities[prediction])
+        prediction, confidence = self._infer(current, features)
         
-        # Prepare input data for history
+        return prediction, confidence, self._input_data(user, sensor_data), current.version
+
+    def _input_data(self, user: User, sensor_data: Dict) -> Dict:
+        """Prepare input data for history"""
         bmi = user.weight_kg / (user.height_m ** 2)
-        input_data = {
+        return {
             "pregnancies": user.pregnancies,
             "glucose": float(sensor_data.get("field1")),
             "blood_pressure": float(sensor_data.get("field2")),
@@ -119,10 +305,8 @@ class DiabetesPredictor:
             "diabetes_pedigree_function": float(sensor_data.get("field5")),
             "age": user.age
         }
-        
-        return prediction, confidence, input_data
     
-    def predict_from_features(self, features_dict: Dict) -> Tuple[int, float, Dict]:
+    def predict_from_features(self, features_dict: Dict) -> Tuple[int, float, Dict, str]:
         """
         Make diabetes prediction from raw features
         
@@ -130,16 +314,22 @@ class DiabetesPredictor:
             features_dict: Dict with feature values
             
         Returns:
-            Tuple of (prediction, confidence, input_data_dict)
+            Tuple of (prediction, confidence, input_data_dict, model_version)
         """
-        if self.model is None:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Prediction model not loaded"
-            )
+        current = self._current or self.warm_up()
         
-        # Prepare features array
-        features = np.array([
+        # Make prediction
+        prediction, confidence = self._infer(current, self._features_from_dict(features_dict))
+        
+        # Return input data
+        input_data = {k: float(v) for k, v in features_dict.items()}
+        
+        return prediction, confidence, input_data, current.version
+
+    @staticmethod
+    def _features_from_dict(features_dict: Dict) -> np.ndarray:
+        """Feature row in model order from a dict keyed by dataset column name"""
+        return np.array([
             float(features_dict.get("Pregnancies", 0)),
             float(features_dict.get("Glucose", 0)),
             float(features_dict.get("BloodPressure", 0)),
@@ -149,20 +339,102 @@ class DiabetesPredictor:
             float(features_dict.get("DiabetesPedigreeFunction", 0)),
             float(features_dict.get("Age", 0))
         ]).reshape(1, -1)
-        
-        # Make prediction
-        prediction = int(self.model.predict(features)[0])
-        
-        # Get prediction probability
-        probabilities = self.model.predict_proba(features)[0]
-        confidence = float(probabilities[prediction])
-        
-        # Return input data
-        input_data = {k: float(v) for k, v in features_dict.items()}
-        
-        return prediction, confidence, input_data
     
-    def get_risk_level(self, prediction: int, confidence: float) -> str:
+    def _infer(self, current: LoadedModel, features: np.ndarray) -> Tuple[int, float]:
+        """
+        Run (or recall) inference for a single feature row
+
+        Features are quantized to the resolution the sensors and profile report,
+        so the cached result is exactly what the model returns for that row.
+        """
+        key = quantize_features(features[0])
+        result = self.cache.get(current.version, key)
+        if result is None:
+            with timed("inference"):
+                probabilities = current.model.predict_proba(np.array(key).reshape(1, -1))[0]
+            index = int(np.argmax(probabilities))
+            result = (int(current.model.classes_[index]), float(probabilities[index]))
+            self.cache.put(current.version, key, result)
+        self.shadow.submit(key, current.version, result)
+        return result
+
+    def predict_batch(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score many feature rows with one predict_proba call (offline scoring)
+
+        Rows are quantized like online requests, so each result matches what the
+        API would return for it. The prediction cache and shadow models are not used.
+
+        Args:
+            features: (n, 8) array in SERVED_FEATURES order
+
+        Returns:
+            Tuple of (predictions, confidences, probabilities of class 1)
+        """
+        current = self._current or self.warm_up()
+        features = np.asarray(features, dtype=np.float64)
+        # Same rounding as the online path: np.round and round() disagree on half-way values
+        quantized = np.array([quantize_features(row) for row in features], dtype=np.float64)
+        quantized = quantized.reshape(len(features), len(FEATURE_DECIMALS))
+        probabilities = current.model.predict_proba(quantized)
+        index = np.argmax(probabilities, axis=1)
+        classes = np.asarray(current.model.classes_)
+        return (classes[index].astype(np.int64), probabilities[np.arange(len(index)), index],
+                probabilities[:, int(np.flatnonzero(classes == 1)[0])])
+
+    async def _infer_async(self, current: LoadedModel, features: np.ndarray) -> Tuple[int, float]:
+        """Like _infer, but misses run on the inference pool when it serves this version"""
+        pool = self.pool
+        if pool is None or not pool.running or pool.version != current.version:
+            return self._infer(current, features)
+
+        key = quantize_features(features[0])
+        cached = self.cache.get(current.version, key)
+        if cached is not None:
+            self.shadow.submit(key, current.version, cached)
+            return cached
+
+        try:
+            with timed("inference"):
+                probabilities = (await pool.predict_proba(np.array(key).reshape(1, -1)))[0]
+        except InferencePoolSaturated:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Prediction service is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        index = int(np.argmax(probabilities))
+        result = (int(current.model.classes_[index]), float(probabilities[index]))
+        self.cache.put(current.version, key, result)
+        self.shadow.submit(key, current.version, result)
+        return result
+
+    async def predict_async(self, user: User, sensor_data: Dict) -> Tuple[int, float, Dict, str]:
+        """
+        Make diabetes prediction without blocking the event loop
+
+        Same contract as predict(); inference runs on the process pool when one is started.
+        """
+        current = self._current or self.warm_up()
+
+        with timed("prepare_features"):
+            features = self.prepare_features(user, sensor_data)
+        prediction, confidence = await self._infer_async(current, features)
+        return prediction, confidence, self._input_data(user, sensor_data), current.version
+
+    async def predict_from_features_async(self, features_dict: Dict) -> Tuple[int, float, Dict, str]:
+        """
+        Make diabetes prediction from raw features without blocking the event loop
+
+        Same contract as predict_from_features(); inference runs on the process pool when one is started.
+        """
+        current = self._current or self.warm_up()
+
+        prediction, confidence = await self._infer_async(current, self._features_from_dict(features_dict))
+        return prediction, confidence, {k: float(v) for k, v in features_dict.items()}, current.version
+
+    @staticmethod
+    def get_risk_level(prediction: int, confidence: float) -> str:
         """
         Determine risk level based on prediction and confidence
         
@@ -191,3 +463,16 @@ class DiabetesPredictor:
 
 # Create global predictor instance
 predictor = DiabetesPredictor()
+
+
+def get_predictor() -> DiabetesPredictor:
+    """Shared predictor (FastAPI dependency); its model is loaded on first use or by warm-up"""
+    return predictor
+
+
+register_gauge("diasense_prediction_cache_size", "Memoized predictions held by this worker",
+               lambda: predictor.cache.stats()["size"])
+register_gauge("diasense_prediction_cache_hit_ratio", "Prediction cache hits / lookups",
+               lambda: predictor.cache.stats()["hit_ratio"])
+register_gauge("diasense_shadow_pending", "Shadow evaluations waiting to run",
+               lambda: predictor.shadow.stats()["pending"])
@@ -0,0 +1,144 @@
+"""
+Per-request timing breakdown and an on-demand sampling profiler
+
+ServerTimingMiddleware collects the stages recorded with metrics.timed while a
+request runs (also from threadpool calls, which inherit the request context),
+reports them in a Server-Timing header and logs requests slower than
+SLOW_REQUEST_MS with their breakdown.
+
+SamplingProfiler snapshots every thread's stack at a fixed interval from a
+background thread, without tracing hooks, so request handling runs at full
+speed while it is on. The result is in the collapsed-stack format read by
+flamegraph.pl, speedscope and most flame graph viewers:
+
+    thread:MainThread;run (asyncio/runners.py:86);...;predict_proba (artifact.py:71) 42
+
+Both are per worker process.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+from .metrics import request_stages
+
+# Long-lived by design, never logged as slow
+_SLOW_LOG_EXCLUDED = frozenset({"/api/stream", "/api/admin/profile"})
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header and logging slow requests"""
+
+    def __init__(self, app, slow_request_ms: float = 0.0, header: bool = True):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.header = header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: Dict[str, float] = {}
+        token = request_stages.set(stages)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.header:
+                    timings = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items()]
+                    timings.append(f"app;dur={(time.perf_counter() - start) * 1000:.2f}")
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", ", ".join(timings).encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stages.reset(token)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if 0 < self.slow_request_ms <= elapsed_ms and scope["path"] not in _SLOW_LOG_EXCLUDED:
+                breakdown = ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in stages.items())
+                print(f"⚠ Slow request {scope['method']} {scope['path']} -> {status_code} "
+                      f"in {elapsed_ms:.1f}ms ({breakdown or 'no instrumented stages'})")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+
+class ProfilerBusy(Exception):
+    """A profile is already being recorded in this process"""
+
+
+class SamplingProfiler:
+    """Samples all thread stacks on a timer and aggregates them as collapsed stacks"""
+
+    def __init__(self, max_depth: int = 128):
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def record(self, seconds: float, interval: float) -> threading.Thread:
+        """
+        Start sampling for `seconds` on a background thread
+
+        Returns:
+            The sampler thread; its `result` attribute holds the profile once it finishes
+
+        Raises:
+            ProfilerBusy if a profile is already running
+        """
+        with self._lock:
+            if self._running:
+                raise ProfilerBusy()
+            self._running = True
+        thread = threading.Thread(target=self._sample, args=(seconds, interval),
+                                  name="sampling-profiler", daemon=True)
+        thread.result = None
+        thread.start()
+        return thread
+
+    def _sample(self, seconds: float, interval: float):
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    labels = []
+                    while frame is not None and len(labels) < self.max_depth:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(f"thread:{names.get(ident, ident)}")
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+        finally:
+            threading.current_thread().result = {
+                "samples": samples,
+                "seconds": round(time.perf_counter() - started, 3),
+                "interval_ms": interval * 1000,
+                "collapsed": "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()),
+            }
+            self._running = False
+
+
+# Create global profiler instance
+profiler = SamplingProfiler()
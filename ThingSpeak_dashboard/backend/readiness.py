@@ -0,0 +1,83 @@
+"""
+Background warm-up of the services behind the API
+
+Startup only registers and starts the warm-up; the server accepts requests
+immediately and /ready reports 503 until every step has finished. Anything a
+request needs before warm-up reaches it is initialized on demand instead.
+
+A step that fails (Firebase or ThingSpeak unreachable at boot) is retried with
+exponential backoff, RETRY_INITIAL_SECONDS doubling up to RETRY_MAX_SECONDS,
+until it succeeds, so a transient error does not keep /ready at 503 until the
+process restarts.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+RETRY_INITIAL_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+
+
+class WarmUp:
+    """Runs named warm-up steps in order on a background thread and records the outcome"""
+
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable]] = []
+        self._status: Dict[str, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def add(self, name: str, step: Callable):
+        self._steps.append((name, step))
+        self._status[name] = {"state": "pending"}
+
+    def start(self) -> threading.Thread:
+        """Start warming up (once per process)"""
+        if self._thread is None:
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _run(self):
+        failed = [(name, step) for name, step in self._steps if not self._run_step(name, step, 1)]
+        attempt, delay = 1, RETRY_INITIAL_SECONDS
+        while failed:
+            for name, _ in failed:
+                self._status[name]["retry_in_seconds"] = delay
+            time.sleep(delay)
+            attempt += 1
+            failed = [(name, step) for name, step in failed if not self._run_step(name, step, attempt)]
+            delay = min(delay * 2, RETRY_MAX_SECONDS)
+        self._finished_at = time.monotonic()
+
+    def _run_step(self, name: str, step: Callable, attempt: int) -> bool:
+        self._status[name] = {"state": "running", "attempts": attempt}
+        start = time.perf_counter()
+        try:
+            step()
+            status = {"state": "ready"}
+        except Exception as e:
+            status = {"state": "failed", "error": str(getattr(e, "detail", e))}
+            print(f"✗ Warm-up step {name} failed (attempt {attempt}), will retry: {status['error']}")
+        status["attempts"] = attempt
+        status["seconds"] = round(time.perf_counter() - start, 3)
+        self._status[name] = status
+        return status["state"] == "ready"
+
+    @property
+    def ready(self) -> bool:
+        return all(status["state"] == "ready" for status in self._status.values())
+
+    def report(self) -> dict:
+        finished, started = self._finished_at, self._started_at
+        return {
+            "ready": self.ready,
+            "warm_up_seconds": round(finished - started, 3) if finished and started else None,
+            "components": {name: dict(status) for name, status in self._status.items()},
+        }
+
+
+# Create global warm-up instance
+warm_up = WarmUp()
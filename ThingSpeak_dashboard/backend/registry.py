@@ -0,0 +1,388 @@
+"""
+Versioned model registry over output/models/
+
+Layout:
+    output/models/decision_tree_model.pkl     legacy artifact, exposed as version "baseline"
+    output/models/decision_tree_model/        its compact artifact (see artifact.py)
+    output/models/model_metadata.pkl
+    output/models/registry/<version>/model.pkl
+    output/models/registry/<version>/model/   compact artifact, when the estimator supports it
+    output/models/registry/<version>/model_metadata.pkl
+    output/models/registry/ACTIVE             name of the version to serve
+    output/models/registry/HISTORY            JSON list of previously active versions
+    output/models/registry/comparisons/       serving cost reports (see comparison.py)
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.registry list
+    python -m backend.registry register path/to/model.pkl [--metadata meta.pkl] [--activate]
+    python -m backend.registry activate v2
+    python -m backend.registry rollback
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .artifact import export_artifact, is_artifact
+
+BASELINE_VERSION = "baseline"
+MODEL_FILENAME = "model.pkl"
+ARTIFACT_DIRNAME = "model"
+METADATA_FILENAME = "model_metadata.pkl"
+COMPARISONS_DIRNAME = "comparisons"
+
+_VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+
+def default_models_dir() -> str:
+    """Absolute path to <project>/output/models"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(os.path.dirname(backend_dir))
+    return os.path.join(project_dir, "output", "models")
+
+
+def _atomic_write_text(path: str, text: str):
+    """Write a file so readers never observe a partial write"""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelVersion:
+    """A registered model version and the files backing it"""
+
+    def __init__(self, version: str, model_path: str, metadata_path: str, artifact_path: str):
+        self.version = version
+        self.model_path = model_path
+        self.metadata_path = metadata_path
+        self.artifact_path = artifact_path
+
+    @property
+    def has_artifact(self) -> bool:
+        """Whether a compact (mmap-loadable) artifact exists for this version"""
+        return is_artifact(self.artifact_path)
+
+    def load_metadata(self) -> Dict:
+        """Load the metadata dict, or an empty dict if none was saved"""
+        if os.path.exists(self.metadata_path):
+            import joblib
+            return joblib.load(self.metadata_path)
+        return {}
+
+    def sha256(self) -> str:
+        """SHA-256 of the pickle, from the metadata when registration recorded it"""
+        return self.load_metadata().get("sha256") or file_sha256(self.model_path)
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary for API responses"""
+        metadata = self.load_metadata()
+        return {
+            "version": self.version,
+            "model_type": metadata.get("model_type"),
+            "accuracy": metadata.get("accuracy"),
+            "roc_auc": metadata.get("roc_auc"),
+            "trained_date": metadata.get("trained_date"),
+            "registered_date": metadata.get("registered_date"),
+            "compact_artifact": self.has_artifact,
+        }
+
+
+class ModelRegistry:
+    """Versioned storage of model artifacts with an active-version pointer"""
+
+    def __init__(self, models_dir: Optional[str] = None):
+        self.models_dir = models_dir or default_models_dir()
+        self.registry_dir = os.path.join(self.models_dir, "registry")
+        self._active_path = os.path.join(self.registry_dir, "ACTIVE")
+        self._history_path = os.path.join(self.registry_dir, "HISTORY")
+        self.comparisons_dir = os.path.join(self.registry_dir, COMPARISONS_DIRNAME)
+        self._lock = threading.Lock()
+
+    # ---------- Lookup ----------
+
+    def _baseline(self) -> Optional[ModelVersion]:
+        model_path = os.path.join(self.models_dir, "decision_tree_model.pkl")
+        if not os.path.exists(model_path):
+            return None
+        return ModelVersion(
+            BASELINE_VERSION, model_path, os.path.join(self.models_dir, METADATA_FILENAME),
+            os.path.join(self.models_dir, "decision_tree_model")
+        )
+
+    def list_versions(self) -> List[ModelVersion]:
+        """All registered versions, oldest first"""
+        versions = []
+        baseline = self._baseline()
+        if baseline:
+            versions.append(baseline)
+
+        if os.path.isdir(self.registry_dir):
+            numbered = []
+            for name in os.listdir(self.registry_dir):
+                match = _VERSION_PATTERN.match(name)
+                if match and os.path.exists(os.path.join(self.registry_dir, name, MODEL_FILENAME)):
+                    numbered.append((int(match.group(1)), name))
+            for _, name in sorted(numbered):
+                versions.append(self.get_version(name))
+        return versions
+
+    def get_version(self, version: str) -> ModelVersion:
+        """
+        Resolve a version name to its files
+
+        Raises:
+            KeyError if the version does not exist
+        """
+        if version == BASELINE_VERSION:
+            baseline = self._baseline()
+            if baseline:
+                return baseline
+        elif _VERSION_PATTERN.match(version):
+            version_dir = os.path.join(self.registry_dir, version)
+            model_path = os.path.join(version_dir, MODEL_FILENAME)
+            if os.path.exists(model_path):
+                return ModelVersion(version, model_path, os.path.join(version_dir, METADATA_FILENAME),
+                                    os.path.join(version_dir, ARTIFACT_DIRNAME))
+        raise KeyError(f"Unknown model version: {version}")
+
+    def active_version(self) -> str:
+        """
+        Name of the version that should be served
+
+        Falls back to the newest registered version when no pointer has been written.
+
+        Raises:
+            FileNotFoundError if the registry holds no models at all
+        """
+        try:
+            with open(self._active_path) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+
+        versions = self.list_versions()
+        if not versions:
+            raise FileNotFoundError(f"No model artifacts found in {self.models_dir}")
+        return versions[-1].version
+
+    def _read_history(self) -> List[str]:
+        try:
+            with open(self._history_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def latest_comparison(self) -> Optional[Dict]:
+        """The newest comparison report, or None when none was saved"""
+        try:
+            names = sorted(name for name in os.listdir(self.comparisons_dir) if name.endswith(".json"))
+        except FileNotFoundError:
+            return None
+        for name in reversed(names):
+            try:
+                with open(os.path.join(self.comparisons_dir, name)) as f:
+                    return json.load(f)
+            except ValueError:
+                continue  # Skip a damaged report rather than hide the older ones
+        return None
+
+    def serving_costs(self) -> Dict[str, Dict]:
+        """
+        Latency, throughput, size, load time and memory per version from the newest report
+
+        Versions are matched by name and by the SHA-256 of their pickle, so a
+        report never describes a different model that reused a version name.
+        """
+        report = self.latest_comparison()
+        if not report:
+            return {}
+        costs = {}
+        for candidate in report.get("candidates", []):
+            version = candidate.get("version")
+            if not version:
+                continue
+            try:
+                model_version = self.get_version(version)
+            except KeyError:
+                continue
+            if candidate.get("sha256") != model_version.sha256():
+                continue
+            form = candidate["served_form"]
+            costs[version] = {
+                "report_created": report.get("created"),
+                "served_form": form,
+                "latency_p50_us": candidate["latency_us"]["p50"],
+                "latency_p99_us": candidate["latency_us"]["p99"],
+                "throughput_rows_per_s": candidate["throughput_rows_per_s"],
+                "size_bytes": candidate["size_bytes"][form],
+                "load_ms": candidate["load_ms"][form],
+                "rss_added_mb": candidate["rss_mb"][form]["added"],
+            }
+        return costs
+
+    # ---------- Mutation ----------
+
+    def register(self, model_path: str, metadata: Optional[Dict] = None,
+                 activate: bool = False) -> ModelVersion:
+        """
+        Copy a trained model into a new version directory
+
+        Args:
+            model_path: Path to a joblib-pickled estimator
+            metadata: Optional metadata dict (model_type, accuracy, roc_auc, ...)
+            activate: Make the new version the active one
+
+        Returns:
+            The newly registered ModelVersion
+        """
+        with self._lock:
+            os.makedirs(self.registry_dir, exist_ok=True)
+            # Pin the current fallback so registering alone never changes what is served
+            if not os.path.exists(self._active_path) and self.list_versions():
+                _atomic_write_text(self._active_path, self.active_version())
+            numbers = [
+                int(m.group(1)) for m in
+                (_VERSION_PATTERN.match(name) for name in os.listdir(self.registry_dir)) if m
+            ]
+            version = f"v{max(numbers, default=0) + 1}"
+            version_dir = os.path.join(self.registry_dir, version)
+            staging_dir = f"{version_dir}.staging"
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            os.makedirs(staging_dir)
+
+            import joblib
+            shutil.copy2(model_path, os.path.join(staging_dir, MODEL_FILENAME))
+            metadata = dict(metadata or {})
+            metadata["version"] = version
+            metadata["sha256"] = file_sha256(model_path)
+            metadata["registered_date"] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            joblib.dump(metadata, os.path.join(staging_dir, METADATA_FILENAME))
+            try:
+                export_artifact(joblib.load(model_path), os.path.join(staging_dir, ARTIFACT_DIRNAME), metadata)
+            except ValueError as e:
+                print(f"⚠ No compact artifact for {version}: {e}")
+
+            # Directory rename is atomic, so watchers never see half-copied versions
+            os.rename(staging_dir, version_dir)
+
+        if activate:
+            self.activate(version)
+        return self.get_version(version)
+
+    def activate(self, version: str) -> ModelVersion:
+        """
+        Point the registry at a version, remembering the previous one for rollback
+
+        Raises:
+            KeyError if the version does not exist
+        """
+        model_version = self.get_version(version)
+        with self._lock:
+            os.makedirs(self.registry_dir, exist_ok=True)
+            try:
+                previous = self.active_version()
+            except FileNotFoundError:
+                previous = None
+            if previous and previous != version:
+                history = self._read_history()
+                history.append(previous)
+                _atomic_write_text(self._history_path, json.dumps(history))
+            _atomic_write_text(self._active_path, version)
+        return model_version
+
+    def save_comparison(self, report: Dict) -> str:
+        """Store a comparison report under comparisons/; returns its path"""
+        os.makedirs(self.comparisons_dir, exist_ok=True)
+        path = os.path.join(self.comparisons_dir, f"{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+        _atomic_write_text(path, json.dumps(report, indent=2))
+        return path
+
+    def rollback(self) -> ModelVersion:
+        """
+        Re-activate the version that was active before the current one
+
+        Raises:
+            LookupError if there is nothing to roll back to
+        """
+        with self._lock:
+            history = self._read_history()
+            while history:
+                version = history.pop()
+                try:
+                    model_version = self.get_version(version)
+                except KeyError:
+                    continue  # Version was deleted from disk; skip it
+                _atomic_write_text(self._active_path, version)
+                _atomic_write_text(self._history_path, json.dumps(history))
+                return model_version
+        raise LookupError("No previous model version to roll back to")
+
+
+# Create global registry instance
+model_registry = ModelRegistry()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for managing model versions"""
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.registry",
+        description="Manage versioned diabetes prediction models. Running API workers pick up "
+                    "changes through the model watcher or POST /api/admin/models/reload."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List registered versions")
+
+    register_parser = subparsers.add_parser("register", help="Register a trained model")
+    register_parser.add_argument("model_path")
+    register_parser.add_argument("--metadata", help="Path to a joblib metadata dict")
+    register_parser.add_argument("--activate", action="store_true")
+
+    activate_parser = subparsers.add_parser("activate", help="Serve a specific version")
+    activate_parser.add_argument("version")
+
+    subparsers.add_parser("rollback", help="Return to the previously active version")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        try:
+            active = model_registry.active_version()
+        except FileNotFoundError:
+            active = None
+        for model_version in model_registry.list_versions():
+            info = model_version.to_dict()
+            marker = "*" if model_version.version == active else " "
+            print(f"{marker} {info['version']:<10} {info['model_type'] or 'Unknown':<28} "
+                  f"accuracy={info['accuracy']} roc_auc={info['roc_auc']}")
+    elif args.command == "register":
+        import joblib
+        metadata = joblib.load(args.metadata) if args.metadata else None
+        model_version = model_registry.register(args.model_path, metadata, activate=args.activate)
+        print(f"✓ Registered {model_version.version}" + (" (active)" if args.activate else ""))
+    elif args.command == "activate":
+        model_registry.activate(args.version)
+        print(f"✓ Active model version: {args.version}")
+    elif args.command == "rollback":
+        model_version = model_registry.rollback()
+        print(f"✓ Rolled back to {model_version.version}")
+
+
+if __name__ == "__main__":
+    main()
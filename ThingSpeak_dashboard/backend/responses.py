@@ -0,0 +1,105 @@
+"""
+Fast JSON encoding for large or frequently polled responses
+
+Rows are built straight from stored Firebase records, validated in one
+TypeAdapter call and encoded with orjson, bypassing FastAPI's per-field
+jsonable_encoder pass.
+"""
+import hashlib
+from typing import Iterable, List, Optional
+
+import orjson
+from fastapi import Request, Response, status
+from fastapi.middleware.gzip import GZipMiddleware
+
+from .models import history_adapter, UserProfile
+from .predictor import DiabetesPredictor
+
+
+class JSONBytesResponse(Response):
+    """Response whose body is already-encoded JSON"""
+    media_type = "application/json"
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZip that leaves some paths (event streams) uncompressed so frames flush immediately"""
+
+    def __init__(self, app, minimum_size: int = 500, exclude_paths=()):
+        super().__init__(app, minimum_size=minimum_size)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag derived from the values that identify a representation"""
+    digest = hashlib.blake2b("\x1f".join(str(p) for p in parts).encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client's If-None-Match already holds this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = {tag.strip() for tag in header.split(",")}
+    # Weak comparison: W/"x" matches "x"
+    if "*" in candidates or etag in candidates or etag[2:] in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    return None
+
+
+def etag_headers(etag: str) -> dict:
+    """Headers that make browsers revalidate with If-None-Match on every poll"""
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def history_rows(records: Iterable[dict]) -> List[dict]:
+    """Convert stored prediction records to history items"""
+    get_risk_level = DiabetesPredictor.get_risk_level
+    return [
+        {
+            "id": record["id"],
+            "timestamp": record["timestamp"],
+            "prediction": record["prediction_result"],
+            "probability": record["confidence"],
+            # Precomputed at write time; older records fall back to computing it
+            "risk_level": record.get("risk_level")
+                          or get_risk_level(record["prediction_result"], record["confidence"]),
+            "model_version": record.get("model_version"),
+            "features_used": {
+                "Pregnancies": record["pregnancies"],
+                "Glucose": record["glucose"],
+                "BloodPressure": record["blood_pressure"],
+                "SkinThickness": record["skin_thickness"],
+                "Insulin": record["insulin"],
+                "BMI": record["bmi"],
+                "DiabetesPedigreeFunction": record["diabetes_pedigree_function"],
+                "Age": record["age"]
+            }
+        }
+        for record in records
+    ]
+
+
+def encode_history(records: Iterable[dict]) -> bytes:
+    """Validate and encode a prediction history as JSON bytes"""
+    return orjson.dumps(history_adapter.validate_python(history_rows(records)))
+
+
+def encode_profile(user) -> bytes:
+    """Validate and encode a user profile as JSON bytes"""
+    return UserProfile(
+        id=user.id,
+        username=user.username,
+        pregnancies=user.pregnancies,
+        weight_kg=user.weight_kg,
+        height_m=user.height_m,
+        age=user.age,
+        bmi=user.bmi,
+        created_at=user.created_at
+    ).model_dump_json().encode()
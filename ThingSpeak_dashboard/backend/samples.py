@@ -0,0 +1,150 @@
+"""
+Memory-resident pool of test samples served by /api/predict
+
+data/test_samples.json is parsed once into typed records. Requests only pick
+a record; the file is re-read when its modification time changes (checked at
+most every SAMPLE_RELOAD_CHECK_SECONDS).
+
+Replay modes:
+    random      random.choice, different on every run (default)
+    seeded      pseudo-random from SAMPLE_REPLAY_SEED, identical across runs
+    sequential  samples in file order, wrapping around
+"""
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+
+from .config import settings
+
+REPLAY_MODES = ("random", "seeded", "sequential")
+
+
+def default_samples_path() -> str:
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(os.path.dirname(backend_dir))
+    return os.path.join(project_dir, "data", "test_samples.json")
+
+
+class Sample:
+    """A test sample with features already converted to their API types"""
+
+    __slots__ = ("features", "outcome")
+
+    def __init__(self, features: Dict, outcome: int):
+        self.features = features
+        self.outcome = outcome
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Sample':
+        """Create Sample from a test_samples.json entry"""
+        return cls(
+            features={
+                "Pregnancies": int(data["Pregnancies"]),
+                "Glucose": float(data["Glucose"]),
+                "BloodPressure": float(data["BloodPressure"]),
+                "SkinThickness": float(data["SkinThickness"]),
+                "Insulin": float(data["Insulin"]),
+                "BMI": float(data["BMI"]),
+                "DiabetesPedigreeFunction": float(data["DiabetesPedigreeFunction"]),
+            },
+            outcome=int(data["Outcome"])
+        )
+
+
+class SamplePool:
+    """Preloaded samples with reproducible replay"""
+
+    def __init__(self, path: Optional[str] = None, mode: str = "random", seed: int = 42,
+                 check_interval: float = 5.0):
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Unknown replay mode {mode!r}, expected one of {REPLAY_MODES}")
+        self.path = path or default_samples_path()
+        self.mode = mode
+        self.seed = seed
+        self.check_interval = check_interval
+        self._samples: List[Sample] = []
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def load(self):
+        """Parse the samples file and swap the pool in"""
+        stat = os.stat(self.path)
+        with open(self.path, 'r') as f:
+            samples = [Sample.from_dict(entry) for entry in json.load(f)]
+        if not samples:
+            raise ValueError(f"No samples in {self.path}")
+        with self._lock:
+            self._samples = samples
+            self._mtime = stat.st_mtime
+        print(f"✓ Loaded {len(samples)} test samples ({self.mode} replay)")
+
+    def reset(self):
+        """Restart the replay sequence from the beginning"""
+        with self._lock:
+            self._random = random.Random(self.seed) if self.mode == "seeded" else random
+            self._position = 0
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._samples:
+                return  # Keep serving the last good copy
+            raise
+        if mtime != self._mtime:
+            try:
+                self.load()
+            except ValueError as e:
+                if not self._samples:
+                    raise
+                print(f"⚠ Keeping previous test samples, reload failed: {e}")
+
+    def next(self) -> Sample:
+        """
+        Pick the next sample according to the replay mode
+
+        Raises:
+            HTTPException if no samples are available
+        """
+        try:
+            self._maybe_reload()
+        except (OSError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Test samples not found"
+            )
+
+        with self._lock:
+            samples = self._samples
+            if self.mode == "sequential":
+                sample = samples[self._position % len(samples)]
+                self._position += 1
+                return sample
+            return self._random.choice(samples)
+
+
+# Create global sample pool instance
+sample_pool = SamplePool(
+    mode=settings.SAMPLE_REPLAY_MODE,
+    seed=settings.SAMPLE_REPLAY_SEED,
+    check_interval=settings.SAMPLE_RELOAD_CHECK_SECONDS
+)
+
+
+def get_sample_pool() -> SamplePool:
+    """Shared sample pool (FastAPI dependency); the samples file is read on first use or by warm-up"""
+    return sample_pool
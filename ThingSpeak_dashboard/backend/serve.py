@@ -0,0 +1,149 @@
+"""
+Production launcher: preload once, then fork uvicorn workers
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker imports pandas,
+parses diabetes.csv and loads the model itself and memory grows linearly with N.
+Here the parent builds all read-only state (app, ThingSpeak DPF values, served
+model, test samples), freezes it out of the garbage collector and only then
+forks, so the workers share those pages copy-on-write. Each worker still opens
+its own Firebase connection and background threads in the startup event.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.serve [--workers N] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+from .config import settings
+
+
+def default_worker_count() -> int:
+    """One worker per CPU this process may run on (inference is CPU-bound)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+def preload():
+    """Import the app and build the state every worker only reads"""
+    from .main import app
+    from .predictor import predictor
+    from .samples import sample_pool
+    from .thingspeak import get_thingspeak_client
+
+    start = time.perf_counter()
+    try:
+        predictor.warm_up()
+    except Exception as e:
+        print(f"⚠ Model not preloaded, workers will load it on demand: {e}")
+    sample_pool.load()
+    get_thingspeak_client().dpf_values
+    # Move everything allocated so far out of the collector's generations so a
+    # worker's GC passes do not write to (and un-share) the inherited pages
+    gc.collect()
+    gc.freeze()
+    print(f"✓ Preloaded app state in {time.perf_counter() - start:.2f}s")
+    return app
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket created before fork and shared by all workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket):
+    """Serve on the inherited socket until the parent asks us to stop"""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, loop="uvloop", http="httptools", lifespan="on",
+                            log_level="info", access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the workers, replaces any that die, and stops them on SIGINT/SIGTERM"""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children: Dict[int, int] = {}  # pid -> worker slot
+        self.stopping = False
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock)
+            except BaseException as e:
+                print(f"✗ Worker {slot} crashed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = slot
+        print(f"✓ Worker {slot} started (pid {pid})")
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self.children.pop(pid, None)
+            if slot is None or self.stopping:
+                continue
+            print(f"⚠ Worker {slot} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            self.spawn(slot)
+        print("✓ All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS or default_worker_count())
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("backend.serve needs os.fork; use run_backend.bat on Windows")
+
+    app = preload()
+    sock = bind_socket(args.host, args.port)
+    print(f"✓ Listening on http://{args.host}:{args.port} with {args.workers} workers")
+    Supervisor(app, sock, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Shadow evaluation of candidate models on live traffic
+
+Every primary prediction is replayed against the configured candidate versions
+on a background thread, off the response path. Per model we record agreement
+with the primary model and inference latency. A shadow is dropped when the
+backlog is full (the system is saturated) or when the model's recent p95
+latency is over its budget; over-budget models are still probed occasionally
+so they can recover.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# One in this many requests is still sent to an over-budget shadow as a probe
+_PROBE_EVERY = 20
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+class ShadowModelStats:
+    """Running outputs and latencies for one candidate model"""
+
+    def __init__(self, version: str, budget_ms: float, window: int = 1024):
+        self.version = version
+        self.budget_ms = budget_ms
+        self.evaluated = 0
+        self.agreements = 0
+        self.abs_probability_delta = 0.0
+        self.dropped_saturated = 0
+        self.dropped_over_budget = 0
+        self.errors = 0
+        self.latencies_ms = deque(maxlen=window)
+        self.recent = deque(maxlen=50)
+        self._skipped = 0
+
+    def over_budget(self) -> bool:
+        """Whether recent p95 latency exceeds the budget (and this request is not a probe)"""
+        if len(self.latencies_ms) < 20 or self.budget_ms <= 0:
+            return False
+        if np.percentile(self.latencies_ms, 95) <= self.budget_ms:
+            return False
+        self._skipped += 1
+        return self._skipped % _PROBE_EVERY != 0
+
+    def record(self, latency_ms: float, primary: Tuple[int, float], shadow: Tuple[int, float]):
+        self.evaluated += 1
+        self.latencies_ms.append(latency_ms)
+        agree = primary[0] == shadow[0]
+        self.agreements += agree
+        # Compare P(diabetic) regardless of which class each model picked
+        p_primary = primary[1] if primary[0] == 1 else 1 - primary[1]
+        p_shadow = shadow[1] if shadow[0] == 1 else 1 - shadow[1]
+        self.abs_probability_delta += abs(p_primary - p_shadow)
+        self.recent.append({
+            "timestamp": time.time(),
+            "primary_prediction": primary[0],
+            "shadow_prediction": shadow[0],
+            "primary_probability": round(primary[1], 4),
+            "shadow_probability": round(shadow[1], 4),
+            "latency_ms": round(latency_ms, 3),
+        })
+
+    def to_dict(self) -> dict:
+        latencies = list(self.latencies_ms)
+        return {
+            "version": self.version,
+            "latency_budget_ms": self.budget_ms,
+            "evaluated": self.evaluated,
+            "agreement_rate": round(self.agreements / self.evaluated, 4) if self.evaluated else None,
+            "mean_abs_probability_delta":
+                round(self.abs_probability_delta / self.evaluated, 4) if self.evaluated else None,
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "latency_p99_ms": _percentile(latencies, 99),
+            "dropped_saturated": self.dropped_saturated,
+            "dropped_over_budget": self.dropped_over_budget,
+            "errors": self.errors,
+            "recent": list(self.recent),
+        }
+
+
+class ShadowEvaluator:
+    """Replays primary predictions against candidate models in the background"""
+
+    def __init__(self, loader: Callable, max_pending: int, default_budget_ms: float,
+                 budgets_ms: Optional[Dict[str, float]] = None):
+        self._loader = loader
+        self.max_pending = max_pending
+        self.default_budget_ms = default_budget_ms
+        self.budgets_ms = budgets_ms or {}
+        self._models: Dict[str, object] = {}
+        self._stats: Dict[str, ShadowModelStats] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._models)
+
+    def configure(self, versions: List[str]):
+        """Load candidate versions (call off the request path) and start shadowing them"""
+        for version in versions:
+            try:
+                loaded = self._loader(version)
+            except Exception as e:
+                print(f"✗ Shadow model {version} not loaded: {e}")
+                continue
+            self._stats.setdefault(
+                version, ShadowModelStats(version, self.budgets_ms.get(version, self.default_budget_ms))
+            )
+            self._models[version] = loaded.model
+        if self._models and self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        if self._models:
+            print(f"✓ Shadow evaluation enabled for {', '.join(self._models)}")
+
+    def submit(self, row: Tuple[float, ...], primary_version: str, primary: Tuple[int, float]):
+        """Queue a shadow evaluation; never blocks and never raises into the request"""
+        if not self._models:
+            return
+        with self._lock:
+            saturated = self._pending >= self.max_pending
+            if not saturated:
+                self._pending += 1
+        if saturated:
+            for stats in self._stats.values():
+                stats.dropped_saturated += 1
+            return
+        try:
+            self._executor.submit(self._evaluate, row, primary_version, primary)
+        except RuntimeError:  # Executor shut down
+            with self._lock:
+                self._pending -= 1
+
+    def _evaluate(self, row: Tuple[float, ...], primary_version: str, primary: Tuple[int, float]):
+        try:
+            features = np.array(row, dtype=np.float64).reshape(1, -1)
+            for version, model in list(self._models.items()):
+                stats = self._stats[version]
+                if version == primary_version:
+                    continue
+                if stats.over_budget():
+                    stats.dropped_over_budget += 1
+                    continue
+                try:
+                    start = time.perf_counter()
+                    probabilities = model.predict_proba(features)[0]
+                    latency_ms = (time.perf_counter() - start) * 1000
+                except Exception:
+                    stats.errors += 1
+                    continue
+                index = int(np.argmax(probabilities))
+                stats.record(latency_ms, primary,
+                             (int(model.classes_[index]), float(probabilities[index])))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+        return {
+            "pending": pending,
+            "max_pending": self.max_pending,
+            "models": [stats.to_dict() for stats in self._stats.values()],
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,166 @@
+"""
+Server-Sent Events push of new readings and predictions
+
+A single poller fetches ThingSpeak on behalf of every connected dashboard and
+fans each new reading out to all subscribers; predictions are delivered to
+the subscribers of the user who made them. Each client has a bounded queue -
+when a slow client falls behind, its oldest undelivered events are dropped.
+
+Hubs are per worker process. A prediction reaches the clients on its own
+worker at once; the poller also reads predictions stored since its last
+check (an indexed Firebase query on timestamp), so clients connected to
+other workers or hosts get it within STREAM_POLL_SECONDS. Predictions are
+remembered by id, so none is delivered twice.
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+import orjson
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .database import get_predictions_since
+from .metrics import register_gauge
+from .responses import history_rows
+from .thingspeak import get_thingspeak_client
+
+# Predictions read again on each check, for timestamps written slightly out of order
+_CLOCK_MARGIN = timedelta(seconds=10)
+
+# Prediction ids remembered to avoid delivering one twice
+_SEEN_PREDICTIONS = 4096
+
+
+class Subscriber:
+    """One connected stream client"""
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, message: bytes):
+        """Enqueue without blocking, evicting the oldest event when full"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+
+
+def format_event(event: str, data, event_id: Optional[str] = None) -> bytes:
+    """Encode one SSE frame"""
+    frame = b""
+    if event_id is not None:
+        frame += f"id: {event_id}\n".encode()
+    return frame + f"event: {event}\n".encode() + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+class StreamHub:
+    """Fan-out hub shared by all stream clients of this worker"""
+
+    def __init__(self, poll_seconds: float, queue_size: int):
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscriber] = set()
+        self._by_user: Dict[str, Set[Subscriber]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self.latest_reading: Optional[bytes] = None
+        self._latest_entry = None
+        self._seen_predictions: "OrderedDict[str, None]" = OrderedDict()
+        self._predictions_since: Optional[str] = None
+        self._shared_predictions = True
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, user_id: str) -> Subscriber:
+        subscriber = Subscriber(user_id, self.queue_size)
+        self._subscribers.add(subscriber)
+        self._by_user.setdefault(user_id, set()).add(subscriber)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        user_subscribers = self._by_user.get(subscriber.user_id)
+        if user_subscribers is not None:
+            user_subscribers.discard(subscriber)
+            if not user_subscribers:
+                del self._by_user[subscriber.user_id]
+
+    def publish(self, message: bytes, user_id: Optional[str] = None):
+        """Deliver a frame to every client, or only to one user's clients (event loop only)"""
+        targets = self._subscribers if user_id is None else self._by_user.get(user_id, ())
+        for subscriber in list(targets):
+            subscriber.offer(message)
+
+    def publish_prediction(self, record: dict):
+        """Deliver a stored prediction record to its user's clients, at most once"""
+        if record["id"] in self._seen_predictions:
+            return
+        self._seen_predictions[record["id"]] = None
+        while len(self._seen_predictions) > _SEEN_PREDICTIONS:
+            self._seen_predictions.popitem(last=False)
+        self.publish(format_event("prediction", history_rows([record])[0], event_id=record["id"]),
+                     user_id=record["user_id"])
+
+    async def _poll_predictions(self):
+        """Deliver predictions other workers stored since the last check"""
+        if self._predictions_since is None:
+            # Only what is stored from now on; history comes from /api/predictions/history
+            self._predictions_since = datetime.utcnow().isoformat()
+            return
+        since = (datetime.fromisoformat(self._predictions_since) - _CLOCK_MARGIN).isoformat()
+        try:
+            records = await run_in_threadpool(get_predictions_since, since)
+        except ValueError as e:
+            # The query cannot run without the timestamp index: stay worker-local
+            self._shared_predictions = False
+            print(f"⚠ Stream only delivers this worker's predictions: {e}")
+            return
+        except Exception as e:
+            print(f"⚠ Stream prediction poll failed: {e}")
+            return
+        for record in sorted(records, key=lambda record: record.get("timestamp", "")):
+            if record.get("user_id") in self._by_user:
+                self.publish_prediction(record)
+            self._predictions_since = max(self._predictions_since, record.get("timestamp", ""))
+
+    async def _poll(self):
+        """Fetch ThingSpeak (and other workers' predictions) once per interval while anyone is connected"""
+        while self._subscribers:
+            if self._shared_predictions:
+                await self._poll_predictions()
+            try:
+                data = await run_in_threadpool(get_thingspeak_client().fetch_latest_data)
+                entry = (data.get("entry_id"), data.get("timestamp"))
+                if entry != self._latest_entry:
+                    self._latest_entry = entry
+                    self.latest_reading = format_event("reading", {
+                        "Glucose": data.get("field1"),
+                        "BloodPressure": data.get("field2"),
+                        "SkinThickness": data.get("field3"),
+                        "Insulin": data.get("field4"),
+                        "DiabetesPedigreeFunction": data.get("field5"),
+                        "timestamp": data.get("timestamp")
+                    }, event_id=str(data.get("entry_id")))
+                    self.publish(self.latest_reading)
+            except HTTPException as e:
+                self.publish(format_event("error", {"detail": e.detail}))
+            except Exception as e:
+                print(f"⚠ Stream poller error: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+
+# Create global stream hub instance
+stream_hub = StreamHub(settings.STREAM_POLL_SECONDS, settings.STREAM_QUEUE_SIZE)
+
+register_gauge("diasense_stream_clients", "Connected /api/stream clients", lambda: stream_hub.client_count)
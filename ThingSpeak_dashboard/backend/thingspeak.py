@@ -1,13 +1,26 @@
 """
 ThingSpeak API integration for fetching sensor data
 """
+import csv
 import requests
 import random
-import pandas as pd
+import threading
+import time
 from pathlib import Path
 from typing import Dict, List, Optional
 from fastapi import HTTPException, status
 from .config import settings
+from .metrics import timed
+from .drift import drift_monitor
+
+# Channel fields measured by the sensors and the model features they carry
+# (field5, DiabetesPedigreeFunction, is sampled by get_random_dpf, not measured)
+SENSOR_FIELDS = {
+    "field1": "Glucose",
+    "field2": "BloodPressure",
+    "field3": "SkinThickness",
+    "field4": "Insulin",
+}
 
 
 class ThingSpeakClient:
@@ -17,38 +30,74 @@ class ThingSpeakClient:
         self.base_url = settings.THINGSPEAK_BASE_URL
         self.channel_id = settings.THINGSPEAK_CHANNEL_ID
         self.read_api_key = settings.THINGSPEAK_READ_API
-        
-        # Load DiabetesPedigreeFunction values from dataset
-        self.dpf_values = []
+        self.cache_seconds = settings.THINGSPEAK_CACHE_SECONDS
+        self._latest: Optional[Dict] = None
+        self._latest_fetched_at = 0.0
+        self._dpf_values: Optional[List[float]] = None
+        self._dpf_lock = threading.Lock()
+    
+    @property
+    def dpf_values(self) -> List[float]:
+        """DiabetesPedigreeFunction values from the dataset, read on first use"""
+        if self._dpf_values is None:
+            with self._dpf_lock:
+                if self._dpf_values is None:
+                    self._dpf_values = self._load_dpf_values()
+        return self._dpf_values
+    
+    @staticmethod
+    def _load_dpf_values() -> List[float]:
+        # Only one column is needed, so the csv module is used instead of importing pandas
         try:
             csv_path = Path(__file__).parent.parent.parent / "data" / "diabetes.csv"
             if csv_path.exists():
-                df = pd.read_csv(csv_path)
-                self.dpf_values = df['DiabetesPedigreeFunction'].dropna().tolist()
-                print(f"✓ Loaded {len(self.dpf_values)} DiabetesPedigreeFunction values from dataset")
-            else:
-                # Fallback to typical range if CSV not found
-                self.dpf_values = [round(random.uniform(0.078, 2.42), 3) for _ in range(100)]
-                print("⚠ Using generated DiabetesPedigreeFunction values (CSV not found)")
+                with open(csv_path, newline='') as f:
+                    values = [float(row['DiabetesPedigreeFunction']) for row in csv.DictReader(f)
+                              if row.get('DiabetesPedigreeFunction')]
+                print(f"✓ Loaded {len(values)} DiabetesPedigreeFunction values from dataset")
+                return values
+            # Fallback to typical range if CSV not found
+            print("⚠ Using generated DiabetesPedigreeFunction values (CSV not found)")
         except Exception as e:
             # Fallback to typical range
-            self.dpf_values = [round(random.uniform(0.078, 2.42), 3) for _ in range(100)]
             print(f"⚠ Error loading CSV, using generated values: {e}")
+        return [round(random.uniform(0.078, 2.42), 3) for _ in range(100)]
     
-    def get_random_dpf(self) -> float:
-        """Get a random DiabetesPedigreeFunction value from the dataset"""
-        return random.choice(self.dpf_values)
+    def get_random_dpf(self, seed=None) -> float:
+        """
+        Get a random DiabetesPedigreeFunction value from the dataset
+        
+        With a seed (the feed entry id) the same reading always gets the same value.
+        """
+        if seed is None:
+            return random.choice(self.dpf_values)
+        return random.Random(seed).choice(self.dpf_values)
     
     def fetch_latest_data(self) -> Dict:
         """
         Fetch the latest sensor data from ThingSpeak
         
+        A successful reading is reused for THINGSPEAK_CACHE_SECONDS, so polling
+        clients within that window share one upstream request.
+        
         Returns:
-            Dict containing field1-field5 values
+            Dict containing field1-field5 values, entry_id and timestamp
             
         Raises:
             HTTPException if data is incomplete or API fails
         """
+        latest = self._latest
+        if latest is not None and time.monotonic() - self._latest_fetched_at < self.cache_seconds:
+            return dict(latest)
+        
+        sensor_data = self._fetch_latest_feed()
+        self._latest, self._latest_fetched_at = sensor_data, time.monotonic()
+        if latest is None or sensor_data.get("entry_id") != latest.get("entry_id"):
+            drift_monitor.observe("sensors", {name: sensor_data.get(field) for field, name in SENSOR_FIELDS.items()})
+        return dict(sensor_data)
+    
+    def _fetch_latest_feed(self) -> Dict:
+        """Request and validate the latest feed entry from ThingSpeak"""
         url = f"{self.base_url}/channels/{self.channel_id}/feeds.json"
         params = {
             "api_key": self.read_api_key,
@@ -56,66 +105,76 @@ class ThingSpeakClient:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if not data.get("feeds") or len(data["feeds"]) == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="No data available from ThingSpeak. Please check if IoT device is connected and transmitting data."
-                )
-            
-            latest_feed = data["feeds"][0]
-            
-            # Validate required fields
-            required_fields = {
-                "field1": "Glucose",
-                "field2": "BloodPressure",
-                "field3": "SkinThickness",
-                "field4": "Insulin",
-                # "field5": "DiabetesPedigreeFunction"
-            }
-            
-            missing_fields = []
-            sensor_data = {}
-            
-            for field_key, field_name in required_fields.items():
-                value = latest_feed.get(field_key)
-                
-                # Check if field is missing or null
-                if value is None or value == "":
-                    missing_fields.append(field_name)
-                else:
-                    try:
-                        sensor_data[field_key] = float(value)
-                    except (ValueError, TypeError):
-                        missing_fields.append(field_name)
-            
-            # If any fields are missing, raise detailed error
-            if missing_fields:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail={
-                        "error": "Incomplete sensor data",
-                        "message": f"Missing or invalid sensor data: {', '.join(missing_fields)}. Please check IoT device connection and retry.",
-                        "missing_fields": missing_fields
-                    }
-                )
-            
-            # Add DiabetesPedigreeFunction from dataset (random value)
-            sensor_data["field5"] = self.get_random_dpf()
-            
-            # Add timestamp
-            sensor_data["timestamp"] = latest_feed.get("created_at", "")
-            
-            return sensor_data
-            
+            with timed("thingspeak_fetch"):
+                response = requests.get(url, params=params, timeout=10)
+                response.raise_for_status()
+                data = response.json()
         except requests.exceptions.RequestException as e:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Failed to fetch data from ThingSpeak: {str(e)}"
             )
+        
+        return self.parse_feed(data)
+    
+    def parse_feed(self, data: Dict) -> Dict:
+        """
+        Validate a feeds.json response and extract the latest reading
+        
+        Raises:
+            HTTPException if no entry is present or sensor fields are missing
+        """
+        if not data.get("feeds") or len(data["feeds"]) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="No data available from ThingSpeak. Please check if IoT device is connected and transmitting data."
+            )
+        
+        latest_feed = data["feeds"][0]
+        
+        # Validate required fields
+        required_fields = {
+            "field1": "Glucose",
+            "field2": "BloodPressure",
+            "field3": "SkinThickness",
+            "field4": "Insulin",
+            # "field5": "DiabetesPedigreeFunction"
+        }
+        
+        missing_fields = []
+        sensor_data = {}
+        
+        for field_key, field_name in required_fields.items():
+            value = latest_feed.get(field_key)
+        
+            # Check if field is missing or null
+            if value is None or value == "":
+                missing_fields.append(field_name)
+            else:
+                try:
+                    sensor_data[field_key] = float(value)
+                except (ValueError, TypeError):
+                    missing_fields.append(field_name)
+        
+        # If any fields are missing, raise detailed error
+        if missing_fields:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={
+                    "error": "Incomplete sensor data",
+                    "message": f"Missing or invalid sensor data: {', '.join(missing_fields)}. Please check IoT device connection and retry.",
+                    "missing_fields": missing_fields
+                }
+            )
+        
+        # Add DiabetesPedigreeFunction from dataset (random value, stable per entry)
+        sensor_data["field5"] = self.get_random_dpf(latest_feed.get("entry_id"))
+        
+        # Add timestamp and entry id (identifies the reading for ETags)
+        sensor_data["timestamp"] = latest_feed.get("created_at", "")
+        sensor_data["entry_id"] = latest_feed.get("entry_id")
+        
+        return sensor_data
     
     def get_field_status(self) -> Dict:
         """
@@ -142,5 +201,15 @@ class ThingSpeakClient:
             }
 
 
-# Create global ThingSpeak client instance
-thingspeak_client = ThingSpeakClient()
+_client: Optional[ThingSpeakClient] = None
+_client_lock = threading.Lock()
+
+
+def get_thingspeak_client() -> ThingSpeakClient:
+    """Shared ThingSpeak client, created on first use (FastAPI dependency)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ThingSpeakClient()
+    return _client
@@ -0,0 +1,240 @@
+"""
+Model training pipeline
+
+Loads a dataset through the column cache (see dataset.py), holds out a
+stratified test split, cross-validates on the rest with the folds fitted in
+parallel, refits on the whole training split and writes the model to
+output/models/:
+
+    pima                 registered as a new registry version (pickle, compact
+                         artifact, metadata); --activate makes the backend serve it
+    other datasets       output/models/experiments/<dataset>-<model>-<timestamp>/,
+                         since the backend cannot send their features
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.training decision_tree --params max_depth=5 min_samples_split=19 --activate
+    python -m backend.training random_forest --dataset diabetes_prediction --folds 5 --jobs 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .artifact import export_artifact
+from .dataset import DATASETS, Dataset, load_dataset
+from .registry import METADATA_FILENAME, MODEL_FILENAME, ARTIFACT_DIRNAME, ModelRegistry, model_registry
+
+RANDOM_STATE = 42
+
+# Estimator name -> class and the defaults used when --params does not override them
+MODELS = {
+    "decision_tree": ("DecisionTreeClassifier", {"max_depth": 5, "min_samples_split": 19}),
+    "random_forest": ("RandomForestClassifier", {"n_estimators": 100}),
+    "extra_trees": ("ExtraTreesClassifier", {"n_estimators": 100}),
+    "logistic_regression": ("LogisticRegression", {"max_iter": 1000}),
+}
+
+
+def build_model(name: str, params: Optional[Dict] = None):
+    """
+    An unfitted estimator; logistic regression is wrapped in a StandardScaler pipeline
+
+    Raises:
+        KeyError for unknown model names
+    """
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.tree import DecisionTreeClassifier
+
+    if name not in MODELS:
+        raise KeyError(f"Unknown model '{name}', expected one of: {', '.join(MODELS)}")
+    params = {**MODELS[name][1], **(params or {})}
+    if name == "decision_tree":
+        return DecisionTreeClassifier(random_state=RANDOM_STATE, **params)
+    if name == "random_forest":
+        return RandomForestClassifier(random_state=RANDOM_STATE, **params)
+    if name == "extra_trees":
+        return ExtraTreesClassifier(random_state=RANDOM_STATE, **params)
+    return make_pipeline(StandardScaler(), LogisticRegression(random_state=RANDOM_STATE, **params))
+
+
+def split_dataset(dataset: Dataset, test_size: float = 0.2):
+    """Stratified train/test split: X_train, X_test, y_train, y_test"""
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(dataset.X, dataset.y, test_size=test_size,
+                            random_state=RANDOM_STATE, stratify=dataset.y)
+
+
+def cross_validate_model(model, X: np.ndarray, y: np.ndarray, folds: int = 5, jobs: int = -1) -> Dict:
+    """
+    Stratified k-fold accuracy and ROC-AUC, one fold per worker process
+
+    Returns:
+        Per-fold scores with their mean and standard deviation
+    """
+    from sklearn.model_selection import StratifiedKFold, cross_validate
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+    scores = cross_validate(model, X, y, cv=splitter, scoring=("accuracy", "roc_auc"), n_jobs=jobs)
+    result = {"folds": folds}
+    for metric in ("accuracy", "roc_auc", "fit_time"):
+        values = scores[f"test_{metric}" if metric != "fit_time" else metric]
+        result[metric] = {
+            "mean": round(float(np.mean(values)), 4),
+            "std": round(float(np.std(values)), 4),
+            "per_fold": [round(float(value), 4) for value in values],
+        }
+    return result
+
+
+def evaluate(model, X: np.ndarray, y: np.ndarray) -> Dict:
+    """Accuracy and ROC-AUC of a fitted model"""
+    from sklearn.metrics import accuracy_score, roc_auc_score
+
+    return {
+        "accuracy": round(float(accuracy_score(y, model.predict(X))), 4),
+        "roc_auc": round(float(roc_auc_score(y, model.predict_proba(X)[:, 1])), 4),
+    }
+
+
+def save_model(model, metadata: Dict, servable: bool, activate: bool = False,
+               registry: Optional[ModelRegistry] = None) -> str:
+    """
+    Write a fitted model where the backend can pick it up
+
+    Args:
+        model: Fitted estimator
+        metadata: Metadata dict; "dataset" and "model_name" name experiment directories
+        servable: Whether the model takes the features the backend sends
+        activate: Serve the new registry version right away
+
+    Returns:
+        The registered version name, or the experiment directory for models
+        the backend cannot serve
+    """
+    import joblib
+
+    registry = registry or model_registry
+    if servable:
+        os.makedirs(registry.models_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(suffix=".pkl", dir=registry.models_dir, delete=False) as f:
+            temp_path = f.name
+        try:
+            joblib.dump(model, temp_path)
+            return registry.register(temp_path, metadata, activate=activate).version
+        finally:
+            os.remove(temp_path)
+
+    path = os.path.join(registry.models_dir, "experiments",
+                        f"{metadata['dataset']}-{metadata['model_name']}-{datetime.utcnow():%Y%m%d-%H%M%S}")
+    os.makedirs(path)
+    joblib.dump(model, os.path.join(path, MODEL_FILENAME))
+    joblib.dump(metadata, os.path.join(path, METADATA_FILENAME))
+    try:
+        export_artifact(model, os.path.join(path, ARTIFACT_DIRNAME), metadata)
+    except ValueError as e:
+        print(f"⚠ No compact artifact: {e}")
+    return path
+
+
+def train(model_name: str, params: Optional[Dict] = None, dataset_name: str = "pima",
+          folds: int = 5, jobs: int = -1, test_size: float = 0.2, use_cache: bool = True):
+    """
+    Cross-validate and fit one model configuration
+
+    Returns:
+        (fitted model, metadata dict, dataset)
+    """
+    start = time.perf_counter()
+    dataset = load_dataset(dataset_name, use_cache=use_cache)
+    loaded = time.perf_counter()
+    X_train, X_test, y_train, y_test = split_dataset(dataset, test_size)
+
+    model = build_model(model_name, params)
+    cv = cross_validate_model(model, X_train, y_train, folds, jobs) if folds > 1 else None
+    cross_validated = time.perf_counter()
+
+    model.fit(X_train, y_train)
+    fitted = time.perf_counter()
+    scores = evaluate(model, X_test, y_test)
+
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    metadata = {
+        "model_type": type(estimator).__name__,
+        "model_name": model_name,
+        "params": {key: value for key, value in estimator.get_params().items()
+                   if key in {**MODELS[model_name][1], **(params or {})}},
+        "accuracy": scores["accuracy"],
+        "roc_auc": scores["roc_auc"],
+        "cross_validation": cv,
+        "dataset": dataset.name,
+        "dataset_sha256": dataset.source_sha256,
+        "feature_names": dataset.feature_names,
+        "n_train": int(len(y_train)),
+        "n_test": int(len(y_test)),
+        "timings_seconds": {
+            "load": round(loaded - start, 3),
+            "cross_validation": round(cross_validated - loaded, 3),
+            "fit": round(fitted - cross_validated, 3),
+        },
+        "trained_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return model, metadata, dataset
+
+
+def parse_params(pairs: List[str]) -> Dict:
+    """key=value pairs; values are read as JSON when possible (5, 0.1, null, "gini")"""
+    params = {}
+    for pair in pairs:
+        key, separator, value = pair.partition("=")
+        if not separator:
+            raise ValueError(f"Expected key=value, got '{pair}'")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.training", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", choices=list(MODELS))
+    parser.add_argument("--dataset", choices=list(DATASETS), default="pima")
+    parser.add_argument("--params", nargs="*", default=[], metavar="KEY=VALUE",
+                        help="Estimator parameters (defaults to the production settings)")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds (0 skips CV)")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel fold workers (-1 = all CPUs)")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--no-cache", action="store_true", help="Re-encode the CSV instead of using the cache")
+    parser.add_argument("--activate", action="store_true", help="Serve the new version right away")
+    parser.add_argument("--dry-run", action="store_true", help="Train and report without writing a model")
+    args = parser.parse_args(argv)
+
+    model, metadata, dataset = train(args.model, parse_params(args.params), args.dataset, args.folds,
+                                     args.jobs, args.test_size, use_cache=not args.no_cache)
+    cv = metadata["cross_validation"]
+    if cv:
+        print(f"✓ {args.folds}-fold CV: accuracy {cv['accuracy']['mean']:.4f} ± {cv['accuracy']['std']:.4f}, "
+              f"ROC-AUC {cv['roc_auc']['mean']:.4f} ± {cv['roc_auc']['std']:.4f}")
+    print(f"✓ Test: accuracy {metadata['accuracy']:.4f}, ROC-AUC {metadata['roc_auc']:.4f} "
+          f"(load {metadata['timings_seconds']['load']}s, "
+          f"CV {metadata['timings_seconds']['cross_validation']}s, fit {metadata['timings_seconds']['fit']}s)")
+    if args.dry_run:
+        return
+    if args.activate and not dataset.servable:
+        print(f"⚠ {dataset.name} models cannot be served; --activate ignored")
+    location = save_model(model, metadata, dataset.servable, activate=args.activate)
+    print(f"✓ Saved {location}" + (" (active)" if args.activate and dataset.servable else ""))
+
+
+if __name__ == "__main__":
+    main()
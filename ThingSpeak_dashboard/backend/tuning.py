@@ -0,0 +1,324 @@
+"""
+Hyperparameter search with successive halving
+
+Candidates are drawn from SEARCH_SPACES for every requested model and compete
+in one bracket. Each rung cross-validates the surviving candidates on a larger
+stratified sample of the training split (the hold-out used by training.py is
+never touched), in parallel worker processes, and keeps the best 1/eta by
+
+    objective = ROC-AUC - latency_weight * p95 latency / latency budget
+
+Latency is the single-row predict_proba time of what the backend would serve
+(the compact artifact when the estimator supports it), measured in this
+process one candidate at a time once all of the rung's fits have finished,
+so busy workers do not skew it. Candidates over the budget are dropped
+however accurate they are.
+
+Every evaluation is cached under output/models/tuning/, keyed by dataset hash,
+model, parameters, sample size and folds, so running an interrupted search
+again with the same arguments resumes where it stopped.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m backend.tuning --models decision_tree logistic_regression --candidates 20 --jobs 4
+    python -m backend.tuning --latency-budget-ms 0.5 --register --activate --output search.json
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .artifact import export_artifact, load_artifact
+from .config import settings
+from .dataset import DATASETS, PREPROCESSING_VERSION, Dataset, load_dataset
+from .registry import default_models_dir
+from .training import MODELS, RANDOM_STATE, build_model, cross_validate_model, save_model, split_dataset, train
+
+SEARCH_SPACES = {
+    "decision_tree": {
+        "max_depth": [3, 4, 5, 6, 8, 10, None],
+        "min_samples_split": [2, 5, 10, 19, 40],
+        "min_samples_leaf": [1, 2, 5, 10],
+        "criterion": ["gini", "entropy"],
+    },
+    "logistic_regression": {
+        "C": [0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0],
+        "class_weight": [None, "balanced"],
+    },
+    "random_forest": {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [4, 6, 8, 12, None],
+        "min_samples_leaf": [1, 2, 5],
+        "max_features": ["sqrt", 0.5],
+    },
+    "extra_trees": {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [4, 6, 8, 12, None],
+        "min_samples_leaf": [1, 2, 5],
+        "max_features": ["sqrt", 0.5],
+    },
+}
+
+Candidate = Tuple[str, Dict]
+
+
+def sample_candidates(models: List[str], per_model: int, seed: int = RANDOM_STATE) -> List[Candidate]:
+    """Up to `per_model` distinct configurations per model, drawn from its search space"""
+    rng = random.Random(seed)
+    candidates = []
+    for model_name in models:
+        space = SEARCH_SPACES[model_name]
+        grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+        candidates += [(model_name, params) for params in rng.sample(grid, min(per_model, len(grid)))]
+    return candidates
+
+
+def halving_schedule(n_candidates: int, n_rows: int, eta: int, min_samples: int) -> List[int]:
+    """Training rows per rung, growing by eta and ending with the whole training split"""
+    rungs = math.ceil(math.log(n_candidates, eta)) if n_candidates > 1 else 0
+    # Fewer rungs when the first one would get less than min_samples rows
+    rungs = max(0, min(rungs, int(math.log(max(n_rows / min_samples, 1), eta))))
+    return [int(n_rows / eta ** (rungs - rung)) for rung in range(rungs + 1)]
+
+
+def objective(roc_auc: float, latency_p95_us: float, budget_us: float, weight: float) -> Optional[float]:
+    """Higher is better; None when the candidate is over the latency budget"""
+    if latency_p95_us > budget_us:
+        return None
+    return roc_auc - weight * latency_p95_us / budget_us
+
+
+# ==================== Evaluation cache ====================
+
+class EvaluationCache:
+    """One JSON file per evaluated (configuration, sample size), written atomically"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(model_name: str, params: Dict, n_samples: int, folds: int) -> str:
+        identity = json.dumps([model_name, params, n_samples, folds, RANDOM_STATE], sort_keys=True)
+        return hashlib.sha256(identity.encode()).hexdigest()[:20]
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.path, f"{key}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, result: Dict):
+        path = os.path.join(self.path, f"{key}.json")
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def default_cache_dir(dataset: Dataset) -> str:
+    return os.path.join(default_models_dir(), "tuning",
+                        f"{dataset.name}-{dataset.source_sha256[:16]}-p{PREPROCESSING_VERSION}")
+
+
+# ==================== Workers ====================
+
+_worker_data = None
+
+
+def _init_worker(dataset_name: str):
+    """Load the training split once per worker (from the column cache)"""
+    global _worker_data
+    X_train, _, y_train, _ = split_dataset(load_dataset(dataset_name))
+    _worker_data = (X_train, y_train)
+
+
+def _evaluate(model_name: str, params: Dict, n_samples: int, folds: int):
+    """Cross-validate one configuration on n_samples training rows; returns (scores, fitted model)"""
+    from sklearn.model_selection import train_test_split
+
+    X, y = _worker_data
+    if n_samples < len(y):
+        X, _, y, _ = train_test_split(X, y, train_size=n_samples, random_state=RANDOM_STATE, stratify=y)
+    model = build_model(model_name, params)
+    cv = cross_validate_model(model, X, y, folds, jobs=1)
+    model.fit(X, y)
+    return {
+        "roc_auc": cv["roc_auc"]["mean"],
+        "roc_auc_std": cv["roc_auc"]["std"],
+        "accuracy": cv["accuracy"]["mean"],
+        "fit_seconds": cv["fit_time"]["mean"],
+    }, model
+
+
+def single_row_latency(model, X: np.ndarray, calls: int = 300) -> Dict:
+    """p50/p95 microseconds of one-row predict_proba on the form the backend would serve"""
+    served = model
+    with tempfile.TemporaryDirectory() as path:
+        try:
+            served = load_artifact(export_artifact(model, os.path.join(path, "model")), mmap=False)
+        except ValueError:
+            pass  # Served by unpickling, as the backend would
+
+    rows = [X[i % len(X)].reshape(1, -1) for i in range(calls)]
+    for row in rows[:20]:
+        served.predict_proba(row)
+    timings = np.empty(calls)
+    for i, row in enumerate(rows):
+        start = time.perf_counter_ns()
+        served.predict_proba(row)
+        timings[i] = time.perf_counter_ns() - start
+    p50, p95 = np.percentile(timings / 1000, [50, 95])
+    return {"latency_p50_us": round(float(p50), 2), "latency_p95_us": round(float(p95), 2),
+            "compact_artifact": served is not model}
+
+
+# ==================== Search ====================
+
+def successive_halving(candidates: List[Candidate], dataset: Dataset, cache: EvaluationCache,
+                       jobs: int = 1, folds: int = 3, eta: int = 3, min_samples: int = 200,
+                       latency_budget_ms: float = 5.0, latency_weight: float = 0.01) -> Dict:
+    """
+    Run the bracket
+
+    Returns:
+        {"rungs": [...], "leaderboard": final-rung results, best first}
+    """
+    X_train, _, y_train, _ = split_dataset(dataset)
+    budget_us = latency_budget_ms * 1000
+    schedule = halving_schedule(len(candidates), len(y_train), eta, max(min_samples, folds * 10))
+    survivors = candidates
+    rungs = []
+    ranked: List[Dict] = []
+    pool = None
+
+    try:
+        for rung, n_samples in enumerate(schedule):
+            started = time.perf_counter()
+            results, pending = [], []
+            for model_name, params in survivors:
+                key = cache.key(model_name, params, n_samples, folds)
+                cached = cache.get(key)
+                if cached is not None:
+                    results.append(cached)
+                else:
+                    pending.append((key, model_name, params))
+
+            def record(key, model_name, params, scores, model):
+                result = {"model": model_name, "params": params, "n_samples": n_samples, **scores,
+                          **single_row_latency(model, X_train)}
+                cache.put(key, result)  # Saved as soon as it is measured, so a restart keeps it
+                results.append(result)
+
+            if pending and jobs > 1:
+                if pool is None:
+                    pool = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(dataset.name,))
+                futures = {pool.submit(_evaluate, model_name, params, n_samples, folds): (key, model_name, params)
+                           for key, model_name, params in pending}
+                fitted = [(*futures[future], *future.result()) for future in as_completed(futures)]
+                # Every worker is idle now, so latency is measured without CPU contention
+                for evaluation in fitted:
+                    record(*evaluation)
+            elif pending:
+                if _worker_data is None:
+                    _init_worker(dataset.name)
+                for key, model_name, params in pending:
+                    record(key, model_name, params, *_evaluate(model_name, params, n_samples, folds))
+
+            for result in results:
+                result["objective"] = objective(result["roc_auc"], result["latency_p95_us"],
+                                                budget_us, latency_weight)
+            ranked = sorted((r for r in results if r["objective"] is not None),
+                            key=lambda r: r["objective"], reverse=True)
+            keep = len(ranked) if rung == len(schedule) - 1 else max(1, math.ceil(len(survivors) / eta))
+            rungs.append({
+                "rung": rung,
+                "n_samples": n_samples,
+                "candidates": len(survivors),
+                "evaluated": len(pending),
+                "cached": len(survivors) - len(pending),
+                "over_latency_budget": len(results) - len(ranked),
+                "kept": min(keep, len(ranked)),
+                "seconds": round(time.perf_counter() - started, 2),
+            })
+            best = ranked[0] if ranked else None
+            print(f"  rung {rung}: {len(survivors)} candidates on {n_samples} rows "
+                  f"({len(pending)} evaluated, {len(survivors) - len(pending)} cached)"
+                  + (f", best {best['model']} ROC-AUC {best['roc_auc']:.4f} "
+                     f"p95 {best['latency_p95_us']:.0f}us" if best else ", none within the latency budget"))
+            survivors = [(r["model"], r["params"]) for r in ranked[:keep]]
+            if not survivors:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return {"rungs": rungs, "leaderboard": ranked}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.tuning", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--dataset", choices=list(DATASETS), default="pima")
+    parser.add_argument("--candidates", type=int, default=20, help="Configurations sampled per model")
+    parser.add_argument("--eta", type=int, default=3, help="Keep 1/eta of the candidates at each rung")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--min-samples", type=int, default=200, help="Training rows in the first rung")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Parallel worker processes")
+    parser.add_argument("--latency-budget-ms", type=float, default=settings.SHADOW_LATENCY_BUDGET_MS,
+                        help="p95 single-row latency above which a candidate is rejected")
+    parser.add_argument("--latency-weight", type=float, default=0.01,
+                        help="ROC-AUC given up for a model as slow as the budget")
+    parser.add_argument("--seed", type=int, default=RANDOM_STATE)
+    parser.add_argument("--register", action="store_true", help="Train the winner with backend.training and save it")
+    parser.add_argument("--activate", action="store_true", help="With --register, serve the winner")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    dataset = load_dataset(args.dataset)
+    cache = EvaluationCache(default_cache_dir(dataset))
+    candidates = sample_candidates(args.models, args.candidates, args.seed)
+    print(f"✓ {len(candidates)} candidates, {len(dataset.feature_names)} features, cache {cache.path}")
+
+    result = successive_halving(candidates, dataset, cache, args.jobs, args.folds, args.eta,
+                                args.min_samples, args.latency_budget_ms, args.latency_weight)
+    report = {
+        "dataset": dataset.name,
+        "dataset_sha256": dataset.source_sha256,
+        "models": args.models,
+        "eta": args.eta,
+        "folds": args.folds,
+        "latency_budget_ms": args.latency_budget_ms,
+        "latency_weight": args.latency_weight,
+        **result,
+    }
+    leaderboard = result["leaderboard"]
+    for entry in leaderboard[:10]:
+        print(f"  {entry['objective']:.4f}  {entry['model']:<20} ROC-AUC {entry['roc_auc']:.4f}  "
+              f"p95 {entry['latency_p95_us']:>8.1f}us  {entry['params']}")
+    if not leaderboard:
+        print("✗ No candidate met the latency budget")
+    elif args.register:
+        best = leaderboard[0]
+        model, metadata, dataset = train(best["model"], best["params"], dataset.name, args.folds, args.jobs)
+        metadata["tuning"] = {key: best[key] for key in ("objective", "roc_auc", "latency_p50_us", "latency_p95_us")}
+        report["registered"] = save_model(model, metadata, dataset.servable, activate=args.activate)
+        print(f"✓ Saved {report['registered']}" + (" (active)" if args.activate and dataset.servable else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
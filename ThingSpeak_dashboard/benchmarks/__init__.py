@@ -0,0 +1 @@
+# Benchmarks for the FastAPI backend (run from ThingSpeak_dashboard/)
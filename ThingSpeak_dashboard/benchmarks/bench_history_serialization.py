@@ -0,0 +1,114 @@
+"""
+Prediction history serialization benchmark
+
+Compares the previous /api/predictions/history path (Prediction.from_dict per
+row, per-row get_risk_level, FastAPI's jsonable_encoder + json.dumps) with the
+current one (rows built from stored records, one TypeAdapter validation, orjson).
+
+Usage (from ThingSpeak_dashboard/):
+    python -m benchmarks.bench_history_serialization [--repeat 20] [--output report.json]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+
+from backend.database import Prediction
+from backend.predictor import DiabetesPredictor
+from backend.responses import encode_history
+
+SIZES = (1_000, 10_000)
+
+
+def make_records(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        prediction = rng.randint(0, 1)
+        confidence = round(rng.uniform(0.5, 1.0), 4)
+        records.append(Prediction(
+            user_id="bench-user", pregnancies=rng.randint(0, 10), glucose=float(rng.randint(60, 200)),
+            blood_pressure=float(rng.randint(40, 110)), skin_thickness=float(rng.randint(0, 50)),
+            insulin=float(rng.randint(0, 300)), bmi=round(rng.uniform(18, 45), 2),
+            diabetes_pedigree_function=round(rng.uniform(0.08, 2.4), 3), age=rng.randint(18, 80),
+            prediction_result=prediction, confidence=confidence, id=str(uuid.UUID(int=i)),
+            timestamp=f"2025-01-01T00:00:{i:06d}", model_version="baseline",
+            risk_level=DiabetesPredictor.get_risk_level(prediction, confidence)
+        ).to_dict())
+    return records
+
+
+def legacy_encode(records: list) -> bytes:
+    """The pre-optimization endpoint body plus FastAPI's default JSONResponse rendering"""
+    predictions = [Prediction.from_dict(record) for record in records]
+    content = [
+        {
+            "id": pred.id,
+            "timestamp": pred.timestamp,
+            "prediction": pred.prediction_result,
+            "probability": pred.confidence,
+            "risk_level": DiabetesPredictor.get_risk_level(pred.prediction_result, pred.confidence),
+            "features_used": {
+                "Pregnancies": pred.pregnancies,
+                "Glucose": pred.glucose,
+                "BloodPressure": pred.blood_pressure,
+                "SkinThickness": pred.skin_thickness,
+                "Insulin": pred.insulin,
+                "BMI": pred.bmi,
+                "DiabetesPedigreeFunction": pred.diabetes_pedigree_function,
+                "Age": pred.age
+            }
+        }
+        for pred in predictions
+    ]
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _median_ms(func, records, repeat: int) -> float:
+    func(records)  # Warm up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(records)
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def run(repeat: int) -> dict:
+    results = []
+    for size in SIZES:
+        records = make_records(size)
+        legacy_ms = _median_ms(legacy_encode, records, repeat)
+        fast_ms = _median_ms(encode_history, records, repeat)
+        results.append({
+            "rows": size,
+            "legacy_ms": legacy_ms,
+            "fast_ms": fast_ms,
+            "speedup": round(legacy_ms / fast_ms, 2),
+            "bytes": len(encode_history(records)),
+        })
+        print(f"  {size:>6} rows: legacy {legacy_ms:>9} ms, fast {fast_ms:>8} ms")
+    return {"benchmark": "history_serialization", "repeat": repeat, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
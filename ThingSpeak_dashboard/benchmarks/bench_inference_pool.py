@@ -0,0 +1,108 @@
+"""
+Inference pool throughput scaling benchmark
+
+Trains the RandomForest(n_estimators=100) evaluated in model_comparison.ipynb,
+then measures single-row predict_proba throughput through InferencePool for
+1..N worker processes against in-process inference.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m benchmarks.bench_inference_pool [--requests 2000] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.inference_pool import InferencePool
+
+DATA_PATH = Path(__file__).parent.parent.parent / "data" / "diabetes.csv"
+
+
+def _worker_counts(max_workers: int):
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+async def _drive(pool: InferencePool, rows: np.ndarray, total: int, concurrency: int) -> float:
+    """Keep `concurrency` single-row requests in flight until `total` complete"""
+    next_index = 0
+
+    async def client():
+        nonlocal next_index
+        while next_index < total:
+            row = rows[next_index % len(rows)].reshape(1, -1)
+            next_index += 1
+            await pool.predict_proba(row)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def run(total_requests: int, max_workers: int) -> dict:
+    df = pd.read_csv(DATA_PATH)
+    X, y = df.drop("Outcome", axis=1).to_numpy(dtype=float), df["Outcome"].to_numpy()
+    model = RandomForestClassifier(n_estimators=100, random_state=42).fit(X, y)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "random_forest.pkl")
+        joblib.dump(model, model_path)
+
+        # Baseline: inference on the calling thread, as the API does without a pool
+        start = time.perf_counter()
+        for i in range(total_requests):
+            model.predict_proba(X[i % len(X)].reshape(1, -1))
+        inline_seconds = time.perf_counter() - start
+
+        results = []
+        for workers in _worker_counts(max_workers):
+            pool = InferencePool(workers, max_pending=workers * 8)
+            pool.start("bench", model, model_path)
+            asyncio.run(_drive(pool, X, workers * 4, workers * 4))  # Warm up every worker
+            seconds = asyncio.run(_drive(pool, X, total_requests, workers * 4))
+            pool.shutdown()
+            results.append({
+                "workers": workers,
+                "requests_per_second": round(total_requests / seconds, 1),
+                "speedup_vs_inline": round(inline_seconds / seconds, 2),
+            })
+            print(f"  workers={workers:<3} {results[-1]['requests_per_second']:>9} req/s")
+
+    return {
+        "benchmark": "inference_pool",
+        "model": "RandomForestClassifier(n_estimators=100)",
+        "cpu_count": os.cpu_count(),
+        "requests": total_requests,
+        "inline_requests_per_second": round(total_requests / inline_seconds, 1),
+        "pool": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.requests, args.max_workers)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
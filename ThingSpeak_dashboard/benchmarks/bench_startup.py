@@ -0,0 +1,109 @@
+"""
+Import-time and startup-time benchmark for backend.main
+
+Each run is a fresh interpreter, so nothing is cached in sys.modules:
+
+    import_ms      `import backend.main`
+    startup_ms     the startup event (the server accepts requests after this)
+    ready_ms       startup until background warm-up reports ready (/ready = 200)
+
+Heavy modules that must not be imported just by importing the app (pandas,
+sklearn, joblib, firebase_admin) are reported too. With --max-import-ms /
+--max-startup-ms the exit status is 1 when a budget is exceeded or a heavy
+module shows up, so a CI job can catch startup regressions.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m benchmarks.bench_startup [--runs 5] [--max-import-ms 1500] [--output report.json]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ("pandas", "sklearn", "joblib", "firebase_admin")
+
+_PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import backend.main as main
+import_ms = (time.perf_counter() - start) * 1000
+heavy = [name for name in {heavy!r} if name in sys.modules]
+
+start = time.perf_counter()
+asyncio.run(main.app.router.startup())
+startup_ms = (time.perf_counter() - start) * 1000
+while not main.warm_up.ready and main.warm_up.report()["warm_up_seconds"] is None:
+    time.sleep(0.005)
+ready_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{"import_ms": import_ms, "startup_ms": startup_ms, "ready_ms": ready_ms,
+                  "ready": main.warm_up.ready, "heavy_modules": heavy}}))
+"""
+
+
+def _run_once() -> dict:
+    code = _PROBE.format(heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=Path(__file__).parent.parent, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _summary(values) -> dict:
+    return {
+        "median": round(statistics.median(values), 1),
+        "min": round(min(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def run(runs: int) -> dict:
+    samples = [_run_once() for _ in range(runs)]
+    return {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "import_ms": _summary([s["import_ms"] for s in samples]),
+        "startup_ms": _summary([s["startup_ms"] for s in samples]),
+        "ready_ms": _summary([s["ready_ms"] for s in samples]),
+        "warm_up_succeeded": all(s["ready"] for s in samples),
+        "heavy_modules_on_import": sorted({name for s in samples for name in s["heavy_modules"]}),
+    }
+
+
+def check(report: dict, max_import_ms: float = None, max_startup_ms: float = None) -> list:
+    """Budget violations (empty when the report is within budget)"""
+    failures = []
+    if report["heavy_modules_on_import"]:
+        failures.append(f"heavy modules imported by backend.main: {report['heavy_modules_on_import']}")
+    if max_import_ms is not None and report["import_ms"]["median"] > max_import_ms:
+        failures.append(f"import took {report['import_ms']['median']} ms (budget {max_import_ms} ms)")
+    if max_startup_ms is not None and report["startup_ms"]["median"] > max_startup_ms:
+        failures.append(f"startup took {report['startup_ms']['median']} ms (budget {max_startup_ms} ms)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-startup-ms", type=float)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    failures = check(report, args.max_import_ms, args.max_startup_ms)
+    report["failures"] = failures
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+    for failure in failures:
+        print(f"✗ {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
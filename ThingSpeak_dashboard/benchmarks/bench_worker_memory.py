@@ -0,0 +1,131 @@
+"""
+Per-worker memory: `uvicorn --workers N` versus the preloading backend.serve launcher
+
+Starts each launcher with N workers, waits until the API answers and the model
+is loaded, then reads /proc/<pid>/smaps_rollup for the parent and every worker.
+
+    rss_mb      resident pages, shared ones counted in full in every process
+    pss_mb      resident pages with shared ones divided between their sharers
+    private_mb  pages only this process maps (what an extra worker really costs)
+
+The sum of PSS over all processes is the deployment's actual memory. Linux only.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m benchmarks.bench_worker_memory [--workers 4] [--output report.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+LAUNCHERS = {
+    "uvicorn_workers": [sys.executable, "-m", "uvicorn", "backend.main:app",
+                        "--host", "127.0.0.1", "--port", "{port}", "--workers", "{workers}",
+                        "--loop", "uvloop", "--http", "httptools"],
+    "preload_fork": [sys.executable, "-m", "backend.serve",
+                     "--host", "127.0.0.1", "--port", "{port}", "--workers", "{workers}"],
+}
+
+
+def _smaps_rollup(pid: int) -> Dict[str, float]:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(values.get("Rss", 0), 1),
+        "pss_mb": round(values.get("Pss", 0), 1),
+        "private_mb": round(values.get("Private_Clean", 0) + values.get("Private_Dirty", 0), 1),
+    }
+
+
+def _children(pid: int) -> List[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        # Field 4 (after the parenthesised command name) is the parent pid
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid and b"resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def _wait_ready(port: int, workers: int, pid: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            if len(_children(pid)) >= workers:
+                return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"Server on port {port} did not become ready")
+
+
+def measure(launcher: str, workers: int, port: int, settle_seconds: float) -> dict:
+    command = [part.format(port=port, workers=workers) for part in LAUNCHERS[launcher]]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port, workers, process.pid, timeout=60)
+        # Let background model loading finish, then touch a few endpoints in every worker
+        time.sleep(settle_seconds)
+        for _ in range(workers * 10):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5).read()
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read()
+
+        parent = _smaps_rollup(process.pid)
+        worker_stats = [_smaps_rollup(pid) for pid in _children(process.pid)]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    def mean(key):
+        return round(sum(w[key] for w in worker_stats) / len(worker_stats), 1)
+
+    return {
+        "launcher": launcher,
+        "workers": len(worker_stats),
+        "parent": parent,
+        "per_worker_mean": {key: mean(key) for key in ("rss_mb", "pss_mb", "private_mb")},
+        "total_pss_mb": round(parent["pss_mb"] + sum(w["pss_mb"] for w in worker_stats), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--settle-seconds", type=float, default=3.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = []
+    for launcher in LAUNCHERS:
+        result = measure(launcher, args.workers, args.port, args.settle_seconds)
+        results.append(result)
+        print(f"  {launcher:<16} per worker: {result['per_worker_mean']}  total PSS {result['total_pss_mb']} MB")
+
+    report = {"benchmark": "worker_memory", "cpu_count": os.cpu_count(), "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
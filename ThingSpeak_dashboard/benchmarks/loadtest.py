@@ -0,0 +1,347 @@
+"""
+End-to-end load test of the API against local ThingSpeak and Firebase stand-ins
+
+Starts the stand-ins from benchmarks/standins.py, launches the backend in a
+subprocess pointed at them (THINGSPEAK_BASE_URL, FIREBASE_DATABASE_EMULATOR_HOST),
+waits for /ready, then runs virtual users for a fixed duration. Each user signs
+up (retrying with backoff when shed with 429/503 or on connection errors) and
+then runs sessions: log in, then a weighted mix of dashboard calls (latest
+reading polled with If-None-Match, predictions, history, profile) with
+exponential think time between them. A user whose signup never succeeds is
+dropped and counted under "users", so it adds no login failures to the report.
+
+Per endpoint the JSON report has throughput, latency percentiles, error rate and
+status counts, plus the git commit, so runs from different commits can be
+compared directly (--compare previous.json prints the differences).
+
+Usage (from ThingSpeak_dashboard/):
+    python -m benchmarks.loadtest [--users 20] [--duration 30] [--output report.json]
+    python -m benchmarks.loadtest --launcher serve --workers 4     # preforked workers
+    python -m benchmarks.loadtest --base-url http://host:8000      # an already running API
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from benchmarks.standins import RealtimeDBStandIn, ThingSpeakStandIn
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+# Relative weight of each action within a logged-in session
+ACTION_WEIGHTS = {"latest": 0.5, "predict": 0.15, "history": 0.25, "me": 0.1}
+# Signup attempts per user before it is dropped; statuses worth retrying
+SIGNUP_ATTEMPTS = 6
+RETRY_STATUSES = {"429", "503", "error"}
+
+
+class Recorder:
+    """Latency and status samples per endpoint, shared by all virtual users"""
+
+    def __init__(self):
+        self._samples: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, status: str):
+        with self._lock:
+            self._samples[endpoint].append((seconds, status))
+
+    def report(self, duration: float) -> dict:
+        endpoints = {}
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        for name, values in sorted(samples.items()):
+            latencies = np.array([seconds for seconds, _ in values]) * 1000
+            statuses = defaultdict(int)
+            for _, status in values:
+                statuses[status] += 1
+            errors = sum(count for status, count in statuses.items()
+                         if not (status.isdigit() and int(status) < 400))
+            endpoints[name] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / duration, 2),
+                "error_rate": round(errors / len(values), 4),
+                "latency_ms": {
+                    "mean": round(float(latencies.mean()), 2),
+                    "p50": round(float(np.percentile(latencies, 50)), 2),
+                    "p90": round(float(np.percentile(latencies, 90)), 2),
+                    "p99": round(float(np.percentile(latencies, 99)), 2),
+                    "max": round(float(latencies.max()), 2),
+                },
+                "status_counts": dict(sorted(statuses.items())),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "requests": total,
+            "throughput_rps": round(total / duration, 2),
+            "error_rate": round(sum(e["error_rate"] * e["requests"] for e in endpoints.values()) / total, 4)
+            if total else None,
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    """One dashboard user on its own keep-alive connection"""
+
+    def __init__(self, index: int, base_url: str, recorder: Recorder, rng: random.Random,
+                 think_seconds: float, session_requests: int):
+        parsed = urlparse(base_url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.recorder = recorder
+        self.rng = rng
+        self.think_seconds = think_seconds
+        self.session_requests = session_requests
+        self.username = f"load_{os.getpid()}_{index}_{rng.randrange(1 << 30)}"
+        self.password = "load-test-password"
+        self.token: Optional[str] = None
+        self.etags: Dict[str, str] = {}
+        self.signed_up = False
+        self.signup_attempts = 0
+        self._retry_after: Optional[float] = None
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def _request(self, endpoint: str, method: str, path: str, body: Optional[dict] = None,
+                 etag_key: Optional[str] = None) -> Tuple[str, Optional[dict]]:
+        headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if etag_key and etag_key in self.etags:
+            headers["If-None-Match"] = self.etags[etag_key]
+        payload = json.dumps(body).encode() if body is not None else None
+
+        start = time.perf_counter()
+        self._retry_after = None
+        try:
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self._connection.request(method, path, body=payload, headers=headers)
+            response = self._connection.getresponse()
+            data = response.read()
+            status = str(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            self.recorder.record(endpoint, time.perf_counter() - start, type(e).__name__)
+            self._connection = None
+            return "error", None
+        self.recorder.record(endpoint, time.perf_counter() - start, status)
+        if response.getheader("Retry-After", "").isdigit():
+            self._retry_after = float(response.getheader("Retry-After"))
+
+        if etag_key and response.getheader("ETag"):
+            self.etags[etag_key] = response.getheader("ETag")
+        if response.getheader("Content-Type", "").startswith("application/json") and data \
+                and response.getheader("Content-Encoding") != "gzip":
+            return status, json.loads(data)
+        return status, None
+
+    def signup(self, deadline: float) -> bool:
+        """
+        Create the account, retrying shed requests with exponential backoff
+
+        A 400 after a retry means an earlier attempt was stored although its
+        response was lost, so the account exists and login will work.
+        """
+        profile = {
+            "username": self.username,
+            "password": self.password,
+            "pregnancies": self.rng.randint(0, 6),
+            "weight_kg": round(self.rng.uniform(50, 110), 1),
+            "height_m": round(self.rng.uniform(1.5, 1.95), 2),
+            "age": self.rng.randint(21, 75),
+        }
+        backoff = 0.25
+        while self.signup_attempts < SIGNUP_ATTEMPTS and time.monotonic() < deadline:
+            self.signup_attempts += 1
+            status, body = self._request("POST /api/auth/signup", "POST", "/api/auth/signup", profile)
+            if status == "201" and body:
+                self.token = body["access_token"]
+                self.signed_up = True
+            elif status == "400" and self.signup_attempts > 1:
+                self.signed_up = True
+            if self.signed_up or status not in RETRY_STATUSES:
+                break
+            # Honour Retry-After, with jitter so shed users do not return in lockstep
+            time.sleep(max(self._retry_after or 0.0, backoff) * self.rng.uniform(1.0, 1.5))
+            backoff *= 2
+        return self.signed_up
+
+    def login(self):
+        self.token = None
+        self.etags.clear()
+        status, body = self._request("POST /api/auth/login", "POST", "/api/auth/login",
+                                     {"username": self.username, "password": self.password})
+        if status == "200" and body:
+            self.token = body["access_token"]
+
+    def act(self, action: str):
+        if action == "latest":
+            self._request("GET /api/thingspeak/latest", "GET", "/api/thingspeak/latest", etag_key="latest")
+        elif action == "predict":
+            self._request("POST /api/predict", "POST", "/api/predict", {"pregnancies": 0})
+        elif action == "history":
+            self._request("GET /api/predictions/history", "GET", "/api/predictions/history",
+                          etag_key="history")
+        elif action == "me":
+            self._request("GET /api/auth/me", "GET", "/api/auth/me", etag_key="me")
+
+    def run(self, deadline: float):
+        actions, weights = list(ACTION_WEIGHTS), list(ACTION_WEIGHTS.values())
+        if not self.signup(deadline):
+            return
+        while time.monotonic() < deadline:
+            self.login()
+            if self.token is None:
+                time.sleep(self.think_seconds)
+                continue
+            for _ in range(self.session_requests):
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(self.rng.expovariate(1 / self.think_seconds) if self.think_seconds > 0 else 0)
+                self.act(self.rng.choices(actions, weights)[0])
+
+
+def _wait_ready(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/ready", timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise TimeoutError(f"{base_url} did not become ready")
+
+
+def _start_server(launcher: str, workers: int, port: int, env: dict) -> subprocess.Popen:
+    if launcher == "serve":
+        command = [sys.executable, "-m", "backend.serve", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(workers)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(workers), "--no-access-log"]
+    return subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(users: int, duration: float, think_seconds: float, session_requests: int, seed: int,
+        base_url: Optional[str] = None, launcher: str = "uvicorn", workers: int = 1,
+        port: int = 8790) -> dict:
+    thingspeak = database = server = None
+    if base_url is None:
+        thingspeak = ThingSpeakStandIn(entry_seconds=15.0, seed=seed).start()
+        database = RealtimeDBStandIn().start()
+        env = dict(os.environ,
+                   THINGSPEAK_BASE_URL=thingspeak.url,
+                   FIREBASE_DATABASE_EMULATOR_HOST=database.address,
+                   FIREBASE_CREDENTIALS_PATH="",
+                   PYTHONUNBUFFERED="1")
+        server = _start_server(launcher, workers, port, env)
+        base_url = f"http://127.0.0.1:{port}"
+
+    recorder = Recorder()
+    try:
+        _wait_ready(base_url)
+        deadline = time.monotonic() + duration
+        virtual_users = [VirtualUser(i, base_url, recorder, random.Random(seed + i), think_seconds,
+                                     session_requests) for i in range(users)]
+        threads = [threading.Thread(target=user.run, args=(deadline,), daemon=True) for user in virtual_users]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        for standin in (thingspeak, database):
+            if standin is not None:
+                standin.stop()
+
+    return {
+        "benchmark": "loadtest",
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "config": {
+            "users": users, "duration_seconds": duration, "think_seconds": think_seconds,
+            "session_requests": session_requests, "seed": seed,
+            "launcher": launcher if server is not None else "external", "workers": workers,
+            "action_weights": ACTION_WEIGHTS,
+        },
+        "upstream_thingspeak_requests": thingspeak.requests if thingspeak else None,
+        "users": {
+            "started": users,
+            "signed_up": sum(user.signed_up for user in virtual_users),
+            # Never got an account (signup kept failing); they sent no further requests
+            "dropped": sum(not user.signed_up for user in virtual_users),
+            "signup_retries": sum(max(user.signup_attempts - 1, 0) for user in virtual_users),
+        },
+        **recorder.report(elapsed),
+    }
+
+
+def compare(report: dict, previous: dict) -> List[str]:
+    """Human-readable per-endpoint differences against an earlier report"""
+    lines = [f"Compared with {previous.get('commit')} ({previous.get('timestamp')}):"]
+    for name, current in report["endpoints"].items():
+        before = previous.get("endpoints", {}).get(name)
+        if not before:
+            lines.append(f"  {name:<32} new endpoint")
+            continue
+        parts = []
+        for key in ("p50", "p99"):
+            old, new = before["latency_ms"][key], current["latency_ms"][key]
+            change = (new - old) / old * 100 if old else 0.0
+            parts.append(f"{key} {old:.1f}->{new:.1f} ms ({change:+.0f}%)")
+        parts.append(f"errors {before['error_rate']:.2%}->{current['error_rate']:.2%}")
+        lines.append(f"  {name:<32} " + "  ".join(parts))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="Mean think time between calls")
+    parser.add_argument("--session-requests", type=int, default=20, help="Calls per login session")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="Test an already running API instead of starting one")
+    parser.add_argument("--launcher", choices=("uvicorn", "serve"), default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.users, args.duration, args.think_ms / 1000, args.session_requests, args.seed,
+                 args.base_url, args.launcher, args.workers, args.port)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+    if args.compare:
+        print("\n".join(compare(report, json.loads(Path(args.compare).read_text()))))
+
+
+if __name__ == "__main__":
+    main()
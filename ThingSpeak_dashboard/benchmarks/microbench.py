@@ -0,0 +1,181 @@
+"""
+Microbenchmarks for backend hot paths
+
+Each case is timed like timeit: the loop count is calibrated so one repeat
+takes at least --min-time seconds, the garbage collector is off while timing,
+and the per-call time of every repeat is recorded. The report gives the
+median (the figure compared between runs), the minimum and the relative
+interquartile range as a noise estimate.
+
+With --baseline, any case whose median is more than --threshold slower than
+the baseline (and whose slowdown is larger than its noise) is reported as a
+regression and the exit status is 1.
+
+Usage (from ThingSpeak_dashboard/):
+    python -m benchmarks.microbench [--filter auth] [--output bench.json]
+    python -m benchmarks.microbench --baseline bench.json [--threshold 0.15]
+"""
+import argparse
+import gc
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from backend.auth import create_access_token, decode_access_token
+from backend.database import Prediction, User
+from backend.predictor import DiabetesPredictor, PredictionCache
+from backend.responses import encode_history, history_rows
+from backend.thingspeak import ThingSpeakClient
+
+from benchmarks.bench_history_serialization import make_records
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def _cases() -> List[Case]:
+    """Build every benchmarked callable with its inputs prepared up front"""
+    user = User(username="bench", hashed_password="x", pregnancies=2, weight_kg=72.5,
+                height_m=1.68, age=41, id="bench-user")
+    sensor_data = {"field1": 148.0, "field2": 72.0, "field3": 35.0, "field4": 94.0,
+                   "field5": 0.627, "timestamp": "2024-01-01T00:00:00Z", "entry_id": 1}
+    features = {"Pregnancies": 2, "Glucose": 148.0, "BloodPressure": 72.0, "SkinThickness": 35.0,
+                "Insulin": 94.0, "BMI": 25.7, "DiabetesPedigreeFunction": 0.627, "Age": 41}
+
+    cached = DiabetesPredictor()
+    cached.warm_up()
+    uncached = DiabetesPredictor()
+    uncached.warm_up()
+    uncached.cache = PredictionCache(0)
+
+    token = create_access_token({"sub": user.username, "user_id": user.id})
+    prediction = Prediction(user_id=user.id, pregnancies=2, glucose=148.0, blood_pressure=72.0,
+                            skin_thickness=35.0, insulin=94.0, bmi=25.7,
+                            diabetes_pedigree_function=0.627, age=41, prediction_result=1,
+                            confidence=0.83, model_version="baseline", risk_level="High Risk")
+    prediction_dict = prediction.to_dict()
+    history = make_records(20)  # The default history page
+
+    thingspeak = ThingSpeakClient()
+    thingspeak.dpf_values  # Load the dataset outside the timed loop
+    feed = {"channel": {"id": 1}, "feeds": [{
+        "created_at": "2024-01-01T00:00:00Z", "entry_id": 1234,
+        "field1": "148", "field2": "72", "field3": "35", "field4": "94",
+    }]}
+
+    return [
+        ("predictor.prepare_features", lambda: cached.prepare_features(user, sensor_data)),
+        ("predictor.predict[cache_hit]", lambda: cached.predict(user, sensor_data)),
+        ("predictor.predict[uncached]", lambda: uncached.predict(user, sensor_data)),
+        ("predictor.predict_from_features[cache_hit]", lambda: cached.predict_from_features(features)),
+        ("predictor.predict_from_features[uncached]", lambda: uncached.predict_from_features(features)),
+        ("auth.create_access_token", lambda: create_access_token({"sub": user.username, "user_id": user.id})),
+        ("auth.decode_access_token", lambda: decode_access_token(token)),
+        ("database.Prediction.to_dict", prediction.to_dict),
+        ("database.Prediction.from_dict", lambda: Prediction.from_dict(prediction_dict)),
+        ("responses.history_rows[20]", lambda: history_rows(history)),
+        ("responses.encode_history[20]", lambda: encode_history(history)),
+        ("thingspeak.parse_feed", lambda: thingspeak.parse_feed(feed)),
+    ]
+
+
+def _time_case(func: Callable, repeats: int, min_time: float) -> List[float]:
+    """Seconds per call for each repeat"""
+    func()  # Warm up caches and lazy imports
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.1))
+
+    per_call = []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            per_call.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return per_call
+
+
+def run(repeats: int, min_time: float, pattern: str = None) -> dict:
+    results = {}
+    for name, func in _cases():
+        if pattern and not re.search(pattern, name):
+            continue
+        per_call = np.array(_time_case(func, repeats, min_time)) * 1e6
+        q1, median, q3 = np.percentile(per_call, [25, 50, 75])
+        results[name] = {
+            "median_us": round(float(median), 3),
+            "min_us": round(float(per_call.min()), 3),
+            "iqr_rel": round(float((q3 - q1) / median), 4) if median else 0.0,
+            "ops_per_second": round(1e6 / median, 1) if median else None,
+            "repeats": repeats,
+        }
+        print(f"  {name:<46} {median:>10.2f} us  (±{results[name]['iqr_rel']:.1%})", file=sys.stderr)
+    return {
+        "benchmark": "microbench",
+        "python": sys.version.split()[0],
+        "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "results": results,
+    }
+
+
+def find_regressions(report: dict, baseline: dict, threshold: float) -> List[Dict]:
+    """Cases slower than the baseline by more than `threshold` and by more than their noise"""
+    regressions = []
+    for name, current in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["median_us"]:
+            continue
+        change = current["median_us"] / before["median_us"] - 1
+        noise = max(current["iqr_rel"], before["iqr_rel"])
+        if change > max(threshold, noise):
+            regressions.append({"case": name, "baseline_us": before["median_us"],
+                                "current_us": current["median_us"], "change": round(change, 4)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per repeat")
+    parser.add_argument("--filter", help="Only run cases matching this regex")
+    parser.add_argument("--baseline", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.repeats, args.min_time, args.filter)
+    if args.baseline:
+        report["regressions"] = find_regressions(
+            report, json.loads(Path(args.baseline).read_text()), args.threshold
+        )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+    for regression in report.get("regressions", []):
+        print(f"✗ {regression['case']}: {regression['baseline_us']} -> {regression['current_us']} us "
+              f"({regression['change']:+.1%})", file=sys.stderr)
+    sys.exit(1 if report.get("regressions") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Local stand-ins for the external services the backend talks to
+
+    ThingSpeakStandIn   /channels/<id>/feeds.json, a new sensor entry every few seconds
+    RealtimeDBStandIn   the Firebase Realtime Database REST protocol that firebase_admin
+                        speaks to the emulator (GET/PUT/PATCH/POST/DELETE on <path>.json)
+
+Point the backend at them with THINGSPEAK_BASE_URL=http://host:port and
+FIREBASE_DATABASE_EMULATOR_HOST=host:port. Both run on threads in the
+calling process and keep all state in memory. The real Firebase emulator
+(`firebase emulators:start --only database`) can be used instead of
+RealtimeDBStandIn through the same environment variable.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class _StandInServer:
+    """Threaded HTTP server bound to an ephemeral localhost port"""
+
+    def __init__(self, handler_class, port: int = 0):
+        # A handler subclass per server, so each handler instance can reach its stand-in
+        handler = type(handler_class.__name__, (handler_class,), {"standin": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.address}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name=type(self).__name__)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload=None):
+        body = b"" if status == 204 else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+
+# ==================== ThingSpeak ====================
+
+class _ThingSpeakHandler(_QuietHandler):
+    def do_GET(self):
+        path = urlparse(self.path).path
+        parts = path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "channels" and parts[2] == "feeds.json":
+            self._send_json(200, self.standin.feed(parts[1]))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+class ThingSpeakStandIn(_StandInServer):
+    """Serves a channel feed whose latest entry changes every `entry_seconds`"""
+
+    def __init__(self, entry_seconds: float = 15.0, seed: int = 42, port: int = 0):
+        super().__init__(_ThingSpeakHandler, port)
+        self.entry_seconds = entry_seconds
+        self.seed = seed
+        self.started_at = time.time()
+        self.requests = 0
+
+    def feed(self, channel_id: str) -> dict:
+        self.requests += 1
+        entry_id = int((time.time() - self.started_at) / self.entry_seconds) + 1
+        rng = random.Random(self.seed * 1_000_003 + entry_id)
+        return {
+            "channel": {"id": channel_id, "name": "Load test stand-in", "last_entry_id": entry_id},
+            "feeds": [{
+                "created_at": datetime.utcfromtimestamp(
+                    self.started_at + (entry_id - 1) * self.entry_seconds).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "entry_id": entry_id,
+                "field1": str(rng.randint(70, 200)),
+                "field2": str(rng.randint(50, 110)),
+                "field3": str(rng.randint(10, 50)),
+                "field4": str(rng.randint(15, 300)),
+            }],
+        }
+
+
+# ==================== Firebase Realtime Database ====================
+
+class _RealtimeDBHandler(_QuietHandler):
+    def _path(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path.endswith(".json"):
+            path = path[:-len(".json")]
+        segments = [segment for segment in path.split("/") if segment]
+        return segments, parse_qs(parsed.query)
+
+    def _respond(self, query, value):
+        if query.get("print") == ["silent"]:
+            self._send_json(204)
+        else:
+            self._send_json(200, value)
+
+    def do_GET(self):
+        segments, query = self._path()
+        self._send_json(200, self.standin.query(segments, query))
+
+    def do_PUT(self):
+        segments, query = self._path()
+        value = self._read_json()
+        self.standin.set(segments, value)
+        self._respond(query, value)
+
+    def do_PATCH(self):
+        segments, query = self._path()
+        value = self._read_json()
+        self.standin.update(segments, value)
+        self._respond(query, value)
+
+    def do_POST(self):
+        segments, query = self._path()
+        key = uuid.uuid4().hex
+        self.standin.set(segments + [key], self._read_json())
+        self._send_json(200, {"name": key})
+
+    def do_DELETE(self):
+        segments, query = self._path()
+        self.standin.set(segments, None)
+        self._respond(query, None)
+
+
+class RealtimeDBStandIn(_StandInServer):
+    """In-memory JSON tree answering the emulator REST protocol"""
+
+    def __init__(self, port: int = 0):
+        super().__init__(_RealtimeDBHandler, port)
+        self._root: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, segments):
+        with self._lock:
+            node = self._root
+            for segment in segments:
+                if not isinstance(node, dict) or segment not in node:
+                    return None
+                node = node[segment]
+            # Serialized under the lock so concurrent writers cannot change it mid-dump
+            return json.loads(json.dumps(node)) if node != {} else None
+
+    def query(self, segments, params: dict):
+        """GET with the orderBy/startAt/endAt/equalTo/limitToFirst/limitToLast parameters"""
+        node = self.get(segments)
+        if not isinstance(node, dict) or "orderBy" not in params:
+            return node
+        order_by = json.loads(params["orderBy"][0])
+
+        def sort_value(item):
+            key, value = item
+            if order_by == "$key":
+                return key
+            if order_by == "$value":
+                return value
+            for part in order_by.split("/"):
+                value = value.get(part) if isinstance(value, dict) else None
+            return value
+
+        def rank(value):
+            # Firebase order: null < booleans < numbers < strings
+            return (value is not None, isinstance(value, str), not isinstance(value, bool), value)
+
+        items = sorted(node.items(), key=lambda item: (rank(sort_value(item)), item[0]))
+        bounds = {name: json.loads(params[name][0]) for name in ("startAt", "endAt", "equalTo") if name in params}
+        if "equalTo" in bounds:
+            bounds["startAt"] = bounds["endAt"] = bounds["equalTo"]
+        if "startAt" in bounds:
+            items = [item for item in items if rank(sort_value(item)) >= rank(bounds["startAt"])]
+        if "endAt" in bounds:
+            items = [item for item in items if rank(sort_value(item)) <= rank(bounds["endAt"])]
+        if "limitToFirst" in params:
+            items = items[:int(params["limitToFirst"][0])]
+        if "limitToLast" in params:
+            items = items[-int(params["limitToLast"][0]):]
+        return dict(items)
+
+    def set(self, segments, value):
+        with self._lock:
+            if not segments:
+                self._root = value if isinstance(value, dict) else {}
+                return
+            node = self._root
+            for segment in segments[:-1]:
+                child = node.get(segment)
+                if not isinstance(child, dict):
+                    if value is None:
+                        return
+                    child = node[segment] = {}
+                node = child
+            if isinstance(value, dict) and ".sv" in value:
+                # Server value: {".sv": {"increment": n}} adds to the stored number
+                current = node.get(segments[-1])
+                value = (current if isinstance(current, (int, float)) else 0) + value[".sv"]["increment"]
+            if value is None:
+                node.pop(segments[-1], None)
+            else:
+                node[segments[-1]] = value
+
+    def update(self, segments, values: dict):
+        for key, value in values.items():
+            self.set(segments + [segment for segment in key.split("/") if segment], value)
@@ -3,7 +3,7 @@
 import { useState, useEffect } from 'react'
 import { useRouter } from 'next/navigation'
 import { isAuthenticated, getUser, logout } from '@/lib/auth'
-import { thingspeakAPI, predictionAPI } from '@/lib/api'
+import { thingspeakAPI, predictionAPI, streamAPI } from '@/lib/api'
 import type { ThingSpeakData, PredictionResult, PredictionHistory, User } from '@/types'
 import SensorCards from '@/components/SensorCards'
 import PredictionPanel from '@/components/PredictionPanel'
@@ -20,10 +20,8 @@ export default function DashboardPage() {
     const [loading, setLoading] = useState(false)
     const [error, setError] = useState('')
 
-    // Auto-refresh settings
-    const [autoRefresh, setAutoRefresh] = useState(false)
-    const [refreshInterval, setRefreshInterval] = useState(10)
-    const [countdown, setCountdown] = useState(10)
+    // Live updates from /api/stream
+    const [live, setLive] = useState(false)
     const [autoPredict, setAutoPredict] = useState(false)
 
     useEffect(() => {
@@ -39,21 +37,18 @@ export default function DashboardPage() {
     }, [router])
 
     useEffect(() => {
-        let interval: NodeJS.Timeout
+        if (!isAuthenticated()) return
 
-        if (autoRefresh && countdown > 0) {
-            interval = setInterval(() => {
-                setCountdown(prev => prev - 1)
-            }, 1000)
-        }
-
-        if (autoRefresh && countdown === 0) {
-            fetchData()
-            setCountdown(refreshInterval)
-        }
+        // New readings and this user's predictions are pushed by the server
+        const source = streamAPI.connect(
+            (data) => setSensorData(data),
+            (item) => setHistory(prev => [item, ...prev.filter(h => h.id !== item.id)])
+        )
+        source.onopen = () => setLive(true)
+        source.onerror = () => setLive(false)  // EventSource reconnects by itself
 
-        return () => clearInterval(interval)
-    }, [autoRefresh, countdown, refreshInterval])
+        return () => source.close()
+    }, [])
 
     useEffect(() => {
         if (autoPredict && sensorData && user) {
@@ -88,7 +83,8 @@ export default function DashboardPage() {
         try {
             const result = await predictionAPI.predict(pregnancies)
             setPrediction(result)
-            await fetchHistory()
+            // The stream delivers the new history row; fetch it only when disconnected
+            if (!live) await fetchHistory()
 
             // Trigger animations based on risk level
             if (typeof window !== 'undefined') {
@@ -157,11 +153,6 @@ export default function DashboardPage() {
         logout()
     }
 
-    const handleRefreshIntervalChange = (interval: number) => {
-        setRefreshInterval(interval)
-        setCountdown(interval)
-    }
-
     if (!user) {
         return (
             <div className="min-h-screen flex items-center justify-center">
@@ -202,49 +193,21 @@ export default function DashboardPage() {
                     </button>
                 </div>
 
-                {/* Auto-refresh Controls */}
+                {/* Live update Controls */}
                 <div className="glass-card p-6 mb-6">
                     <div className="flex flex-wrap items-center gap-6">
                         <div className="flex items-center gap-3">
-                            <label className="text-white font-medium" dir="rtl">التحديث التلقائي:</label>
-                            <button
-                                onClick={() => {
-                                    setAutoRefresh(!autoRefresh)
-                                    if (!autoRefresh) setCountdown(refreshInterval)
-                                }}
-                                className={`px-4 py-2 rounded-xl font-medium transition-all backdrop-blur-md border ${autoRefresh
+                            <label className="text-white font-medium" dir="rtl">التحديث المباشر:</label>
+                            <span
+                                className={`px-4 py-2 rounded-xl font-medium backdrop-blur-md border ${live
                                     ? 'bg-green-500/30 border-green-400/50 text-white shadow-lg shadow-green-500/20'
-                                    : 'bg-white/10 border-white/20 text-white hover:bg-white/20'
+                                    : 'bg-white/10 border-white/20 text-white'
                                     }`}
                             >
-                                <span dir="rtl">{autoRefresh ? 'مفعّل' : 'معطّل'}</span>
-                            </button>
+                                <span dir="rtl">{live ? 'متصل' : 'جارٍ الاتصال...'}</span>
+                            </span>
                         </div>
 
-                        {autoRefresh && (
-                            <>
-                                <div className="flex items-center gap-3">
-                                    <label className="text-white font-medium" dir="rtl">المدة الزمنية:</label>
-                                    {[5, 10, 15, 30].map(interval => (
-                                        <button
-                                            key={interval}
-                                            onClick={() => handleRefreshIntervalChange(interval)}
-                                            className={`px-4 py-2 rounded-xl font-medium transition-all backdrop-blur-md border ${refreshInterval === interval
-                                                ? 'bg-cyan-500/30 border-cyan-400/50 text-white shadow-lg shadow-cyan-500/20'
-                                                : 'bg-white/10 border-white/20 text-white hover:bg-white/20'
-                                                }`}
-                                        >
-                                            {interval}<span dir="rtl">ث</span>
-                                        </button>
-                                    ))}
-                                </div>
-
-                                <div className="text-white font-medium" dir="rtl">
-                                    التحديث القادم خلال: {countdown} ثانية
-                                </div>
-                            </>
-                        )}
-
                         <div className="flex items-center gap-3">
                             <label className="text-white font-medium" dir="rtl">التنبؤ التلقائي:</label>
                             <button
@@ -74,6 +74,37 @@ export const predictionAPI = {
     const response = await api.get("/api/predictions/history");
     return response.data;
   },
+
+  // Whole history as a file download (streamed by the backend)
+  exportHistory: async (format: "csv" | "parquet" = "csv"): Promise<Blob> => {
+    const response = await api.get("/api/predictions/export", {
+      params: { format },
+      responseType: "blob",
+    });
+    return response.data;
+  },
+};
+
+export const streamAPI = {
+  // Server-Sent Events: "reading" for new ThingSpeak entries, "prediction" for this user's predictions.
+  // EventSource cannot send headers, so the token goes in the query string.
+  connect: (
+    onReading: (data: ThingSpeakData) => void,
+    onPrediction?: (data: PredictionHistory) => void
+  ): EventSource => {
+    const source = new EventSource(
+      `${API_URL}/api/stream?token=${encodeURIComponent(getToken() || "")}`
+    );
+    source.addEventListener("reading", (event) =>
+      onReading(JSON.parse((event as MessageEvent).data))
+    );
+    if (onPrediction) {
+      source.addEventListener("prediction", (event) =>
+        onPrediction(JSON.parse((event as MessageEvent).data))
+      );
+    }
+    return source;
+  },
 };
 
 export default api;
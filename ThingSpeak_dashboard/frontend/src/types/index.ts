@@ -29,6 +29,7 @@ export interface PredictionResult {
     DiabetesPedigreeFunction: number;
     Age: number;
   };
+  model_version?: string | null;
 }
 
 export interface PredictionHistory {
@@ -47,6 +48,7 @@ export interface PredictionHistory {
     DiabetesPedigreeFunction: number;
     Age: number;
   };
+  model_version?: string | null;
 }
 
 export interface LoginRequest {